@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Compare ops/sec of the CLI and HTTP LineraAdapter transports.
+
+The CLI transport runs tests/fake_linera.py, the HTTP transport talks to
+tests/linera_stub.py served by uvicorn on a local port.
+
+    python benchmarks/bench_linera_transport.py --ops 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "tests"))
+
+import uvicorn
+
+import linera_stub
+from linera_adapter import LineraAdapter
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_ops(adapter: LineraAdapter, ops: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            result = await adapter.stake(market_id=0, amount=1, prediction=i % 2 == 0)
+            if not result.get("success"):
+                failures += 1
+
+    await adapter.create_market("bench", "bench market", "Finance", 1735689600)
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    elapsed = time.perf_counter() - started
+    return {
+        "transport": adapter.transport,
+        "ops": ops,
+        "concurrency": concurrency,
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round(ops / elapsed, 1),
+    }
+
+
+async def main(args):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(linera_stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    results = []
+    for transport in ("cli", "http"):
+        adapter = LineraAdapter()
+        adapter.app_id = "bench-app"
+        adapter.transport = transport
+        adapter.cli_fallback = False
+        adapter.binary = str(BACKEND_DIR / "tests" / "fake_linera.py")
+        adapter.rpc_url = f"http://127.0.0.1:{port}"
+        adapter.max_concurrency = args.concurrency
+        adapter._semaphore = asyncio.Semaphore(args.concurrency)
+        results.append(await run_ops(adapter, args.ops, args.concurrency))
+        await adapter.close()
+
+    server.should_exit = True
+    await server_task
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LineraAdapter transport benchmark")
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Compare GET /api/predictions with and without FAST_RESPONSES.
+
+The database is replaced by an in-memory stub that returns the same page of
+predictions every time, so the numbers isolate validation and serialization.
+
+    python benchmarks/bench_serialization.py --requests 200 --limit 1000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "aion_bench")
+
+import httpx
+
+import server
+
+
+class StubCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        return self
+
+    async def to_list(self, n):
+        # Copies, like documents freshly decoded from BSON
+        return [dict(doc) for doc in self.docs[:n]]
+
+
+class StubCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        if projection and any(v == 1 for v in projection.values()):
+            keep = {k for k, v in projection.items() if v == 1}
+            return StubCursor([{k: v for k, v in doc.items() if k in keep} for doc in self.docs])
+        return StubCursor(self.docs)
+
+
+class StubDB:
+    def __init__(self, docs):
+        self.predictions = StubCollection(docs)
+
+
+def make_predictions(n):
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": str(uuid.uuid4()),
+        "title": f"Prediction {i}",
+        "description": "Detailed prediction about market trends and outcomes.",
+        "category": "Finance",
+        "event_date": now + timedelta(days=i % 90),
+        "created_at": now - timedelta(seconds=i),
+        "status": "active",
+        "total_stake": 1000.0 + i,
+        "ai_model_id": str(uuid.uuid4()),
+        "ai_model_name": "GPT-4 Oracle Alpha",
+        "prediction_value": "Bullish",
+        "confidence_score": 0.9,
+        "outcome": None,
+        "verification_status": "pending",
+        "oracle_nodes": 3,
+        "stake_batches": ["b1", "b2"],
+    } for i in range(n)]
+
+
+async def run(fast: bool, requests: int, limit: int) -> dict:
+    server.FAST_RESPONSES = fast
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/api/predictions", params={"limit": limit})  # warm up
+        wall, cpu = time.perf_counter(), time.process_time()
+        for _ in range(requests):
+            response = await client.get("/api/predictions", params={"limit": limit})
+            response.raise_for_status()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return {
+        "path": "fast" if fast else "validated",
+        "requests": requests,
+        "limit": limit,
+        "req_per_sec": round(requests / wall, 1),
+        "cpu_ms_per_req": round(cpu / requests * 1000, 3),
+        "bytes": len(response.content),
+    }
+
+
+async def main(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server.db = StubDB(make_predictions(args.limit))
+    results = [await run(fast, args.requests, args.limit) for fast in (False, True)]
+    results[1]["speedup"] = round(results[1]["req_per_sec"] / results[0]["req_per_sec"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prediction list serialization benchmark")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Synthetic multi-chain benchmark for ShardedIndexer.
+
+Each chain is served by a fake adapter with fixed query latency and an
+in-memory Mongo, so the numbers show how throughput scales with workers.
+mongomock writes are CPU-bound, so keep the query latency dominant.
+
+    python benchmarks/bench_sharded_indexer.py --chains 200 --latency 0.1
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+
+from indexer import ShardedIndexer
+
+
+class SyntheticAdapter:
+    chain_id = "default"
+
+    def __init__(self, markets_per_chain: int, latency: float):
+        self.markets_per_chain = markets_per_chain
+        self.latency = latency
+        self.cycle = 0
+
+    async def query_state(self, chain_id=None):
+        await asyncio.sleep(self.latency)
+        return {"markets": [
+            {
+                "id": i, "title": f"{chain_id} market {i}", "description": "synthetic", "category": "Finance",
+                "event_date": 1735689600, "total_stake_yes": i * self.cycle, "total_stake_no": 0,
+                "resolved": False, "outcome": None,
+            }
+            for i in range(self.markets_per_chain)
+        ]}
+
+
+async def bench(workers: int, args) -> dict:
+    adapter = SyntheticAdapter(args.markets, args.latency)
+    chains = [f"chain-{i}" for i in range(args.chains)]
+    indexer = ShardedIndexer(chains, db=AsyncMongoMockClient()["bench"], adapter=adapter, workers=workers)
+    await indexer.sync_all()  # initial load
+    adapter.cycle = 1
+    await indexer.sync_all()
+    return {"workers": workers, **indexer.last_cycle}
+
+
+async def main(args):
+    results = [await bench(workers, args) for workers in args.workers]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded indexer benchmark")
+    parser.add_argument("--chains", type=int, default=100)
+    parser.add_argument("--markets", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per chain state query")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    asyncio.run(main(parser.parse_args()))
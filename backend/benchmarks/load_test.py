@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""End-to-end load test of the FastAPI app with local stand-ins.
+
+The app runs under uvicorn in a child process against an in-memory Mongo
+(or a real mongod with --mongo-url) loaded with a datagen preset (--dataset,
+replacing the database's contents), tests/fake_hermes.py for Pyth prices and
+tests/fake_linera.py as the linera binary. Workers drive a weighted mix of
+reads, stakes, votes and live predictions, and the report is written as JSON
+so runs can be compared between commits.
+
+    python benchmarks/load_test.py --duration 30 --concurrency 32 --output report.json
+    python benchmarks/load_test.py --compare baseline.json --output report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "tests"))
+
+# (name, weight)
+TRAFFIC_MIX = [
+    ("list_predictions", 25),
+    ("get_prediction", 20),
+    ("ai_models", 10),
+    ("dao_proposals", 8),
+    ("statistics", 5),
+    ("live_predictions", 10),
+    ("stake", 12),
+    ("vote", 5),
+    ("linera_stake", 5),
+]
+
+LAG_INTERVAL = 0.05  # seconds between event-loop lag samples in the server
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values_ms: List[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+    return {"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+            "max_ms": round(max(values_ms), 3)}
+
+
+# ============ SERVER (child process) ============
+
+def serve(port: int, mongo_url: str, dataset: str):
+    import uvicorn
+    from fastapi import APIRouter
+
+    import datagen
+    import server
+
+    # Per-request INFO logs would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    if not mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.client = AsyncMongoMockClient(tz_aware=True)
+        server.db = server.client[os.environ["DB_NAME"]]
+        for name in ("stake_service", "stake_buffer", "vote_tally", "reputation_engine", "settlement_engine"):
+            getattr(server, name).db = server.db
+        server.stake_service.client = server.client
+
+    lag_samples: List[float] = []
+
+    async def sample_lag():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_INTERVAL)
+            lag_samples.append((time.perf_counter() - started - LAG_INTERVAL) * 1000)
+
+    bench_router = APIRouter(prefix="/bench")
+
+    @bench_router.post("/reset")
+    async def reset_lag():
+        lag_samples.clear()
+        return {"ok": True}
+
+    @bench_router.get("/loop-lag")
+    async def loop_lag():
+        return {"samples": len(lag_samples), **percentiles(lag_samples)}
+
+    async def populate():
+        # Runs after the app's own startup, so indexes exist and engines reload what was generated
+        await datagen.load(server.db, datagen.PRESETS[dataset], drop=True)
+        await datagen.finalize(server.db)
+        await server.reputation_engine.load()
+
+    server.app.include_router(bench_router)
+    server.app.add_event_handler("startup", populate)
+    server.app.add_event_handler("startup", lambda: asyncio.get_running_loop().create_task(sample_lag()))
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# ============ LOAD GENERATOR ============
+
+class LoadGenerator:
+    def __init__(self, client, prediction_ids: List[str], proposal_ids: List[str]):
+        self.client = client
+        self.prediction_ids = prediction_ids
+        self.proposal_ids = proposal_ids
+        self.latencies: Dict[str, List[float]] = {name: [] for name, _ in TRAFFIC_MIX}
+        self.errors: Dict[str, int] = {name: 0 for name, _ in TRAFFIC_MIX}
+
+    def request_for(self, name: str):
+        prediction_id = random.choice(self.prediction_ids)
+        if name == "list_predictions":
+            return "GET", "/api/predictions", {"params": {"limit": 50}}
+        if name == "get_prediction":
+            return "GET", f"/api/predictions/{prediction_id}", {}
+        if name == "ai_models":
+            return "GET", "/api/ai-models", {}
+        if name == "dao_proposals":
+            return "GET", "/api/dao-proposals", {}
+        if name == "statistics":
+            return "GET", "/api/statistics", {}
+        if name == "live_predictions":
+            return "GET", "/api/live-predictions", {}
+        if name == "stake":
+            return "POST", f"/api/predictions/{prediction_id}/stake", {"params": {
+                "wallet_address": f"0xwallet{random.randrange(1000)}", "amount": random.randint(1, 100),
+                "side": random.choice(["for", "against"]),
+            }}
+        if name == "vote":
+            return "POST", f"/api/dao-proposals/{random.choice(self.proposal_ids)}/vote", {"params": {
+                "wallet_address": f"0x{uuid.uuid4().hex}", "vote": random.choice(["for", "against"]),
+            }}
+        return "POST", "/api/linera/stake", {"json": {
+            "market_id": 0, "amount": random.randint(1, 100), "prediction": random.random() < 0.5,
+        }}
+
+    async def worker(self, deadline: float):
+        names = [name for name, _ in TRAFFIC_MIX]
+        weights = [weight for _, weight in TRAFFIC_MIX]
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            method, path, kwargs = self.request_for(name)
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+                # A resolved prediction rejecting a stake is expected traffic, not a failure
+                failed = response.status_code >= 500 or response.status_code in (400, 404)
+            except Exception:
+                failed = True
+            self.latencies[name].append((time.perf_counter() - started) * 1000)
+            if failed:
+                self.errors[name] += 1
+
+    async def run(self, duration: float, concurrency: int) -> float:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(self.worker(deadline) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Relative change per endpoint; positive req/s and negative p95 are improvements"""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    diff = {"req_per_sec_pct": change(report["totals"]["req_per_sec"], baseline["totals"]["req_per_sec"])}
+    for name, stats in report["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old:
+            diff[name] = {
+                "req_per_sec_pct": change(stats["req_per_sec"], old["req_per_sec"]),
+                "p95_pct": change(stats["p95_ms"], old["p95_ms"]),
+            }
+    return diff
+
+
+async def main(args):
+    import httpx
+    import uvicorn
+
+    import fake_hermes
+
+    hermes_port, app_port = free_port(), free_port()
+    hermes = uvicorn.Server(uvicorn.Config(fake_hermes.app, host="127.0.0.1", port=hermes_port, log_level="warning"))
+    hermes_task = asyncio.create_task(hermes.serve())
+
+    env = {
+        **os.environ,
+        "MONGO_URL": args.mongo_url or "mongodb://in-memory",
+        "DB_NAME": args.db_name,
+        "HERMES_URL": f"http://127.0.0.1:{hermes_port}",
+        "LINERA_BIN": str(BACKEND_DIR / "tests" / "fake_linera.py"),
+        "LINERA_APP_ID": "bench-app",
+        "LINERA_TRANSPORT": "cli",
+        "FAKE_LINERA_LATENCY": str(args.linera_latency),
+        "STATS_RECONCILE_INTERVAL": "3600",
+    }
+    child = subprocess.Popen(
+        [sys.executable, __file__, "--serve", "--port", str(app_port), "--mongo-url", args.mongo_url or "",
+         "--dataset", args.dataset],
+        env=env, cwd=BACKEND_DIR
+    )
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=30) as client:
+            for _ in range(200):
+                try:
+                    if (await client.get("/api/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("App did not start")
+
+            prediction_ids = [p["id"] for p in (await client.get("/api/predictions", params={"limit": 500})).json()]
+            proposal_ids = [p["id"] for p in (await client.get("/api/dao-proposals")).json()]
+            generator = LoadGenerator(client, prediction_ids, proposal_ids)
+            await client.post("/bench/reset")
+            elapsed = await generator.run(args.duration, args.concurrency)
+            loop_lag = (await client.get("/bench/loop-lag")).json()
+    finally:
+        child.terminate()
+        child.wait(timeout=10)
+        hermes.should_exit = True
+        await hermes_task
+
+    total = sum(len(v) for v in generator.latencies.values())
+    report = {
+        "commit": git_commit(),
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "mongo": "mongod" if args.mongo_url else "in-memory",
+            "dataset": args.dataset,
+            "linera_latency_s": args.linera_latency,
+            "mix": dict(TRAFFIC_MIX),
+        },
+        "totals": {
+            "requests": total,
+            "errors": sum(generator.errors.values()),
+            "req_per_sec": round(total / elapsed, 1),
+        },
+        "endpoints": {
+            name: {
+                "requests": len(values),
+                "errors": generator.errors[name],
+                "req_per_sec": round(len(values) / elapsed, 1),
+                **percentiles(values),
+            }
+            for name, values in generator.latencies.items()
+        },
+        "event_loop_lag": loop_lag,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report["compare"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end API load test")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mongo-url", default="", help="use this mongod instead of in-memory Mongo")
+    parser.add_argument("--db-name", default="aion_load_test")
+    parser.add_argument("--dataset", default="demo", help="datagen preset loaded before traffic starts")
+    parser.add_argument("--linera-latency", type=float, default=0.01, help="seconds per fake linera call")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline report to diff against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port, args.mongo_url, args.dataset)
+    else:
+        asyncio.run(main(args))
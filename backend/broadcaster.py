@@ -0,0 +1,70 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Broadcaster:
+    """Computes one update per interval and fans it out to every subscriber"""
+
+    def __init__(self, producer: Callable[[], Awaitable[Dict[str, Any]]], interval: Optional[float] = None):
+        self.producer = producer
+        self.interval = interval if interval is not None else float(os.getenv("BROADCAST_INTERVAL", "2"))
+        self.latest: Optional[str] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"broadcasts": 0, "dropped": 0, "producer_errors": 0}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a client; each client holds at most one pending update"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, message: str):
+        """Hand an encoded update to every subscriber, replacing any update a slow client has not read"""
+        self.latest = message
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.stats["dropped"] += 1
+            queue.put_nowait(message)
+        self.stats["broadcasts"] += 1
+
+    async def _run(self):
+        # Only runs while someone is listening, so an idle server does no work
+        while self._subscribers:
+            try:
+                payload = await self.producer()
+                self.publish(json.dumps(payload, default=str))
+            except Exception as e:
+                self.stats["producer_errors"] += 1
+                logger.error(f"Broadcast producer error: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "subscribers": self.subscriber_count, "interval_seconds": self.interval}
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_block(line: str) -> Optional[Dict[str, Any]]:
+    """The block on one log line, or None if the line isn't one"""
+    try:
+        block = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(block, dict) or type(block.get("height")) is not int:
+        return None
+    if not isinstance(block.get("operations", []), (list, type(None))):
+        return None
+    return block
+
+
+class EventLogSource:
+    """Tails a local NDJSON block log, one block per line:
+
+    {"height": 7, "operations": [{"Stake": {"market_id": 1, "amount": 10, "prediction": true}}]}
+    """
+
+    replayable = True
+
+    def __init__(self, path: str, follow: bool = True, poll_interval: float = 0.2):
+        self.path = Path(path)
+        self.follow = follow
+        self.poll_interval = poll_interval
+
+    async def events(self, after: int) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every block above `after`, then keep following the file"""
+        while not self.path.exists():
+            if not self.follow:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+        with open(self.path) as f:
+            pending = ""
+            while True:
+                line = f.readline()
+                if not line:
+                    if not self.follow:
+                        return
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                pending += line
+                if not pending.endswith("\n"):
+                    # Partially written line, wait for the rest
+                    continue
+                raw, pending = pending, ""
+                block = parse_block(raw)
+                if block is None:
+                    # Raising here would replay the same line on every reconnect, so step over it
+                    logger.warning(f"Skipping malformed line in {self.path}: {raw.strip()[:200]}")
+                    continue
+                if block["height"] > after:
+                    yield block
+
+
+class NodeNotificationSource:
+    """Subscribes to new-block notifications from the Linera node service"""
+
+    replayable = False
+
+    def __init__(self, rpc_url: str, chain_id: str):
+        self.url = rpc_url.replace("http://", "ws://").replace("https://", "wss://").rstrip("/") + "/ws"
+        self.chain_id = chain_id
+
+    async def events(self, after: int) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {"height": n, "operations": None} for every new block; the indexer re-syncs state for these"""
+        import aiohttp
+
+        query = f'subscription {{ notifications(chainId: "{self.chain_id}") }}'
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(self.url, protocols=["graphql-transport-ws"], heartbeat=30) as ws:
+                await ws.send_json({"type": "connection_init"})
+                await ws.send_json({"id": "1", "type": "subscribe", "payload": {"query": query}})
+                async for message in ws:
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    data = json.loads(message.data)
+                    if data.get("type") == "next":
+                        reason = data["payload"]["data"]["notifications"]["reason"]
+                        new_block = reason.get("NewBlock")
+                        if new_block and new_block["height"] > after:
+                            yield {"height": new_block["height"], "operations": None}
+                    elif data.get("type") in ("error", "complete"):
+                        raise Exception(f"Notification subscription ended: {data}")
+        raise Exception("Notification stream closed")
@@ -0,0 +1,115 @@
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Tuple
+
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+VOTE_COUNTER_SHARDS = int(os.getenv("VOTE_COUNTER_SHARDS", "16"))
+TALLY_CACHE_TTL = float(os.getenv("TALLY_CACHE_TTL", "1.0"))  # seconds
+
+VOTE_FIELDS = {"for": "votes_for", "against": "votes_against"}
+
+
+class AlreadyVoted(Exception):
+    pass
+
+
+class VoteTally:
+    """Records one vote per wallet and counts them in sharded counter documents.
+
+    Each vote increments one of `shards` vote_counters documents picked at
+    random, so a popular proposal spreads its writes instead of contending on
+    the proposal document. Reads sum the shards on top of the counts already
+    stored on the proposal, and are cached for `cache_ttl` seconds.
+    """
+
+    def __init__(self, db, shards: int = VOTE_COUNTER_SHARDS, cache_ttl: float = TALLY_CACHE_TTL):
+        self.db = db
+        self.shards = shards
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[float, Dict[str, int]]] = {}
+
+    async def record_vote(self, proposal_id: str, wallet_address: str, vote: str):
+        """Store the vote and bump a counter shard; raises AlreadyVoted on a second vote"""
+        try:
+            await self.db.votes.insert_one({
+                "proposal_id": proposal_id,
+                "wallet_address": wallet_address,
+                "vote": vote,
+                "timestamp": datetime.now(timezone.utc),
+            })
+        except DuplicateKeyError:
+            raise AlreadyVoted(proposal_id)
+        await self.db.vote_counters.update_one(
+            {"proposal_id": proposal_id, "shard": random.randrange(self.shards)},
+            {"$inc": {VOTE_FIELDS[vote]: 1}},
+            upsert=True
+        )
+        self._cache.pop(proposal_id, None)
+
+    async def get_tallies(self, proposal_ids: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """Tallies for many proposals in one aggregation; unknown ids are omitted"""
+        now = time.monotonic()
+        tallies = {}
+        missing = []
+        for proposal_id in dict.fromkeys(proposal_ids):
+            cached = self._cache.get(proposal_id)
+            if cached and cached[0] > now:
+                tallies[proposal_id] = cached[1]
+            else:
+                missing.append(proposal_id)
+        if not missing:
+            return tallies
+
+        fresh = {}
+        async for proposal in self.db.dao_proposals.find(
+            {"id": {"$in": missing}}, {"_id": 0, "id": 1, "votes_for": 1, "votes_against": 1}
+        ):
+            fresh[proposal["id"]] = {
+                "votes_for": proposal.get("votes_for", 0),
+                "votes_against": proposal.get("votes_against", 0),
+            }
+        pipeline = [
+            {"$match": {"proposal_id": {"$in": list(fresh)}}},
+            {"$group": {
+                "_id": "$proposal_id",
+                "votes_for": {"$sum": "$votes_for"},
+                "votes_against": {"$sum": "$votes_against"},
+            }},
+        ]
+        async for row in self.db.vote_counters.aggregate(pipeline):
+            fresh[row["_id"]]["votes_for"] += row["votes_for"]
+            fresh[row["_id"]]["votes_against"] += row["votes_against"]
+
+        expires = now + self.cache_ttl
+        for proposal_id, tally in fresh.items():
+            tally["total_votes"] = tally["votes_for"] + tally["votes_against"]
+            self._cache[proposal_id] = (expires, tally)
+        tallies.update(fresh)
+        return tallies
+
+    async def rebuild_counters(self) -> int:
+        """Recompute the counter shards from the votes collection.
+
+        Corrects counters left behind by a crash between the vote insert and
+        the shard increment; run it during maintenance, not under vote traffic.
+        """
+        pipeline = [{"$group": {
+            "_id": "$proposal_id",
+            "votes_for": {"$sum": {"$cond": [{"$eq": ["$vote", "for"]}, 1, 0]}},
+            "votes_against": {"$sum": {"$cond": [{"$eq": ["$vote", "against"]}, 1, 0]}},
+        }}]
+        operations = []
+        async for row in self.db.votes.aggregate(pipeline):
+            await self.db.vote_counters.delete_many({"proposal_id": row["_id"]})
+            key = {"proposal_id": row["_id"], "shard": 0}
+            operations.append(ReplaceOne(key, {
+                **key, "votes_for": row["votes_for"], "votes_against": row["votes_against"]
+            }, upsert=True))
+        if operations:
+            await self.db.vote_counters.bulk_write(operations, ordered=False)
+        self._cache.clear()
+        return len(operations)
@@ -0,0 +1,522 @@
+"""Deterministic synthetic dataset generator.
+
+Streams AI models, predictions, stakes, DAO proposals, votes and mirrored
+Linera markets into MongoDB with batched insert_many, optionally from several
+worker processes. Every chunk draws from its own generator seeded by
+(seed, collection, chunk), so the same spec produces the same documents no
+matter how many workers load it. Stakes concentrate on a few hot predictions
+and a few whale wallets, and derived state (totals, wallet positions, vote
+counters, reputation, platform stats) is rebuilt from the raw collections
+afterwards.
+
+    python datagen.py --preset demo
+    python datagen.py --preset large --workers 8 --drop
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import ValidationError
+from pymongo import MongoClient, UpdateOne
+
+from dao_votes import VoteTally
+from indexer import market_document
+from indexes import ensure_indexes
+from platform_stats import reconcile_platform_stats
+from reputation import ReputationEngine
+from wallet_ledger import REBUILD_BATCH_SIZE, rebuild_wallet_positions
+
+load_dotenv()
+
+# (name, model_type); later rounds get a numeric suffix
+MODEL_FAMILIES = [
+    ("GPT-4 Oracle Alpha", "GPT-4"),
+    ("Claude Predictor", "Claude-3"),
+    ("Llama Vision Pro", "Llama-3"),
+    ("Gemini Forecast", "Gemini-Pro"),
+    ("Mistral Oracle", "Mistral-Large"),
+]
+CATEGORIES = ["Finance", "Esports", "Climate", "Politics", "Technology"]
+CATEGORY_WEIGHTS = [0.4, 0.2, 0.1, 0.15, 0.15]
+PREDICTION_VALUES = ["Bullish", "Bearish", "Neutral", "High Probability", "Low Probability"]
+PROPOSAL_TITLES = [
+    "Increase AI Model Stake Requirement",
+    "Add New Market Category: DeFi",
+    "Reduce Oracle Verification Time",
+    "Lower Settlement Fee",
+    "Fund Community Oracle Nodes",
+]
+
+# Collections in load order, with the salt that keeps their random streams apart
+KINDS = {"ai_models": 1, "predictions": 2, "dao_proposals": 3, "markets": 4, "stakes": 5, "votes": 6}
+# Collections rebuilt from the generated ones, cleared by --drop as well
+DERIVED = ["wallet_positions", "vote_counters", "platform_stats", "settlements"]
+
+# End of the generated history unless a spec names another, fixed so a seed always means the same data
+DEFAULT_ANCHOR = datetime(2026, 1, 1, tzinfo=timezone.utc)
+# Stakes placed on a prediction in its first week
+STAKE_WINDOW = timedelta(days=7)
+PROPOSAL_DURATION = timedelta(days=7)
+# Zipf exponents: how strongly popularity falls off with rank
+HOT_PREDICTION_EXPONENT = 1.1
+WALLET_EXPONENT = 1.0
+MODEL_EXPONENT = 0.8
+PROPOSAL_EXPONENT = 1.0
+# Share of wallets that are whales, and how much more they stake
+WHALE_SHARE = 0.01
+WHALE_MULTIPLIER = 25.0
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    models: int
+    predictions: int
+    stakes: int
+    wallets: int
+    proposals: int
+    votes: int
+    markets: int
+    seed: int = 42
+    # Generated timestamps lie in the history_days before the anchor
+    anchor: datetime = DEFAULT_ANCHOR
+    history_days: int = 180
+    chunk_size: int = 10_000
+    chain_id: str = os.getenv("LINERA_CHAIN_ID", "default")
+
+
+PRESETS = {
+    "demo": DatasetSpec(models=5, predictions=15, stakes=300, wallets=50, proposals=3, votes=150, markets=10),
+    "small": DatasetSpec(models=50, predictions=10_000, stakes=200_000, wallets=20_000,
+                         proposals=50, votes=50_000, markets=5_000),
+    "large": DatasetSpec(models=500, predictions=1_000_000, stakes=20_000_000, wallets=1_000_000,
+                         proposals=1_000, votes=2_000_000, markets=500_000),
+}
+
+
+# ============ DETERMINISTIC BUILDING BLOCKS ============
+
+def entity_id(seed: int, kind: str, index: int) -> str:
+    digest = hashlib.blake2b(f"{seed}:{kind}:{index}".encode(), digest_size=16).digest()
+    return str(uuid.UUID(bytes=digest, version=4))
+
+
+def wallet_address(seed: int, index: int) -> str:
+    return "0x" + hashlib.blake2b(f"{seed}:wallet:{index}".encode(), digest_size=20).hexdigest()
+
+
+def chunk_rng(spec: DatasetSpec, kind: str, chunk: int) -> np.random.Generator:
+    return np.random.default_rng([spec.seed, KINDS[kind], chunk])
+
+
+@lru_cache(maxsize=None)
+def popularity(seed: int, salt: int, n: int, exponent: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Zipf CDF over popularity ranks, and a permutation from rank to entity index"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    order = np.random.default_rng([seed, salt]).permutation(n)
+    return cdf, order
+
+
+def sample_ranks(rng: np.random.Generator, cdf: np.ndarray, size: int) -> np.ndarray:
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), len(cdf) - 1)
+
+
+def spread(spec: DatasetSpec, index: np.ndarray, count: int) -> np.ndarray:
+    """Creation times in seconds after the start of history, oldest index first"""
+    return index / max(count, 1) * spec.history_days * 86400
+
+
+def start_of_history(spec: DatasetSpec) -> datetime:
+    return spec.anchor - timedelta(days=spec.history_days)
+
+
+@lru_cache(maxsize=None)
+def model_skills(spec: DatasetSpec) -> np.ndarray:
+    """Chance each model's prediction turns out correct"""
+    return np.random.default_rng([spec.seed, 100]).uniform(0.55, 0.95, spec.models)
+
+
+@lru_cache(maxsize=None)
+def vote_layout(spec: DatasetSpec) -> Dict[str, np.ndarray]:
+    """Votes per proposal, skewed towards a few hot proposals.
+
+    Vote k on a proposal comes from wallet (first_wallet + k) % wallets, so a
+    wallet votes at most once per proposal.
+    """
+    rng = np.random.default_rng([spec.seed, 101])
+    cdf, order = popularity(spec.seed, 102, spec.proposals, PROPOSAL_EXPONENT)
+    probabilities = np.diff(cdf, prepend=0.0)
+    counts = np.zeros(spec.proposals, dtype=np.int64)
+    counts[order] = rng.multinomial(spec.votes, probabilities)
+    counts = np.minimum(counts, spec.wallets)
+    return {
+        "offsets": np.concatenate([[0], np.cumsum(counts)]),
+        "first_wallet": rng.integers(0, spec.wallets, spec.proposals),
+        "approval": rng.uniform(0.2, 0.8, spec.proposals),
+    }
+
+
+def collection_size(spec: DatasetSpec, kind: str) -> int:
+    if kind == "votes":
+        return int(vote_layout(spec)["offsets"][-1]) if spec.proposals else 0
+    return {
+        "ai_models": spec.models, "predictions": spec.predictions, "dao_proposals": spec.proposals,
+        "markets": spec.markets, "stakes": spec.stakes,
+    }[kind]
+
+
+# ============ DOCUMENTS ============
+
+def model_name(index: int) -> Tuple[str, str]:
+    base, model_type = MODEL_FAMILIES[index % len(MODEL_FAMILIES)]
+    if index >= len(MODEL_FAMILIES):
+        base = f"{base} {index // len(MODEL_FAMILIES) + 1}"
+    return base, model_type
+
+
+def model_documents(spec: DatasetSpec, start: int, stop: int, rng) -> List[Dict[str, Any]]:
+    created_at = start_of_history(spec) - timedelta(days=30)
+    documents = []
+    for i in range(start, stop):
+        name, model_type = model_name(i)
+        documents.append({
+            "id": entity_id(spec.seed, "model", i),
+            "name": name,
+            "model_type": model_type,
+            # Scores, totals and rank are rebuilt from the resolved predictions
+            "reputation_score": 0.0,
+            "total_predictions": 0,
+            "correct_predictions": 0,
+            "accuracy_rate": 0.0,
+            "total_staked": 0.0,
+            "total_earned": 0.0,
+            "rank": i + 1,
+            "avatar_url": f"https://api.dicebear.com/7.x/bottts/svg?seed={entity_id(spec.seed, 'model', i)[:8]}",
+            "created_at": created_at,
+        })
+    return documents
+
+
+def prediction_documents(spec: DatasetSpec, start: int, stop: int, rng) -> List[Dict[str, Any]]:
+    size = stop - start
+    cdf, order = popularity(spec.seed, 103, spec.models, MODEL_EXPONENT)
+    models = order[sample_ranks(rng, cdf, size)]
+    categories = rng.choice(len(CATEGORIES), size, p=CATEGORY_WEIGHTS)
+    created = spread(spec, np.arange(start, stop), spec.predictions)
+    horizon_days = rng.integers(7, 91, size)
+    confidence = np.round(rng.uniform(0.55, 0.99, size), 2)
+    correct = rng.random(size) < model_skills(spec)[models]
+    values = rng.integers(0, len(PREDICTION_VALUES), size)
+    history = start_of_history(spec)
+    documents = []
+    for j, i in enumerate(range(start, stop)):
+        category = CATEGORIES[categories[j]]
+        created_at = history + timedelta(seconds=float(created[j]))
+        event_date = created_at + timedelta(days=int(horizon_days[j]))
+        resolved = event_date < spec.anchor
+        model = int(models[j])
+        documents.append({
+            "id": entity_id(spec.seed, "prediction", i),
+            "title": f"{category} Market Prediction #{i + 1}",
+            "description": f"Detailed prediction about {category.lower()} market trends and outcomes.",
+            "category": category,
+            "event_date": event_date,
+            "created_at": created_at,
+            "status": "resolved" if resolved else "active",
+            # Summed from the stakes once they are loaded
+            "total_stake": 0.0,
+            "ai_model_id": entity_id(spec.seed, "model", model),
+            "ai_model_name": model_name(model)[0],
+            "prediction_value": PREDICTION_VALUES[values[j]],
+            "confidence_score": float(confidence[j]),
+            "outcome": ("correct" if correct[j] else "incorrect") if resolved else None,
+            "verification_status": "verified" if resolved else "pending",
+            "oracle_nodes": 3,
+        })
+    return documents
+
+
+def stake_documents(spec: DatasetSpec, start: int, stop: int, rng) -> List[Dict[str, Any]]:
+    size = stop - start
+    prediction_cdf, prediction_order = popularity(spec.seed, 104, spec.predictions, HOT_PREDICTION_EXPONENT)
+    wallet_cdf, wallet_order = popularity(spec.seed, 105, spec.wallets, WALLET_EXPONENT)
+    predictions = prediction_order[sample_ranks(rng, prediction_cdf, size)]
+    wallet_ranks = sample_ranks(rng, wallet_cdf, size)
+    wallets = wallet_order[wallet_ranks]
+    whales = wallet_ranks < max(1, int(spec.wallets * WHALE_SHARE))
+    amounts = rng.lognormal(3.0, 1.2, size)
+    amounts = np.round(np.where(whales, amounts * WHALE_MULTIPLIER, amounts), 2)
+    sides = rng.random(size) < 0.6
+    # Inside the prediction's first week, and never after the anchor
+    created = spread(spec, predictions, spec.predictions)
+    window = np.minimum(STAKE_WINDOW.total_seconds(), spec.history_days * 86400 - created)
+    placed = created + rng.random(size) * window
+    history = start_of_history(spec)
+    return [{
+        "id": entity_id(spec.seed, "stake", i),
+        "prediction_id": entity_id(spec.seed, "prediction", int(predictions[j])),
+        "wallet_address": wallet_address(spec.seed, int(wallets[j])),
+        "amount": float(amounts[j]),
+        "side": "for" if sides[j] else "against",
+        "timestamp": history + timedelta(seconds=float(placed[j])),
+    } for j, i in enumerate(range(start, stop))]
+
+
+def proposal_documents(spec: DatasetSpec, start: int, stop: int, rng) -> List[Dict[str, Any]]:
+    approval = vote_layout(spec)["approval"]
+    created = spread(spec, np.arange(start, stop), spec.proposals)
+    proposers = rng.integers(0, max(1, int(spec.wallets * WHALE_SHARE)), stop - start)
+    _, wallet_order = popularity(spec.seed, 105, spec.wallets, WALLET_EXPONENT)
+    history = start_of_history(spec)
+    documents = []
+    for j, i in enumerate(range(start, stop)):
+        created_at = history + timedelta(seconds=float(created[j]))
+        end_date = created_at + PROPOSAL_DURATION
+        title = PROPOSAL_TITLES[i % len(PROPOSAL_TITLES)]
+        if end_date >= spec.anchor:
+            status = "active"
+        else:
+            status = "passed" if approval[i] > 0.5 else "rejected"
+        documents.append({
+            "id": entity_id(spec.seed, "proposal", i),
+            "title": title if i < len(PROPOSAL_TITLES) else f"{title} #{i // len(PROPOSAL_TITLES) + 1}",
+            "description": f"Community proposal: {title.lower()}.",
+            "proposer": wallet_address(spec.seed, int(wallet_order[proposers[j]])),
+            "status": status,
+            # Counted from the votes collection through vote_counters
+            "votes_for": 0,
+            "votes_against": 0,
+            "total_votes": 0,
+            "end_date": end_date,
+            "created_at": created_at,
+        })
+    return documents
+
+
+def vote_documents(spec: DatasetSpec, start: int, stop: int, rng) -> List[Dict[str, Any]]:
+    layout = vote_layout(spec)
+    index = np.arange(start, stop)
+    proposals = np.searchsorted(layout["offsets"], index, side="right") - 1
+    wallets = (layout["first_wallet"][proposals] + index - layout["offsets"][proposals]) % spec.wallets
+    votes_for = rng.random(stop - start) < layout["approval"][proposals]
+    created = spread(spec, proposals, spec.proposals)
+    window = np.minimum(PROPOSAL_DURATION.total_seconds(), spec.history_days * 86400 - created)
+    cast = created + rng.random(stop - start) * window
+    history = start_of_history(spec)
+    return [{
+        "proposal_id": entity_id(spec.seed, "proposal", int(proposals[j])),
+        "wallet_address": wallet_address(spec.seed, int(wallets[j])),
+        "vote": "for" if votes_for[j] else "against",
+        "timestamp": history + timedelta(seconds=float(cast[j])),
+    } for j in range(stop - start)]
+
+
+def market_documents(spec: DatasetSpec, start: int, stop: int, rng) -> List[Dict[str, Any]]:
+    size = stop - start
+    created = spread(spec, np.arange(start, stop), spec.markets)
+    event_offsets = created + rng.integers(7, 91, size) * 86400
+    # Pareto-tailed pools: most markets are small, a few are hot
+    pools = (rng.pareto(1.2, size) * 1000).astype(np.int64) + 1
+    yes_share = rng.beta(2, 2, size)
+    categories = rng.choice(len(CATEGORIES), size, p=CATEGORY_WEIGHTS)
+    outcomes = rng.random(size) < yes_share
+    history = start_of_history(spec)
+    documents = []
+    for j, i in enumerate(range(start, stop)):
+        event_date = history + timedelta(seconds=float(event_offsets[j]))
+        resolved = event_date < spec.anchor
+        category = CATEGORIES[categories[j]]
+        yes = int(pools[j] * yes_share[j])
+        document = market_document({
+            "id": i,
+            "title": f"{category} Linera Market #{i}",
+            "description": f"On-chain {category.lower()} market.",
+            "category": category,
+            "event_date": int(event_date.timestamp()),
+            "total_stake_yes": yes,
+            "total_stake_no": int(pools[j]) - yes,
+            "resolved": resolved,
+            "outcome": bool(outcomes[j]) if resolved else None,
+        })
+        document.update({"chain_id": spec.chain_id, "last_synced": spec.anchor})
+        documents.append(document)
+    return documents
+
+
+BUILDERS = {
+    "ai_models": model_documents,
+    "predictions": prediction_documents,
+    "dao_proposals": proposal_documents,
+    "markets": market_documents,
+    "stakes": stake_documents,
+    "votes": vote_documents,
+}
+
+
+def chunk_documents(spec: DatasetSpec, kind: str, chunk: int) -> List[Dict[str, Any]]:
+    """The documents of one chunk; identical on every call for the same spec"""
+    start = chunk * spec.chunk_size
+    stop = min(start + spec.chunk_size, collection_size(spec, kind))
+    return BUILDERS[kind](spec, start, stop, chunk_rng(spec, kind, chunk))
+
+
+def validate_sample(spec: DatasetSpec):
+    """Check the first chunk of each collection the API reads against its model.
+
+    Stored predictions are served without re-validation (FAST_RESPONSES), so
+    a generator that drifts from the models must fail before it writes.
+    """
+    # server reads MONGO_URL at import, which worker processes and callers of chunk_documents don't need
+    from server import AIModel, DAOProposal, Prediction, StakeRecord
+
+    models = {"ai_models": AIModel, "predictions": Prediction, "dao_proposals": DAOProposal, "stakes": StakeRecord}
+    for kind, model in models.items():
+        if not collection_size(spec, kind):
+            continue
+        for document in chunk_documents(spec, kind, 0):
+            try:
+                model.model_validate(document)
+            except ValidationError as e:
+                raise ValueError(f"Generated {kind} do not match {model.__name__}: {e}") from e
+
+
+def chunks(spec: DatasetSpec) -> List[Tuple[str, int]]:
+    return [
+        (kind, chunk)
+        for kind in KINDS
+        for chunk in range(-(-collection_size(spec, kind) // spec.chunk_size))
+    ]
+
+
+# ============ LOADING ============
+
+_worker_db = None
+
+
+def _init_worker(mongo_url: str, db_name: str):
+    global _worker_db
+    _worker_db = MongoClient(mongo_url, tz_aware=True)[db_name]
+
+
+def _insert_chunk(spec: DatasetSpec, kind: str, chunk: int) -> Tuple[str, int]:
+    documents = chunk_documents(spec, kind, chunk)
+    _worker_db[kind].insert_many(documents, ordered=False)
+    return kind, len(documents)
+
+
+async def _sum_into(db, source: str, group_field: str, value_field: str, target: str, target_field: str):
+    """Set target.target_field to the sum of source.value_field per group_field"""
+    batch = []
+    async for row in db[source].aggregate(
+        [{"$group": {"_id": f"${group_field}", "total": {"$sum": f"${value_field}"}}}], allowDiskUse=True
+    ):
+        batch.append(UpdateOne({"id": row["_id"]}, {"$set": {target_field: round(row["total"], 2)}}))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            await db[target].bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db[target].bulk_write(batch, ordered=False)
+
+
+async def finalize(db) -> Dict[str, Any]:
+    """Build indexes and every piece of state derived from the raw collections"""
+    await ensure_indexes(db)
+    await _sum_into(db, "stakes", "prediction_id", "amount", "predictions", "total_stake")
+    await _sum_into(db, "predictions", "ai_model_id", "total_stake", "ai_models", "total_staked")
+    positions = await rebuild_wallet_positions(db)
+    counters = await VoteTally(db).rebuild_counters()
+    scored = await ReputationEngine(db).rebuild()
+    stats = await reconcile_platform_stats(db)
+    return {**positions, "vote_counters": counters, "scored_predictions": scored,
+            "total_staked": stats["total_staked"]}
+
+
+async def load(db, spec: DatasetSpec, workers: int = 1, mongo_url: Optional[str] = None,
+               drop: bool = False, progress=None) -> Dict[str, int]:
+    """Generate spec into db and rebuild derived state; returns documents written per collection.
+
+    With workers > 1 each worker process opens its own connection to
+    mongo_url and inserts the chunks it generates, so documents never cross
+    process boundaries.
+    """
+    validate_sample(spec)
+    if drop:
+        for name in list(KINDS) + DERIVED:
+            await db[name].drop()
+    elif await db.ai_models.find_one({}, {"_id": 1}):
+        raise RuntimeError(f"{db.name} already has data; pass drop=True (--drop) to replace it")
+
+    written = {kind: 0 for kind in KINDS}
+    work = chunks(spec)
+    if workers <= 1:
+        for kind, chunk in work:
+            documents = chunk_documents(spec, kind, chunk)
+            await db[kind].insert_many(documents, ordered=False)
+            written[kind] += len(documents)
+            if progress:
+                progress(kind, written[kind], collection_size(spec, kind))
+    else:
+        loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(mongo_url, db.name)) as pool:
+            futures = [loop.run_in_executor(pool, _insert_chunk, spec, kind, chunk) for kind, chunk in work]
+            for future in asyncio.as_completed(futures):
+                kind, count = await future
+                written[kind] += count
+                if progress:
+                    progress(kind, written[kind], collection_size(spec, kind))
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic AION dataset into MongoDB")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="demo")
+    for field in ("models", "predictions", "stakes", "wallets", "proposals", "votes", "markets"):
+        parser.add_argument(f"--{field}", type=int, help=f"override the preset's {field} count")
+    parser.add_argument("--seed", type=int, help="default 42")
+    parser.add_argument("--anchor", type=datetime.fromisoformat,
+                        help=f"end of the generated history (ISO date), default {DEFAULT_ANCHOR.date()}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="insert processes")
+    parser.add_argument("--drop", action="store_true", help="replace existing data")
+    args = parser.parse_args()
+
+    overrides = {
+        field: getattr(args, field)
+        for field in ("models", "predictions", "stakes", "wallets", "proposals", "votes", "markets", "seed")
+        if getattr(args, field) is not None
+    }
+    if args.anchor:
+        overrides["anchor"] = args.anchor if args.anchor.tzinfo else args.anchor.replace(tzinfo=timezone.utc)
+    spec = replace(PRESETS[args.preset], **overrides)
+
+    def report(kind: str, done: int, total: int):
+        print(f"\r{kind}: {done}/{total}", end="\n" if done == total else "", flush=True)
+
+    async def main():
+        mongo_url = os.environ["MONGO_URL"]
+        client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+        db = client[os.environ["DB_NAME"]]
+        started = time.perf_counter()
+        written = await load(db, spec, args.workers, mongo_url, args.drop, report)
+        loaded = time.perf_counter() - started
+        print(f"Inserted {sum(written.values())} documents in {loaded:.1f}s "
+              f"({sum(written.values()) / loaded:.0f} docs/s)")
+        derived = await finalize(db)
+        print(f"Rebuilt derived state in {time.perf_counter() - started - loaded:.1f}s: {derived}")
+        client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import dataclasses
+import json
+from datetime import datetime
+from typing import Any, Type, Union, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    if dataclasses.is_dataclass(value):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode JSON the way Pydantic does (UTC datetimes end in Z), with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _is_float(annotation) -> bool:
+    """float, or an Optional/Union whose only number type is float"""
+    if annotation is float:
+        return True
+    return get_origin(annotation) is Union and float in get_args(annotation)
+
+
+def read_model(model: Type[BaseModel]):
+    """A __slots__ dataclass with the fields of `model`, for serializing documents without re-validating them.
+
+    Only use it for documents that were validated against `model` when they
+    were written, and project the query to the model's fields. Mongo keeps
+    whole numbers written to a float field as ints, so those fields are
+    converted back to float the way validation would.
+    """
+    fields = []
+    float_fields = []
+    for name, info in model.model_fields.items():
+        default = None if info.default_factory or info.is_required() else info.default
+        fields.append((name, Any, dataclasses.field(default=default)))
+        if _is_float(info.annotation):
+            float_fields.append(name)
+
+    def __post_init__(self):
+        for name in float_fields:
+            value = getattr(self, name)
+            if type(value) is int:
+                setattr(self, name, float(value))
+
+    namespace = {"__post_init__": __post_init__} if float_fields else {}
+    return dataclasses.make_dataclass(
+        f"{model.__name__}Row", fields, namespace=namespace, slots=True, kw_only=True
+    )
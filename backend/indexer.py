@@ -1,62 +1,402 @@
 import asyncio
+import bisect
+import hashlib
+import json
+import multiprocessing
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+import bson
 from linera_adapter import linera_adapter
+from chain_events import EventLogSource, NodeNotificationSource
+from indexes import ensure_indexes
 from dotenv import load_dotenv
 import os
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 load_dotenv()
 
+def market_document(market: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of a Linera market that are mirrored into MongoDB"""
+    return {
+        "market_id": market["id"],
+        "title": market["title"],
+        "description": market["description"],
+        "category": market["category"],
+        "event_date": market["event_date"],
+        "total_stake_yes": market["total_stake_yes"],
+        "total_stake_no": market["total_stake_no"],
+        "resolved": market["resolved"],
+        "outcome": market.get("outcome"),
+    }
+
+def content_hash(document: Dict[str, Any]) -> str:
+    encoded = json.dumps(document, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
 class LineraIndexer:
-    def __init__(self):
-        self.mongo_client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
-        self.db = self.mongo_client[os.getenv("DB_NAME")]
+    def __init__(self, db=None, adapter=None, chain_id: Optional[str] = None):
+        if db is None:
+            self.mongo_client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+            db = self.mongo_client[os.getenv("DB_NAME")]
+        self.db = db
+        self.adapter = adapter or linera_adapter
         self.markets_collection = self.db.markets
-        self.sync_interval = 15  # seconds
-    
+        self.cursors_collection = self.db.indexer_cursors
+        self.chain_id = chain_id or self.adapter.chain_id
+        # Only name a chain in queries when one was chosen; otherwise the node uses its default chain
+        self.query_chain_id = chain_id or os.getenv("LINERA_CHAIN_ID")
+        self.sync_interval = float(os.getenv("LINERA_SYNC_INTERVAL", "15"))  # seconds
+        self.min_poll_interval = float(os.getenv("LINERA_MIN_POLL_INTERVAL", "1"))  # seconds
+        self.cursor = 0
+        self._hashes: Optional[Dict[Any, str]] = None
+        self.last_cycle: Dict[str, Any] = {}
+
+    async def _load_hashes(self):
+        """Seed the snapshot from what a previous run already wrote"""
+        self._hashes = {}
+        cursor = self.markets_collection.find(
+            {"chain_id": self.chain_id}, {"_id": 0, "market_id": 1, "content_hash": 1}
+        )
+        async for doc in cursor:
+            self._hashes[doc["market_id"]] = doc.get("content_hash")
+
+    async def backfill_chain_id(self):
+        """Key markets mirrored before chain ids were stored under this indexer's chain"""
+        legacy = [
+            doc["market_id"]
+            async for doc in self.markets_collection.find({"chain_id": None}, {"_id": 0, "market_id": 1})
+        ]
+        if not legacy:
+            return
+        # A market already re-synced under its chain id makes the legacy copy stale
+        keyed = [
+            doc["market_id"]
+            async for doc in self.markets_collection.find(
+                {"chain_id": self.chain_id, "market_id": {"$in": legacy}}, {"_id": 0, "market_id": 1}
+            )
+        ]
+        if keyed:
+            await self.markets_collection.delete_many({"chain_id": None, "market_id": {"$in": keyed}})
+        result = await self.markets_collection.update_many({"chain_id": None}, {"$set": {"chain_id": self.chain_id}})
+        print(f"Backfilled chain {self.chain_id} on {result.modified_count} markets ({len(keyed)} stale copies dropped)")
+
     async def sync_markets(self):
-        """Sync Linera state to MongoDB"""
+        """Sync Linera state to MongoDB, writing only markets that changed"""
         try:
-            state = await linera_adapter.query_state()
-            
+            started = time.perf_counter()
+            state = await self.adapter.query_state(chain_id=self.query_chain_id)
+
             if "error" in state:
                 print(f"Error querying state: {state['error']}")
+                self.last_cycle = {"error": state["error"]}
                 return
-            
+
+            if self._hashes is None:
+                await self._load_hashes()
+
             markets = state.get("markets", [])
-            
+            now = datetime.utcnow()
+            operations = []
+            changed_hashes = {}
+            bytes_written = 0
+
             for market in markets:
-                await self.markets_collection.update_one(
-                    {"market_id": market["id"]},
-                    {
-                        "$set": {
-                            "market_id": market["id"],
-                            "title": market["title"],
-                            "description": market["description"],
-                            "category": market["category"],
-                            "event_date": market["event_date"],
-                            "total_stake_yes": market["total_stake_yes"],
-                            "total_stake_no": market["total_stake_no"],
-                            "resolved": market["resolved"],
-                            "outcome": market.get("outcome"),
-                            "last_synced": datetime.utcnow()
-                        }
-                    },
+                document = market_document(market)
+                digest = content_hash(document)
+                if self._hashes.get(document["market_id"]) == digest:
+                    continue
+                document["chain_id"] = self.chain_id
+                document["content_hash"] = digest
+                document["last_synced"] = now
+                operations.append(UpdateOne(
+                    {"chain_id": self.chain_id, "market_id": document["market_id"]},
+                    {"$set": document},
                     upsert=True
-                )
-            
-            print(f"Synced {len(markets)} markets at {datetime.utcnow()}")
-        
+                ))
+                changed_hashes[document["market_id"]] = digest
+                bytes_written += len(bson.encode(document))
+
+            if operations:
+                await self.markets_collection.bulk_write(operations, ordered=False)
+                # Only remember hashes once they are persisted, so failed writes are retried next cycle
+                self._hashes.update(changed_hashes)
+
+            self.last_cycle = {
+                "markets": len(markets),
+                "changed": len(operations),
+                "unchanged": len(markets) - len(operations),
+                "bytes_written": bytes_written,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "synced_at": now,
+            }
+            print(
+                f"Synced {len(markets)} markets ({len(operations)} changed, {bytes_written} bytes) "
+                f"in {self.last_cycle['duration_ms']}ms at {now}"
+            )
+
         except Exception as e:
             print(f"Sync error: {e}")
-    
+            self.last_cycle = {"error": str(e)}
+
+    async def load_cursor(self):
+        doc = await self.cursors_collection.find_one({"_id": self.chain_id})
+        self.cursor = doc["height"] if doc else 0
+
+    async def save_cursor(self, height: int):
+        await self.cursors_collection.update_one(
+            {"_id": self.chain_id},
+            {"$set": {"height": height, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self.cursor = height
+
+    async def apply_block(self, block: Dict[str, Any]):
+        """Apply one block's operations to the mirrored markets, then advance the cursor"""
+        height = block["height"]
+        if block.get("operations") is None:
+            # Bare notification: pull the state and let the diff find what changed
+            await self.sync_markets()
+            await self.save_cursor(height)
+            return
+
+        now = datetime.utcnow()
+        creates = []
+        updates: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+        for operation in block["operations"]:
+            try:
+                (name, params), = operation.items()
+                if name == "CreateMarket":
+                    document = market_document({
+                        **params, "id": params["market_id"],
+                        "total_stake_yes": 0, "total_stake_no": 0, "resolved": False,
+                    })
+                    document["chain_id"] = self.chain_id
+                    creates.append(UpdateOne(
+                        {"chain_id": self.chain_id, "market_id": document["market_id"]},
+                        {"$setOnInsert": document, "$set": {"last_synced": now}},
+                        upsert=True
+                    ))
+                    continue
+                if name == "Stake":
+                    side = "total_stake_yes" if params["prediction"] else "total_stake_no"
+                    change = ("$inc", {side: params["amount"]})
+                elif name == "ResolveMarket":
+                    change = ("$set", {"resolved": True, "outcome": params["outcome"]})
+                else:
+                    change = ("$set", {})
+                update = updates.setdefault(params["market_id"], {"$inc": {}, "$set": {}})
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                # Retrying the block cannot fix it, so one bad operation must not stall the cursor
+                print(f"Skipping malformed operation in block {height}: {operation!r:.200} ({e!r})")
+                continue
+            op, fields = change
+            for field, value in fields.items():
+                update[op][field] = update[op].get(field, 0) + value if op == "$inc" else value
+
+        operations = list(creates)
+        for market_id, update in updates.items():
+            update["$set"].update({"last_height": height, "last_synced": now})
+            update = {k: v for k, v in update.items() if v}
+            update["$unset"] = {"content_hash": ""}
+            # The last_height guard makes replaying a block after a crash a no-op
+            operations.append(UpdateOne(
+                {"chain_id": self.chain_id, "market_id": market_id, "last_height": {"$not": {"$gte": height}}},
+                update
+            ))
+            if self._hashes is not None:
+                self._hashes.pop(market_id, None)
+
+        if operations:
+            result = await self.markets_collection.bulk_write(operations, ordered=True)
+            if result.matched_count + result.upserted_count < len(operations):
+                await self.report_unknown_markets(height, list(updates))
+        await self.save_cursor(height)
+
+    async def report_unknown_markets(self, height: int, market_ids: List[Any]):
+        """Name the markets a block changed that are not mirrored, so their operations were dropped"""
+        known = {
+            m["market_id"] async for m in self.markets_collection.find(
+                {"chain_id": self.chain_id, "market_id": {"$in": market_ids}}, {"_id": 0, "market_id": 1}
+            )
+        }
+        unknown = [market_id for market_id in market_ids if market_id not in known]
+        if unknown:
+            print(f"Block {height} changed markets not mirrored on chain {self.chain_id}, dropped: {unknown}")
+
     async def run(self):
         """Run indexer loop"""
         print("Starting Linera indexer...")
+        await ensure_indexes(self.db, ["markets"])
+        await self.backfill_chain_id()
         while True:
             await self.sync_markets()
             await asyncio.sleep(self.sync_interval)
 
+    async def run_notify(self, source):
+        """Follow chain notifications, polling adaptively whenever the stream is down"""
+        print(f"Starting Linera indexer in notification mode for chain {self.chain_id}...")
+        await ensure_indexes(self.db, ["markets"])
+        await self.backfill_chain_id()
+        await self.load_cursor()
+        poll_interval = self.min_poll_interval
+        while True:
+            try:
+                if not source.replayable:
+                    # Blocks missed while disconnected cannot be replayed, so catch up from state
+                    await self.sync_markets()
+                async for block in source.events(after=self.cursor):
+                    await self.apply_block(block)
+                    poll_interval = self.min_poll_interval
+            except Exception as e:
+                print(f"Notification stream dropped: {e}")
+
+            if source.replayable:
+                # The log is the source of truth; polling state here would double-apply blocks on replay
+                changed = 0
+            else:
+                await self.sync_markets()
+                changed = self.last_cycle.get("changed", 0)
+            poll_interval = self.min_poll_interval if changed else min(poll_interval * 2, self.sync_interval)
+            await asyncio.sleep(poll_interval)
+
+class HashRing:
+    """Consistent-hash ring mapping chain IDs to indexer instances"""
+
+    def __init__(self, members: List[str], vnodes: int = 64):
+        self.members = list(members)
+        self._ring = sorted(
+            (self._hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    def owner(self, key: str) -> str:
+        i = bisect.bisect(self._keys, self._hash(key)) % len(self._ring)
+        return self._ring[i][1]
+
+    def assign(self, keys: List[str], member: str) -> List[str]:
+        return [key for key in keys if self.owner(key) == member]
+
+class ShardedIndexer:
+    """Indexes many chains with a pool of async workers.
+
+    Chains are split between indexer instances with a consistent-hash ring, so
+    instances never index the same chain and adding one only moves ~1/N chains.
+    Within an instance, idle workers pull the next chain off a shared queue.
+    """
+
+    def __init__(self, chain_ids: List[str], db=None, adapter=None,
+                 instance_id: str = "indexer-0", instances: Optional[List[str]] = None, workers: int = 4):
+        if db is None:
+            self.mongo_client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+            db = self.mongo_client[os.getenv("DB_NAME")]
+        self.db = db
+        self.instance_id = instance_id
+        self.ring = HashRing(instances or [instance_id])
+        self.chain_ids = self.ring.assign(chain_ids, instance_id)
+        self.workers = workers
+        self.sync_interval = float(os.getenv("LINERA_SYNC_INTERVAL", "15"))
+        self.indexers = {
+            chain_id: LineraIndexer(db=db, adapter=adapter, chain_id=chain_id) for chain_id in self.chain_ids
+        }
+        self.last_cycle: Dict[str, Any] = {}
+
+    async def _record_sync(self, indexer: LineraIndexer):
+        await self.db.indexer_cursors.update_one(
+            {"_id": indexer.chain_id},
+            {"$set": {
+                "owner": self.instance_id,
+                "last_synced": datetime.utcnow(),
+                "last_cycle": indexer.last_cycle,
+            }},
+            upsert=True
+        )
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            try:
+                chain_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            indexer = self.indexers[chain_id]
+            await indexer.sync_markets()
+            await self._record_sync(indexer)
+
+    async def sync_all(self):
+        """Sync every owned chain once"""
+        started = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+        for chain_id in self.chain_ids:
+            queue.put_nowait(chain_id)
+        await asyncio.gather(*(self._worker(queue) for _ in range(min(self.workers, len(self.chain_ids)))))
+        elapsed = time.perf_counter() - started
+        self.last_cycle = {
+            "chains": len(self.chain_ids),
+            "changed": sum(i.last_cycle.get("changed", 0) for i in self.indexers.values()),
+            "errors": sum(1 for i in self.indexers.values() if "error" in i.last_cycle),
+            "duration_ms": round(elapsed * 1000, 2),
+            "chains_per_sec": round(len(self.chain_ids) / elapsed, 1) if elapsed else 0.0,
+        }
+        print(f"[{self.instance_id}] Synced {len(self.chain_ids)} chains in {self.last_cycle['duration_ms']}ms")
+
+    async def run(self):
+        print(f"Starting sharded indexer {self.instance_id} for {len(self.chain_ids)} chains...")
+        await ensure_indexes(self.db, ["markets"])
+        for indexer in self.indexers.values():
+            # Markets mirrored before chain ids were stored all came from the default chain
+            if indexer.chain_id == indexer.adapter.chain_id:
+                await indexer.backfill_chain_id()
+        while True:
+            await self.sync_all()
+            await asyncio.sleep(self.sync_interval)
+
+def _run_shard_process(chain_ids: List[str], instance_id: str, workers: int):
+    asyncio.run(ShardedIndexer(chain_ids, instance_id=instance_id, workers=workers).run())
+
+def run_sharded(chain_ids: List[str], instance_id: str, instances: List[str], workers: int, processes: int):
+    """Run this instance's share of chains, optionally split across worker processes"""
+    owned = HashRing(instances).assign(chain_ids, instance_id)
+    if processes <= 1:
+        asyncio.run(ShardedIndexer(owned, instance_id=instance_id, workers=workers).run())
+        return
+    sub_ids = [f"{instance_id}/{p}" for p in range(processes)]
+    sub_ring = HashRing(sub_ids)
+    context = multiprocessing.get_context("spawn")
+    procs = [
+        context.Process(target=_run_shard_process, args=(sub_ring.assign(owned, sub_id), sub_id, workers))
+        for sub_id in sub_ids
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+
 if __name__ == "__main__":
+    chain_ids = [c.strip() for c in os.getenv("LINERA_CHAIN_IDS", "").split(",") if c.strip()]
+    if chain_ids:
+        instance_id = os.getenv("INDEXER_INSTANCE_ID", "indexer-0")
+        instances = [i.strip() for i in os.getenv("INDEXER_INSTANCES", instance_id).split(",") if i.strip()]
+        run_sharded(
+            chain_ids,
+            instance_id=instance_id,
+            instances=instances,
+            workers=int(os.getenv("INDEXER_WORKERS", "4")),
+            processes=int(os.getenv("INDEXER_PROCESSES", "1")),
+        )
+        raise SystemExit
+
     indexer = LineraIndexer()
-    asyncio.run(indexer.run())
+    if os.getenv("LINERA_INDEXER_MODE", "poll") == "notify":
+        event_log = os.getenv("LINERA_EVENT_LOG")
+        if event_log:
+            source = EventLogSource(event_log)
+        else:
+            source = NodeNotificationSource(indexer.adapter.rpc_url, indexer.chain_id)
+        asyncio.run(indexer.run_notify(source))
+    else:
+        asyncio.run(indexer.run())
@@ -0,0 +1,69 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Declared indexes per collection, created at startup
+INDEXES: Dict[str, List[IndexModel]] = {
+    "ai_models": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("rank", ASCENDING)], name="rank"),
+        # Leaderboard order, for placing a model after its reputation changes
+        IndexModel([("reputation_score", DESCENDING), ("id", ASCENDING)], name="reputation_score_id"),
+    ],
+    "predictions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination on (created_at, id), optionally narrowed by an equality filter
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="category_created_at_id"),
+        IndexModel([("ai_model_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="ai_model_id_created_at_id"),
+    ],
+    "stakes": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("wallet_address", ASCENDING)], name="wallet_address"),
+        # Settlement walks a prediction's stakes in id order
+        IndexModel([("prediction_id", ASCENDING), ("id", ASCENDING)], name="prediction_id_id"),
+        # Only stakes submitted with an Idempotency-Key carry the field
+        IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key_unique", unique=True, sparse=True),
+        # Write-behind stakes awaiting aggregation, and the stakes of one flush batch
+        IndexModel([("aggregated", ASCENDING), ("flush_batch", ASCENDING)], name="aggregated_flush_batch", sparse=True),
+        IndexModel([("flush_batch", ASCENDING)], name="flush_batch", sparse=True),
+    ],
+    "wallet_positions": [
+        # prediction_id is None on the per-wallet total
+        IndexModel([("wallet_address", ASCENDING), ("prediction_id", ASCENDING)],
+                   name="wallet_address_prediction_id_unique", unique=True),
+        # Settlement chunk guards still held by a wallet
+        IndexModel([("settled_chunks", ASCENDING)], name="settled_chunks", sparse=True),
+    ],
+    "settlements": [
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+    "dao_proposals": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "votes": [
+        # One vote per wallet per proposal
+        IndexModel([("proposal_id", ASCENDING), ("wallet_address", ASCENDING)],
+                   name="proposal_id_wallet_address_unique", unique=True),
+    ],
+    "vote_counters": [
+        IndexModel([("proposal_id", ASCENDING), ("shard", ASCENDING)], name="proposal_id_shard_unique", unique=True),
+    ],
+    "markets": [
+        # Market ids are only unique within the chain that created them
+        IndexModel([("chain_id", ASCENDING), ("market_id", ASCENDING)], name="chain_id_market_id_unique", unique=True),
+    ],
+}
+
+
+async def ensure_indexes(db, collections: Optional[Iterable[str]] = None):
+    """Create every declared index; existing indexes with the same spec are left alone"""
+    for collection in collections or INDEXES:
+        indexes = INDEXES[collection]
+        names = await db[collection].create_indexes(indexes)
+        logger.info(f"Ensured indexes on {collection}: {', '.join(names)}")
@@ -1,49 +1,289 @@
-import subprocess
+import asyncio
 import json
+import logging
 import os
-from typing import Dict, Any
+import re
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
 from dotenv import load_dotenv
 
+from metrics import LINERA_CALL_SECONDS, observe_call
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+MARKET_FIELDS = "id title description category eventDate totalStakeYes totalStakeNo resolved outcome"
+
+def to_camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head[:1].lower() + head[1:] + "".join(part.title() for part in rest)
+
+def to_snake(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+def graphql_field(operation: str, params: Dict[str, Any]) -> str:
+    """Render an operation as a GraphQL mutation field, e.g. stake(marketId: 1, amount: 10)"""
+    args = ", ".join(f"{to_camel(key)}: {json.dumps(value)}" for key, value in params.items())
+    return f"{to_camel(operation)}({args})"
+
+def snake_keys(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {to_snake(k): snake_keys(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [snake_keys(v) for v in value]
+    return value
+
 class LineraAdapter:
     def __init__(self):
         self.app_id = os.getenv("LINERA_APP_ID")
         self.rpc_url = os.getenv("LINERA_RPC_URL", "http://localhost:8080")
         self.chain_id = os.getenv("LINERA_CHAIN_ID", "default")
-    
+        self.binary = os.getenv("LINERA_BIN", "linera")
+        self.call_timeout = float(os.getenv("LINERA_CALL_TIMEOUT", "30"))
+        self.max_concurrency = int(os.getenv("LINERA_MAX_CONCURRENCY", "4"))
+        self.transport = os.getenv("LINERA_TRANSPORT", "cli")  # cli or http
+        self.cli_fallback = os.getenv("LINERA_CLI_FALLBACK", "true").lower() == "true"
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self.metrics = {
+            "calls": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "in_flight": 0,
+            "total_wait_seconds": 0.0,
+            "total_latency_seconds": 0.0,
+            "http_calls": 0,
+            "http_failures": 0,
+            "http_latency_seconds": 0.0,
+            "cli_fallbacks": 0,
+        }
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                base_url=self.rpc_url,
+                timeout=self.call_timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency * 4, keepalive_expiry=60),
+            )
+        return self._http_client
+
+    def application_path(self, chain_id: Optional[str] = None) -> str:
+        return f"/chains/{chain_id or self.chain_id}/applications/{self.app_id}"
+
+    async def _post_graphql(self, query: str, chain_id: Optional[str] = None) -> Dict[str, Any]:
+        """POST a GraphQL document to the node service and return the whole response body"""
+        self.metrics["http_calls"] += 1
+        started_at = time.monotonic()
+        failed = False
+        try:
+            response = await self.http_client.post(self.application_path(chain_id), json={"query": query})
+            response.raise_for_status()
+            body = response.json()
+            failed = bool(body.get("errors"))
+            return body
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if failed:
+                self.metrics["http_failures"] += 1
+            self.metrics["http_latency_seconds"] += time.monotonic() - started_at
+            observe_call(LINERA_CALL_SECONDS, started_at, failed, transport="http")
+
+    async def _graphql(self, query: str, chain_id: Optional[str] = None) -> Dict[str, Any]:
+        """POST a GraphQL document to the node service and return its data"""
+        body = await self._post_graphql(query, chain_id)
+        if body.get("errors"):
+            raise Exception(f"GraphQL error: {body['errors'][0].get('message', body['errors'])}")
+        return body.get("data") or {}
+
+    def set_max_concurrency(self, limit: int):
+        """Change how many CLI processes may run at once; call before any are in flight"""
+        self.max_concurrency = limit
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def close(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def _run_cli(self, args: List[str]) -> Tuple[int, str, str]:
+        """Run a linera CLI command without blocking the event loop"""
+        self.metrics["queue_depth"] += 1
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], self.metrics["queue_depth"])
+        queued_at = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            # Also runs when the caller is cancelled while still queued
+            self.metrics["queue_depth"] -= 1
+        self.metrics["in_flight"] += 1
+        started_at = time.monotonic()
+        self.metrics["total_wait_seconds"] += started_at - queued_at
+        self.metrics["calls"] += 1
+        failed = True
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.binary, *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=self.call_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                # Never leave the child running once nobody is waiting for it
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    # It exited on its own just as the wait gave up
+                    pass
+                await proc.wait()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.metrics["timeouts"] += 1
+                    raise Exception(f"Linera {args[1]} timed out after {self.call_timeout}s")
+                raise
+            if proc.returncode != 0:
+                self.metrics["failures"] += 1
+            failed = proc.returncode != 0
+            return proc.returncode, stdout.decode(), stderr.decode()
+        except Exception:
+            self.metrics["failures"] += 1
+            raise
+        finally:
+            self.metrics["in_flight"] -= 1
+            self.metrics["total_latency_seconds"] += time.monotonic() - started_at
+            observe_call(LINERA_CALL_SECONDS, started_at, failed, transport="cli")
+            self._semaphore.release()
+
     async def call_operation(self, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Send operation to Linera smart contract"""
+        if self.transport == "http":
+            try:
+                data = await self._graphql(f"mutation {{ {graphql_field(operation, params)} }}")
+                return {"success": True, "data": data.get(to_camel(operation))}
+            except httpx.TransportError as e:
+                if not self.cli_fallback:
+                    return {"success": False, "error": str(e)}
+                self.metrics["cli_fallbacks"] += 1
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+        return await self._call_operation_cli(operation, params)
+
+    async def call_operations(self, operations: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Send several operations at once, returning one result per operation"""
+        if self.transport == "http":
+            # Every field of a single mutation document is proposed in the same block
+            fields = " ".join(
+                f"op{i}: {graphql_field(operation, params)}" for i, (operation, params) in enumerate(operations)
+            )
+            try:
+                body = await self._post_graphql(f"mutation {{ {fields} }}")
+            except httpx.TransportError as e:
+                if not self.cli_fallback:
+                    return [{"success": False, "error": str(e)} for _ in operations]
+                self.metrics["cli_fallbacks"] += 1
+            except Exception as e:
+                return [{"success": False, "error": str(e)} for _ in operations]
+            else:
+                return await self._batch_results(operations, body)
+        # The CLI takes one operation per invocation, so the best it can do is run them side by side
+        return list(await asyncio.gather(
+            *(self._call_operation_cli(operation, params) for operation, params in operations)
+        ))
+
+    async def _batch_results(self, operations: List[Tuple[str, Dict[str, Any]]], body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Split a batched mutation response into one result per operation
+
+        Errors are attributed to the operation whose alias heads their path.
+        An operation with neither data nor an error of its own may not have
+        been applied (the node rejected the whole block, or the error carried
+        no path), so it is resubmitted on its own rather than reported as failed.
+        """
+        data = body.get("data") or {}
+        errors = {}
+        for error in body.get("errors") or []:
+            path = error.get("path") or []
+            if path and isinstance(path[0], str) and path[0].startswith("op"):
+                errors.setdefault(path[0], f"GraphQL error: {error.get('message', error)}")
+        results: List[Optional[Dict[str, Any]]] = []
+        retry = []
+        for i, operation in enumerate(operations):
+            alias = f"op{i}"
+            if alias in errors:
+                results.append({"success": False, "error": errors[alias]})
+            elif data.get(alias) is not None or not body.get("errors"):
+                results.append({"success": True, "data": data.get(alias)})
+            else:
+                results.append(None)
+                retry.append(i)
+        if retry:
+            logger.warning(f"Batched mutation failed; resubmitting {len(retry)} of {len(operations)} operations individually")
+            retried = await asyncio.gather(*(self.call_operation(*operations[i]) for i in retry))
+            for i, result in zip(retry, retried):
+                results[i] = result
+        return results
+
+    async def _call_operation_cli(self, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            cmd = [
-                "linera", "client", "call",
+            returncode, stdout, stderr = await self._run_cli([
+                "client", "call",
                 "--application-id", self.app_id,
                 "--operation", operation,
                 "--params", json.dumps(params)
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode != 0:
-                raise Exception(f"Linera call failed: {result.stderr}")
-            
-            return {"success": True, "data": result.stdout}
+            ])
+
+            if returncode != 0:
+                raise Exception(f"Linera call failed: {stderr}")
+
+            return {"success": True, "data": stdout}
         except Exception as e:
             return {"success": False, "error": str(e)}
-    
-    async def query_state(self) -> Dict[str, Any]:
+
+    async def query_state(self, chain_id: Optional[str] = None) -> Dict[str, Any]:
         """Query current state from Linera application"""
+        if self.transport == "http":
+            try:
+                return snake_keys(await self._graphql(
+                    f"query {{ markets {{ {MARKET_FIELDS} }} nextMarketId }}", chain_id=chain_id
+                ))
+            except httpx.TransportError as e:
+                if not self.cli_fallback:
+                    return {"error": str(e)}
+                self.metrics["cli_fallbacks"] += 1
+            except Exception as e:
+                return {"error": str(e)}
+        return await self._query_state_cli(chain_id)
+
+    async def _query_state_cli(self, chain_id: Optional[str] = None) -> Dict[str, Any]:
         try:
-            cmd = ["linera", "client", "query", "--application-id", self.app_id]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode != 0:
-                raise Exception(f"Query failed: {result.stderr}")
-            
-            return json.loads(result.stdout)
+            args = ["client", "query", "--application-id", self.app_id]
+            if chain_id:
+                args += ["--chain-id", chain_id]
+            returncode, stdout, stderr = await self._run_cli(args)
+
+            if returncode != 0:
+                raise Exception(f"Query failed: {stderr}")
+
+            return json.loads(stdout)
         except Exception as e:
             return {"error": str(e)}
-    
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Snapshot of CLI queue and latency metrics"""
+        calls = self.metrics["calls"]
+        return {
+            **self.metrics,
+            "transport": self.transport,
+            "max_concurrency": self.max_concurrency,
+            "avg_wait_seconds": round(self.metrics["total_wait_seconds"] / calls, 4) if calls else 0.0,
+            "avg_latency_seconds": round(self.metrics["total_latency_seconds"] / calls, 4) if calls else 0.0,
+        }
+
     async def create_market(self, title: str, description: str, category: str, event_date: int):
         """Create new prediction market"""
         return await self.call_operation("CreateMarket", {
@@ -52,7 +292,7 @@ class LineraAdapter:
             "category": category,
             "event_date": event_date
         })
-    
+
     async def stake(self, market_id: int, amount: int, prediction: bool):
         """Stake on a market"""
         return await self.call_operation("Stake", {
@@ -60,7 +300,7 @@ class LineraAdapter:
             "amount": amount,
             "prediction": prediction
         })
-    
+
     async def resolve_market(self, market_id: int, outcome: bool):
         """Resolve market with outcome"""
         return await self.call_operation("ResolveMarket", {
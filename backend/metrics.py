@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, GCCollector, Gauge, Histogram, PlatformCollector,
+    ProcessCollector, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Seconds between event-loop lag samples
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+# Allow per-request sampling profiles via the X-Profile header
+PROFILING_ENABLED = os.getenv("METRICS_PROFILING", "false").lower() == "true"
+PROFILE_INTERVAL = float(os.getenv("METRICS_PROFILE_INTERVAL_MS", "1")) / 1000
+# Profiles kept for /metrics/profiles
+PROFILE_HISTORY = 20
+
+# Our own registry, so importing this module twice (tests, reloads) never double-registers
+registry = CollectorRegistry()
+ProcessCollector(registry=registry)
+PlatformCollector(registry=registry)
+GCCollector(registry=registry)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "aion_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+HTTP_IN_FLIGHT = Gauge("aion_http_requests_in_flight", "HTTP requests being served", registry=registry)
+MONGO_COMMAND_SECONDS = Histogram(
+    "aion_mongo_command_duration_seconds", "MongoDB command latency as reported by the driver",
+    ["command", "outcome"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+HERMES_REQUEST_SECONDS = Histogram(
+    "aion_hermes_request_duration_seconds", "Outbound Pyth Hermes request latency",
+    ["outcome"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+LINERA_CALL_SECONDS = Histogram(
+    "aion_linera_call_duration_seconds", "Outbound Linera call latency, excluding time queued for a slot",
+    ["transport", "outcome"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+LOOP_LAG_SECONDS = Histogram(
+    "aion_event_loop_lag_seconds", "How late the event loop woke a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0), registry=registry,
+)
+
+
+def observe_call(histogram: Histogram, started_at: float, failed: bool, **labels):
+    """Record an outbound call that started at started_at (time.monotonic())"""
+    histogram.labels(outcome="error" if failed else "ok", **labels).observe(time.monotonic() - started_at)
+
+
+# ============ MONGO COMMANDS ============
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command the driver sends; pass it as event_listeners to the client"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.labels(command=event.command_name, outcome="ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.labels(command=event.command_name, outcome="error").observe(event.duration_micros / 1e6)
+
+
+mongo_listener = MongoCommandListener()
+
+
+# ============ EXISTING STATS ============
+
+def metric_name(*parts: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(("aion",) + parts)).lower()
+
+
+def numeric_fields(stats: Dict[str, Any], prefix: str = "") -> Iterable:
+    """(name, value) for numeric entries, flattening nested dicts"""
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from numeric_fields(value, f"{name}_")
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+
+
+class StatsCollector:
+    """Exposes the numeric fields of each component's get_stats() as gauges, read at scrape time"""
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def add(self, component: str, get_stats: Callable[[], Dict[str, Any]]):
+        self.sources[component] = get_stats
+
+    def collect(self):
+        for component, get_stats in self.sources.items():
+            try:
+                stats = get_stats()
+            except Exception as e:
+                logger.warning(f"Could not read {component} stats: {e}")
+                continue
+            for name, value in numeric_fields(stats):
+                yield GaugeMetricFamily(metric_name(component, name), f"{component} {name}", value=value)
+
+
+stats_collector = StatsCollector()
+registry.register(stats_collector)
+
+
+# ============ EVENT LOOP LAG ============
+
+class LoopLagMonitor:
+    """Sleeps for a fixed interval and records how much later than that it woke up"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(time.perf_counter() - started_at - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, self.last_lag)
+            LOOP_LAG_SECONDS.observe(self.last_lag)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"last_lag_seconds": round(self.last_lag, 6), "max_lag_seconds": round(self.max_lag, 6)}
+
+
+loop_lag_monitor = LoopLagMonitor()
+stats_collector.add("event_loop", loop_lag_monitor.get_stats)
+
+
+# ============ SAMPLING PROFILER ============
+
+def collapsed_stack(frame) -> str:
+    """root;...;leaf in the folded format flamegraph.pl and speedscope read"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a helper thread while a request runs.
+
+    The loop thread runs every task, so a profile also catches whatever other
+    requests were doing at the time; profile one request on a quiet instance
+    for a clean picture. Only one profile runs at a time.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, history: int = PROFILE_HISTORY):
+        self.interval = interval
+        self.history = history
+        self.profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._busy = threading.Lock()
+
+    def start(self) -> Optional[Callable[[str, str], None]]:
+        """Begin sampling the calling thread; returns a finish(profile_id, label) callable, or None if busy"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        target = threading.get_ident()
+        samples: Counter = Counter()
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                frame = sys._current_frames().get(target)
+                if frame is not None:
+                    samples[collapsed_stack(frame)] += 1
+
+        sampler = threading.Thread(target=sample, name="metrics-profiler", daemon=True)
+        started_at = time.perf_counter()
+        sampler.start()
+
+        def finish(profile_id: str, label: str):
+            done.set()
+            sampler.join()
+            self._busy.release()
+            self.profiles[profile_id] = {
+                "label": label,
+                "duration_seconds": round(time.perf_counter() - started_at, 6),
+                "samples": sum(samples.values()),
+                "stacks": samples,
+            }
+            while len(self.profiles) > self.history:
+                self.profiles.popitem(last=False)
+
+        return finish
+
+    def folded(self, profile_id: str) -> Optional[str]:
+        profile = self.profiles.get(profile_id)
+        if profile is None:
+            return None
+        return "\n".join(f"{stack} {count}" for stack, count in profile["stacks"].most_common()) + "\n"
+
+    def list(self):
+        return [
+            {"id": profile_id, **{k: v for k, v in profile.items() if k != "stacks"}}
+            for profile_id, profile in reversed(self.profiles.items())
+        ]
+
+
+profiler = SamplingProfiler()
+
+
+# ============ HTTP ============
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency labelled by route template.
+
+    Labels use the matched route's path ("/api/predictions/{prediction_id}"),
+    so cardinality stays bounded by the number of routes. With profiling
+    enabled, a request sent with "X-Profile: 1" is sampled and answered with
+    an X-Profile-Id header naming its profile under /metrics/profiles.
+    """
+
+    def __init__(self, app, profiling: bool = PROFILING_ENABLED):
+        self.app = app
+        self.profiling = profiling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        finish = None
+        if self.profiling and (b"x-profile", b"1") in scope["headers"]:
+            finish = profiler.start()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if finish is not None:
+                    message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profile_id = uuid.uuid4().hex[:12] if finish is not None else ""
+        HTTP_IN_FLIGHT.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"], route=route_path, status=str(status)
+            ).observe(time.perf_counter() - started_at)
+            if finish is not None:
+                finish(profile_id, f"{scope['method']} {scope['path']}")
+
+
+def render() -> tuple:
+    """Body and content type of the Prometheus text exposition"""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 1000
+
+
+async def migrate_prediction_dates(db) -> int:
+    """Convert ISO-string prediction dates left by older seeds into native BSON dates; returns predictions converted.
+
+    The $type filter can't use an index, so this scans predictions once; run it
+    after upgrading a database seeded before dates were stored natively.
+    """
+    string_dates = {"$or": [{"created_at": {"$type": "string"}}, {"event_date": {"$type": "string"}}]}
+    converted = 0
+    updates = []
+    async for pred in db.predictions.find(string_dates, {"_id": 1, "created_at": 1, "event_date": 1}):
+        dates = {
+            field: datetime.fromisoformat(pred[field])
+            for field in ("created_at", "event_date")
+            if isinstance(pred.get(field), str)
+        }
+        updates.append(UpdateOne({"_id": pred["_id"]}, {"$set": dates}))
+        if len(updates) >= MIGRATION_BATCH_SIZE:
+            await db.predictions.bulk_write(updates, ordered=False)
+            converted += len(updates)
+            updates = []
+    if updates:
+        await db.predictions.bulk_write(updates, ordered=False)
+        converted += len(updates)
+    logger.info(f"Converted dates on {converted} predictions")
+    return converted
+
+
+MIGRATIONS = {"prediction-dates": migrate_prediction_dates}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2 or sys.argv[1] not in MIGRATIONS:
+        print(f"Usage: python migrations.py {{{','.join(MIGRATIONS)}}}")
+        sys.exit(1)
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"], tz_aware=True)
+        converted = await MIGRATIONS[sys.argv[1]](client[os.environ["DB_NAME"]])
+        print(f"Migrated {converted} documents")
+        client.close()
+
+    asyncio.run(main())
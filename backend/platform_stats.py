@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "global"
+
+RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "300"))  # seconds
+RECONCILE_LEASE_ID = "platform_stats_reconcile"
+RECONCILE_ATTEMPTS = 3
+COUNTERS = ("total_predictions", "active_predictions", "total_staked", "total_ai_models", "accuracy_sum")
+
+
+async def reconcile_platform_stats(db) -> Dict[str, Any]:
+    """Recompute the platform_stats document from the source collections.
+
+    The counters are read before the recount and the write is conditional on
+    them being unchanged, so an increment that lands during the recount makes
+    the write miss and the recount is retried rather than overwriting it.
+    """
+    for _ in range(RECONCILE_ATTEMPTS):
+        current = await db.platform_stats.find_one({"_id": STATS_ID}, {c: 1 for c in COUNTERS})
+        stats = await count_platform_stats(db)
+        if current is None:
+            try:
+                await db.platform_stats.insert_one({"_id": STATS_ID, **stats})
+                return stats
+            except DuplicateKeyError:
+                continue
+        # $set rather than a replace, so the write-behind buffer's batch guards survive
+        result = await db.platform_stats.update_one(
+            {"_id": STATS_ID, **{c: current.get(c) for c in COUNTERS}}, {"$set": stats}
+        )
+        if result.matched_count:
+            return stats
+    logger.warning(f"Platform stats kept changing during {RECONCILE_ATTEMPTS} recounts; leaving them to the next run")
+    return stats
+
+
+async def count_platform_stats(db) -> Dict[str, Any]:
+    total_predictions = await db.predictions.count_documents({})
+    active_predictions = await db.predictions.count_documents({"status": "active"})
+    stakes = await db.predictions.aggregate([
+        {"$group": {"_id": None, "total_staked": {"$sum": "$total_stake"}}}
+    ]).to_list(1)
+    models = await db.ai_models.aggregate([
+        {"$group": {"_id": None, "count": {"$sum": 1}, "accuracy_sum": {"$sum": "$accuracy_rate"}}}
+    ]).to_list(1)
+    return {
+        "total_predictions": total_predictions,
+        "active_predictions": active_predictions,
+        "total_staked": stakes[0]["total_staked"] if stakes else 0.0,
+        "total_ai_models": models[0]["count"] if models else 0,
+        "accuracy_sum": models[0]["accuracy_sum"] if models else 0.0,
+        "reconciled_at": datetime.now(timezone.utc),
+    }
+
+
+async def load_platform_stats(db) -> Dict[str, Any]:
+    """Read the materialized stats, building them on first use"""
+    stats = await db.platform_stats.find_one({"_id": STATS_ID})
+    if stats is None or "reconciled_at" not in stats:
+        # Increments upsert the document, so it can exist before it was ever counted
+        stats = await reconcile_platform_stats(db)
+    return stats
+
+
+async def record_stake(db, amount: float, session=None):
+    await db.platform_stats.update_one(
+        {"_id": STATS_ID}, {"$inc": {"total_staked": amount}}, upsert=True, session=session
+    )
+
+
+async def record_resolution(db, prediction_id: str, was_active: bool, accuracy_delta: float = 0.0):
+    """A prediction resolved; accuracy_delta is the change in its model's accuracy_rate.
+
+    The prediction id guards the increment until release_resolution(), so a
+    retried resolution is counted once.
+    """
+    update = {"accuracy_sum": accuracy_delta}
+    if was_active:
+        update["active_predictions"] = -1
+    try:
+        await db.platform_stats.update_one(
+            {"_id": STATS_ID, "resolving": {"$ne": prediction_id}},
+            {"$inc": update, "$push": {"resolving": prediction_id}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The guard matched: this resolution was already counted
+        pass
+
+
+async def release_resolution(db, prediction_id: str):
+    await db.platform_stats.update_one({"_id": STATS_ID}, {"$pull": {"resolving": prediction_id}})
+
+
+async def acquire_lease(db, lease_id: str, owner: str, duration: float) -> bool:
+    """Take or renew a lease held in the leases collection; False while another owner holds it"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.leases.update_one(
+            {"_id": lease_id, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=duration)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The filter missed because the lease is live and someone else's
+        return False
+    return True
+
+
+async def run_reconciliation(db, interval: float = RECONCILE_INTERVAL, owner: Optional[str] = None):
+    """Periodically rebuild the stats so any drift from missed increments is corrected.
+
+    Every worker runs this loop, but only the holder of the reconcile lease
+    recounts; the lease outlives two intervals, so a crashed leader is
+    replaced within that.
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while True:
+        try:
+            if await acquire_lease(db, RECONCILE_LEASE_ID, owner, interval * 2):
+                await reconcile_platform_stats(db)
+        except Exception as e:
+            logger.error(f"Platform stats reconciliation failed: {e}")
+        await asyncio.sleep(interval)
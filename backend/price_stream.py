@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+import httpx
+import numpy as np
+
+from pyth_cache import pyth_cache, PYTH_PRICE_IDS, HERMES_URL, normalize_feed_id, parse_price_updates
+
+logger = logging.getLogger(__name__)
+
+
+class PriceRingBuffer:
+    """Fixed-size buffer of the last N ticks for one feed"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.conf = np.zeros(capacity, dtype=np.float64)
+        self.publish_time = np.zeros(capacity, dtype=np.int64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, price: float, conf: float, publish_time: int):
+        self.price[self._next] = price
+        self.conf[self._next] = conf
+        self.publish_time[self._next] = publish_time
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        if not self._count:
+            return None
+        i = (self._next - 1) % self.capacity
+        return {
+            "price": float(self.price[i]),
+            "conf": float(self.conf[i]),
+            "publish_time": int(self.publish_time[i]),
+        }
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Return copies of the buffered ticks, oldest first"""
+        order = (np.arange(self._count) + self._next - self._count) % self.capacity
+        return {
+            "price": self.price[order],
+            "conf": self.conf[order],
+            "publish_time": self.publish_time[order],
+        }
+
+
+class SSEDecoder:
+    """Incremental decoder for text/event-stream chunks"""
+
+    def __init__(self):
+        self._buffer = ""
+        self._data: List[str] = []
+
+    def feed(self, chunk: str) -> Iterator[str]:
+        """Consume a chunk and yield the data of every completed event"""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            line = line.rstrip("\r")
+            if not line:
+                if self._data:
+                    yield "\n".join(self._data)
+                    self._data = []
+            elif line.startswith("data:"):
+                self._data.append(line[5:].lstrip(" "))
+            # Comments (":") and other fields (event, id, retry) are ignored
+
+
+class HermesPriceStream:
+    """Long-running subscriber to the Hermes price-update stream"""
+
+    def __init__(self):
+        self.hermes_url = HERMES_URL
+        self.capacity = int(os.getenv("PYTH_STREAM_BUFFER_SIZE", "1024"))
+        self.reconnect_delay = float(os.getenv("PYTH_STREAM_RECONNECT_DELAY", "1"))
+        self.symbols = {normalize_feed_id(feed_id): symbol for symbol, feed_id in PYTH_PRICE_IDS.items()}
+        self.buffers = {symbol: PriceRingBuffer(self.capacity) for symbol in self.symbols.values()}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"events": 0, "ticks": 0, "decode_errors": 0, "reconnects": 0}
+
+    def handle_event(self, data: str):
+        """Decode one stream event and record its ticks"""
+        try:
+            items = json.loads(data).get("parsed") or []
+            records = parse_price_updates(items)
+        except (ValueError, KeyError, TypeError) as e:
+            self.stats["decode_errors"] += 1
+            logger.warning(f"Undecodable Hermes stream event: {e}")
+            return
+
+        self.stats["events"] += 1
+        for feed_id, record in records.items():
+            symbol = self.symbols.get(feed_id)
+            if symbol is None:
+                continue
+            self.buffers[symbol].append(record["price"], record["conf"], record["publish_time"])
+            pyth_cache.put(feed_id, record)
+            self.stats["ticks"] += 1
+
+    def latest(self, symbol: str) -> Optional[Dict[str, Any]]:
+        buffer = self.buffers.get(symbol.upper())
+        return buffer.latest() if buffer else None
+
+    def history(self, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        buffer = self.buffers.get(symbol.upper())
+        return buffer.snapshot() if buffer else None
+
+    async def consume(self, chunks):
+        """Feed an async iterator of text chunks through the decoder"""
+        decoder = SSEDecoder()
+        async for chunk in chunks:
+            for data in decoder.feed(chunk):
+                self.handle_event(data)
+
+    async def run(self):
+        """Subscribe to Hermes and reconnect whenever the stream drops"""
+        params = [("ids[]", feed_id) for feed_id in self.symbols] + [("parsed", "true")]
+        while True:
+            try:
+                async with httpx.AsyncClient(base_url=self.hermes_url, timeout=None) as client:
+                    async with client.stream("GET", "/v2/updates/price/stream", params=params) as response:
+                        response.raise_for_status()
+                        logger.info("Connected to Hermes price stream")
+                        await self.consume(response.aiter_text())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Hermes stream error: {e}")
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def replay(self, path: Path, interval: float = 0.0):
+        """Replay a recorded event stream from a local file"""
+        async def chunks():
+            with open(path) as f:
+                for line in f:
+                    yield line
+                    if interval and not line.strip():
+                        await asyncio.sleep(interval)
+
+        await self.consume(chunks())
+
+    def start(self):
+        """Start the stream subscriber in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "buffered_ticks": {symbol: len(buffer) for symbol, buffer in self.buffers.items()},
+        }
+
+
+price_stream = HermesPriceStream()
+
+if __name__ == "__main__":
+    import sys
+
+    async def main():
+        """Replay a fixture file when given one, otherwise follow the live stream"""
+        if len(sys.argv) > 1:
+            await price_stream.replay(Path(sys.argv[1]), interval=0.4)
+        else:
+            price_stream.start()
+            await asyncio.sleep(5)
+        for symbol in price_stream.buffers:
+            print(symbol, price_stream.latest(symbol))
+        await price_stream.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Any, Iterable, List, Optional
+
+import httpx
+import numpy as np
+
+from metrics import HERMES_REQUEST_SECONDS, observe_call
+
+logger = logging.getLogger(__name__)
+
+HERMES_URL = os.getenv("HERMES_URL", "https://hermes.pyth.network")
+
+PYTH_PRICE_IDS = {
+    "BTC/USD": "0xe62df6c8b4a85fe1a67db44dc12de5db330f7ac66b72dc658afedf0f4a415b43",
+    "ETH/USD": "0xff61491a931112ddf1bd8147cd1b641375f79f5825126d665480874634fd0ace",
+    "SOL/USD": "0xef0d8b6fda2ceba41da15d4095d1da392a0d2f8ed0c6c7bc0f4cfac8c280b56d",
+    "BNB/USD": "0x2f95862b045670cd22bee3114c39763a4a08beeb663b145d283c31d7d1101c4f",
+}
+
+# Extra feeds as "SYMBOL=0xfeedid,SYMBOL=0xfeedid"
+for _entry in filter(None, os.getenv("PYTH_EXTRA_FEEDS", "").split(",")):
+    _symbol, _, _feed_id = _entry.partition("=")
+    PYTH_PRICE_IDS[_symbol.strip().upper()] = _feed_id.strip()
+
+LIVE_SYMBOLS = [
+    s.strip().upper()
+    for s in os.getenv("PYTH_LIVE_SYMBOLS", "BTC/USD,ETH/USD,SOL/USD,BNB/USD").split(",")
+    if s.strip()
+]
+
+
+def normalize_feed_id(feed_id: str) -> str:
+    return "0x" + feed_id.lower().removeprefix("0x")
+
+
+def parse_price_updates(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Convert Hermes `parsed` entries into price records keyed by feed ID"""
+    if not items:
+        return {}
+    raw = np.array(
+        [(float(i["price"]["price"]), float(i["price"]["conf"]), i["price"]["expo"], i["price"]["publish_time"])
+         for i in items],
+        dtype=np.float64,
+    )
+    scale = np.power(10.0, raw[:, 2])
+    prices = raw[:, 0] * scale
+    confs = raw[:, 1] * scale
+    return {
+        normalize_feed_id(item["id"]): {
+            "price": float(price),
+            "conf": float(conf),
+            "expo": int(expo),
+            "publish_time": int(publish_time),
+        }
+        for item, price, conf, expo, publish_time in zip(items, prices, confs, raw[:, 2], raw[:, 3])
+    }
+
+
+def parse_price_update(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a single Hermes `parsed` entry into a price record"""
+    return next(iter(parse_price_updates([item]).values()))
+
+
+class PythPriceCache:
+    """In-process cache of Hermes prices keyed by Pyth feed ID"""
+
+    def __init__(self):
+        self.hermes_url = HERMES_URL
+        self.ttl = float(os.getenv("PYTH_CACHE_TTL", "5"))
+        self.refresh_interval = float(os.getenv("PYTH_REFRESH_INTERVAL", "2"))
+        self.request_timeout = float(os.getenv("PYTH_REQUEST_TIMEOUT", "10"))
+        self.tracked_ids = [normalize_feed_id(f) for f in PYTH_PRICE_IDS.values()]
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "refreshes": 0,
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.hermes_url,
+                timeout=self.request_timeout,
+                limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=60),
+            )
+        return self._client
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.monotonic() - entry["fetched_at"] < self.ttl
+
+    def put(self, feed_id: str, record: Dict[str, Any]):
+        """Store a price record for a feed"""
+        self._entries[normalize_feed_id(feed_id)] = {"record": record, "fetched_at": time.monotonic()}
+
+    async def get(self, feed_id: str) -> Optional[Dict[str, Any]]:
+        """Return the latest price for a feed, fetching it when missing or stale"""
+        return (await self.get_many([feed_id])).get(normalize_feed_id(feed_id))
+
+    async def get_many(self, feed_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return prices for several feeds, fetching every missing or stale one in a single request"""
+        records: Dict[str, Dict[str, Any]] = {}
+        fallback: Dict[str, Dict[str, Any]] = {}
+        to_fetch: List[str] = []
+
+        for feed_id in dict.fromkeys(normalize_feed_id(f) for f in feed_ids):
+            entry = self._entries.get(feed_id)
+            if entry is not None and self._is_fresh(entry):
+                self.stats["hits"] += 1
+                records[feed_id] = entry["record"]
+                continue
+            if entry is None:
+                self.stats["misses"] += 1
+            else:
+                self.stats["stale"] += 1
+                fallback[feed_id] = entry["record"]
+            to_fetch.append(feed_id)
+
+        if not to_fetch:
+            return records
+
+        try:
+            fetched = await self._fetch_single_flight(to_fetch)
+        except Exception:
+            if not fallback:
+                raise
+            logger.warning(f"Serving stale Pyth prices for {list(fallback)}")
+            fetched = fallback
+
+        for feed_id in to_fetch:
+            record = fetched.get(feed_id, fallback.get(feed_id))
+            if record is not None:
+                records[feed_id] = record
+        return records
+
+    async def _fetch_single_flight(self, feed_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        pending = {self._inflight[f] for f in feed_ids if f in self._inflight}
+        missing = [f for f in feed_ids if f not in self._inflight]
+        if missing:
+            future = asyncio.ensure_future(self._fetch(missing))
+            for feed_id in missing:
+                self._inflight[feed_id] = future
+
+            def release(_):
+                for feed_id in missing:
+                    self._inflight.pop(feed_id, None)
+
+            future.add_done_callback(release)
+            pending.add(future)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        # Shield so a cancelled caller does not cancel the fetch for everyone else
+        for batch in await asyncio.gather(*(asyncio.shield(f) for f in pending)):
+            results.update(batch)
+        return results
+
+    async def _fetch(self, feed_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        self.stats["upstream_calls"] += 1
+        started_at = time.monotonic()
+        try:
+            response = await self.client.get(
+                "/v2/updates/price/latest", params=[("ids[]", feed_id) for feed_id in feed_ids]
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            self.stats["upstream_errors"] += 1
+            observe_call(HERMES_REQUEST_SECONDS, started_at, failed=True)
+            raise
+        observe_call(HERMES_REQUEST_SECONDS, started_at, failed=False)
+
+        records = parse_price_updates(data.get("parsed") or [])
+        for feed_id, record in records.items():
+            self.put(feed_id, record)
+        return records
+
+    async def refresh_all(self):
+        """Refresh every tracked feed"""
+        await self._fetch_single_flight(self.tracked_ids)
+        self.stats["refreshes"] += 1
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh_all()
+            except Exception as e:
+                logger.error(f"Pyth refresh error: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start the background refresher"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stop the background refresher and close the HTTP client"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["stale"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "cached_feeds": len(self._entries),
+            "ttl_seconds": self.ttl,
+        }
+
+
+pyth_cache = PythPriceCache()
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Share of the reputation score that comes from accuracy; the rest is calibration (1 - Brier)
+ACCURACY_WEIGHT = float(os.getenv("REPUTATION_ACCURACY_WEIGHT", "0.5"))
+REBUILD_CHUNK_SIZE = 100_000
+
+SCORED_OUTCOMES = ("correct", "incorrect")
+RESOLVED_FILTER = {"status": "resolved", "outcome": {"$in": list(SCORED_OUTCOMES)}}
+
+
+@dataclass
+class ModelScore:
+    """Running totals for one model; every derived field is computed from these"""
+    predictions: int = 0
+    correct: int = 0
+    # Brier terms weighted by 1 + total_stake, so every prediction counts and large stakes count more
+    brier_weight: float = 0.0
+    brier_sum: float = 0.0
+
+    @property
+    def accuracy(self) -> float:
+        return self.correct / self.predictions if self.predictions else 0.0
+
+    @property
+    def brier(self) -> float:
+        return self.brier_sum / self.brier_weight if self.brier_weight else 1.0
+
+    @property
+    def reputation(self) -> float:
+        if not self.predictions:
+            return 0.0
+        return 100 * (ACCURACY_WEIGHT * self.accuracy + (1 - ACCURACY_WEIGHT) * (1 - self.brier))
+
+    def document(self) -> Dict[str, Any]:
+        return {
+            "total_predictions": self.predictions,
+            "correct_predictions": self.correct,
+            "accuracy_rate": round(100 * self.accuracy, 2),
+            "brier_score": round(self.brier, 4),
+            "brier_weight": self.brier_weight,
+            "brier_sum": self.brier_sum,
+            "reputation_score": round(self.reputation, 2),
+        }
+
+
+def score_columns(model_codes: np.ndarray, confidence: np.ndarray, stake: np.ndarray,
+                  correct: np.ndarray, n_models: int) -> Dict[str, np.ndarray]:
+    """Per-model totals over columnar arrays of resolved predictions"""
+    weight = 1.0 + np.maximum(stake, 0.0)
+    squared_error = (confidence - correct) ** 2
+    return {
+        "predictions": np.bincount(model_codes, minlength=n_models),
+        "correct": np.bincount(model_codes, weights=correct, minlength=n_models),
+        "brier_weight": np.bincount(model_codes, weights=weight, minlength=n_models),
+        "brier_sum": np.bincount(model_codes, weights=weight * squared_error, minlength=n_models),
+    }
+
+
+class ReputationEngine:
+    """Keeps model reputation and rank in step with resolved predictions.
+
+    rebuild() recomputes every model from history; record_resolution() folds
+    in one prediction. The running totals live on the ai_models documents and
+    are only ever incremented there, so any number of workers can record
+    resolutions; derived fields are recomputed from what the increment
+    returned, and only the models between a model's old and new rank get a
+    new rank written.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def load(self):
+        """Rebuild from predictions if some model's totals were never computed"""
+        if await self.db.ai_models.find_one({"brier_weight": {"$exists": False}}, {"_id": 1}):
+            await self.rebuild()
+
+    async def rebuild(self) -> int:
+        """Recompute every model from all resolved predictions; returns how many were scored"""
+        model_ids = [m["id"] async for m in self.db.ai_models.find({}, {"_id": 0, "id": 1})]
+        codes = {model_id: i for i, model_id in enumerate(model_ids)}
+        totals = {k: np.zeros(len(model_ids)) for k in ("predictions", "correct", "brier_weight", "brier_sum")}
+
+        scored = 0
+        cursor = self.db.predictions.find(
+            RESOLVED_FILTER, {"_id": 0, "ai_model_id": 1, "confidence_score": 1, "total_stake": 1, "outcome": 1},
+            batch_size=10_000
+        )
+        while True:
+            chunk = await cursor.to_list(REBUILD_CHUNK_SIZE)
+            if not chunk:
+                break
+            rows = [p for p in chunk if p.get("ai_model_id") in codes]
+            if rows:
+                chunk_totals = score_columns(
+                    np.fromiter((codes[p["ai_model_id"]] for p in rows), dtype=np.int64, count=len(rows)),
+                    np.fromiter((p.get("confidence_score", 0.0) for p in rows), dtype=np.float64, count=len(rows)),
+                    np.fromiter((p.get("total_stake", 0.0) for p in rows), dtype=np.float64, count=len(rows)),
+                    np.fromiter((p["outcome"] == "correct" for p in rows), dtype=np.float64, count=len(rows)),
+                    len(model_ids),
+                )
+                for key, values in chunk_totals.items():
+                    totals[key] += values
+                scored += len(rows)
+
+        documents = {
+            model_id: ModelScore(
+                int(totals["predictions"][i]), int(totals["correct"][i]),
+                float(totals["brier_weight"][i]), float(totals["brier_sum"][i]),
+            ).document()
+            for model_id, i in codes.items()
+        }
+        leaderboard = sorted(documents, key=lambda model_id: (-documents[model_id]["reputation_score"], model_id))
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne({"id": model_id}, {"$set": {**documents[model_id], "rank": rank, "updated_at": now}})
+            for rank, model_id in enumerate(leaderboard, start=1)
+        ]
+        if operations:
+            await self.db.ai_models.bulk_write(operations, ordered=False)
+        logger.info(f"Rebuilt reputation for {len(model_ids)} models from {scored} resolved predictions")
+        return scored
+
+    async def record_resolution(self, prediction: Dict[str, Any]) -> Optional[float]:
+        """Fold one newly resolved prediction into its model; returns the change in accuracy_rate"""
+        model_id = prediction.get("ai_model_id")
+        if prediction.get("outcome") not in SCORED_OUTCOMES or model_id is None:
+            return None
+
+        totals = score_columns(
+            np.zeros(1, dtype=np.int64),
+            np.array([prediction.get("confidence_score", 0.0)]),
+            np.array([prediction.get("total_stake", 0.0)]),
+            np.array([prediction["outcome"] == "correct"], dtype=np.float64),
+            1,
+        )
+        increments = {
+            "total_predictions": 1,
+            "correct_predictions": int(totals["correct"][0]),
+            "brier_weight": float(totals["brier_weight"][0]),
+            "brier_sum": float(totals["brier_sum"][0]),
+        }
+        projection = {"_id": 0, "rank": 1, **{field: 1 for field in increments}}
+        # The prediction id stays on the model until release(), so a retried resolution is counted once
+        model = await self.db.ai_models.find_one_and_update(
+            {"id": model_id, "resolving": {"$ne": prediction["id"]}},
+            {"$inc": increments, "$push": {"resolving": prediction["id"]}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if model is None:
+            # Either no such model, or an earlier attempt already counted it; finish the derived fields
+            model = await self.db.ai_models.find_one({"id": model_id}, projection)
+            if model is None:
+                return None
+
+        score = ModelScore(model["total_predictions"], model["correct_predictions"],
+                           model["brier_weight"], model["brier_sum"])
+        previous = ModelScore(score.predictions - 1, score.correct - increments["correct_predictions"])
+        document = score.document()
+        # Guarded by the count, so a worker that lost the race never overwrites a newer worker's fields
+        updated = await self.db.ai_models.update_one(
+            {"id": model_id, "total_predictions": score.predictions},
+            {"$set": {**document, "updated_at": datetime.now(timezone.utc)}}
+        )
+        if updated.modified_count:
+            await self._rerank(model_id, document["reputation_score"], model.get("rank"))
+        return round(100 * score.accuracy, 2) - round(100 * previous.accuracy, 2)
+
+    async def release(self, prediction: Dict[str, Any]):
+        """Drop the retry guard record_resolution left on the model once the resolution is recorded"""
+        await self.db.ai_models.update_one(
+            {"id": prediction.get("ai_model_id")}, {"$pull": {"resolving": prediction["id"]}}
+        )
+
+    async def _rerank(self, model_id: str, reputation: float, old_rank: Optional[int]):
+        """Rewrite the ranks of the models between model_id's old and new place"""
+        new_rank = 1 + await self.db.ai_models.count_documents({"$or": [
+            {"reputation_score": {"$gt": reputation}},
+            {"reputation_score": reputation, "id": {"$lt": model_id}},
+        ]})
+        if old_rank is None:
+            old_rank = await self.db.ai_models.count_documents({})
+        low, high = sorted((old_rank, new_rank))
+        window = await self.db.ai_models.find({}, {"_id": 0, "id": 1, "rank": 1}).sort(
+            [("reputation_score", DESCENDING), ("id", ASCENDING)]
+        ).skip(low - 1).limit(high - low + 1).to_list(high - low + 1)
+        operations = [
+            UpdateOne({"id": model["id"]}, {"$set": {"rank": rank}})
+            for rank, model in enumerate(window, start=low)
+            if model.get("rank") != rank
+        ]
+        if operations:
+            await self.db.ai_models.bulk_write(operations, ordered=False)
+
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python reputation.py rebuild")
+        sys.exit(1)
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        scored = await ReputationEngine(client[os.environ["DB_NAME"]]).rebuild()
+        print(f"Rebuilt reputation from {scored} resolved predictions")
+        client.close()
+
+    asyncio.run(main())
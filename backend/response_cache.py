@@ -0,0 +1,217 @@
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory, redis or off
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# (body, etag, build_ms)
+Entry = Tuple[bytes, str, float]
+
+
+class MemoryCacheBackend:
+    """LRU of pre-serialized responses, local to this process"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Entry, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        # Bumped on every invalidation so a build that raced one is not stored
+        self._generation = 0
+
+    def _remove(self, key: str) -> bool:
+        item = self._entries.pop(key, None)
+        if item is None:
+            return False
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    async def get(self, key: str, tags: Iterable[str] = ()) -> Optional[Entry]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return item[1]
+
+    async def version(self, tags: Iterable[str]) -> int:
+        return self._generation
+
+    async def set(self, key: str, entry: Entry, ttl: float, tags: Iterable[str], version: Optional[int] = None):
+        if version is not None and version != self._generation:
+            return
+        self._remove(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + ttl, entry, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        self._generation += 1
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                removed += self._remove(key)
+        return removed
+
+
+class RedisCacheBackend:
+    """Responses shared by every API worker through a Redis-compatible server.
+
+    Each tag is a Redis set of the keys built from it, so any process,
+    including the indexer, can invalidate them. Each tag also has a
+    generation counter that invalidation bumps; an entry records the
+    generations its build started from and reads as a miss once any has
+    moved, so a build that raced an invalidation in another worker is never
+    served. Counters outlive every entry (generation_ttl), so one that
+    expires cannot come back to a value an old entry recorded.
+    """
+
+    def __init__(self, client, prefix: str = "aion:resp:", generation_ttl: int = 86400):
+        self.client = client
+        self.prefix = prefix
+        self.generation_ttl = generation_ttl
+
+    def _generation_keys(self, tags: Iterable[str]) -> List[str]:
+        return [f"{self.prefix}gen:{tag}" for tag in tags]
+
+    @staticmethod
+    def _encode_version(generations: Iterable[Optional[bytes]]) -> str:
+        return ",".join(g.decode() if isinstance(g, bytes) else str(g or 0) for g in generations)
+
+    async def get(self, key: str, tags: Iterable[str] = ()) -> Optional[Entry]:
+        raw, *generations = await self.client.mget(self.prefix + key, *self._generation_keys(tags))
+        if raw is None:
+            return None
+        header, _, body = raw.partition(b"\n")
+        etag, build_ms, version = header.decode().split(" ")
+        if version != self._encode_version(generations):
+            return None
+        return body, etag, float(build_ms)
+
+    async def version(self, tags: Iterable[str]) -> str:
+        tags = list(tags)
+        return self._encode_version(await self.client.mget(*self._generation_keys(tags)) if tags else [])
+
+    async def set(self, key: str, entry: Entry, ttl: float, tags: Iterable[str], version: Optional[str] = None):
+        body, etag, build_ms = entry
+        tags = list(tags)
+        if version is None:
+            version = await self.version(tags)
+        ex = max(1, int(ttl))
+        await self.client.set(self.prefix + key, f"{etag} {build_ms} {version}\n".encode() + body, ex=ex)
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            await self.client.sadd(tag_key, key)
+            # Entries share one TTL, so the newest member outlives the rest
+            await self.client.expire(tag_key, ex)
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            generation_key, = self._generation_keys([tag])
+            # Bumped first, so a build that read the old generation is rejected however late it stores
+            await self.client.incr(generation_key)
+            await self.client.expire(generation_key, self.generation_ttl)
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = [k.decode() if isinstance(k, bytes) else k for k in await self.client.smembers(tag_key)]
+            if keys:
+                removed += await self.client.delete(*(self.prefix + k for k in keys))
+            await self.client.delete(tag_key)
+        return removed
+
+
+class ResponseCache:
+    """Caches serialized JSON responses, answers If-None-Match with 304 and invalidates by tag"""
+
+    def __init__(self, backend=None, ttl: float = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidated": 0, "errors": 0, "saved_ms": 0.0}
+
+    @classmethod
+    def from_env(cls, backend: str = RESPONSE_CACHE_BACKEND) -> "ResponseCache":
+        if backend == "redis":
+            import redis.asyncio as redis
+
+            return cls(RedisCacheBackend(redis.from_url(RESPONSE_CACHE_REDIS_URL)))
+        if backend == "memory":
+            return cls(MemoryCacheBackend())
+        return cls(None)
+
+    async def respond(self, request: Request, key: str, tags: Iterable[str],
+                      build: Callable[[], Awaitable[bytes]]) -> Response:
+        """Serve `key` from the cache, or build, store and serve it"""
+        entry = None
+        version = None
+        if self.backend is not None:
+            try:
+                entry = await self.backend.get(key, tags)
+                if entry is None:
+                    version = await self.backend.version(tags)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Response cache read failed for {key}: {e}")
+
+        if entry is not None:
+            self.stats["hits"] += 1
+            self.stats["saved_ms"] += entry[2]
+            status = "HIT"
+        else:
+            self.stats["misses"] += 1
+            started = time.perf_counter()
+            body = await build()
+            build_ms = round((time.perf_counter() - started) * 1000, 3)
+            entry = (body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', build_ms)
+            # Without a version the read failed, and a build that may race an invalidation is not stored
+            if version is not None:
+                try:
+                    await self.backend.set(key, entry, self.ttl, tags, version)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.warning(f"Response cache write failed for {key}: {e}")
+            status = "MISS"
+
+        body, etag, _ = entry
+        headers = {"ETag": etag, "X-Cache": status}
+        if request.headers.get("if-none-match") == etag:
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, *tags: str):
+        if self.backend is None or not tags:
+            return
+        try:
+            self.stats["invalidated"] += await self.backend.invalidate(tags)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Response cache invalidation failed for {tags}: {e}")
+
+    def get_stats(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "saved_ms": round(self.stats["saved_ms"], 3),
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
@@ -1,25 +1,60 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
+import json
+import base64
+from datetime import datetime, timezone
 import random
-import httpx
 from linera_adapter import linera_adapter
+from stake_batcher import StakeBatcher
+from pyth_cache import pyth_cache, PYTH_PRICE_IDS, LIVE_SYMBOLS, normalize_feed_id
+from price_stream import price_stream
+from broadcaster import Broadcaster
+from indexes import ensure_indexes
+from wallet_ledger import get_wallet_position
+from platform_stats import load_platform_stats, run_reconciliation, record_resolution, release_resolution
+from reputation import ReputationEngine, SCORED_OUTCOMES
+from stake_service import StakeService, PredictionNotFound, PredictionClosed, IdempotencyConflict
+from settlement import SettlementEngine, STAKE_SIDES
+from stake_buffer import StakeWriteBehindBuffer
+from dao_votes import VoteTally, AlreadyVoted
+from response_cache import ResponseCache
+from fast_json import FastJSONResponse, read_model
+from metrics import MetricsMiddleware, mongo_listener, loop_lag_monitor, stats_collector, profiler, render
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[mongo_listener])
 db = client[os.environ['DB_NAME']]
+stake_buffer = StakeWriteBehindBuffer(db)
+stake_service = StakeService(client, db, buffer=stake_buffer if stake_buffer.enabled else None)
+vote_tally = VoteTally(db)
+reputation_engine = ReputationEngine(db)
+settlement_engine = SettlementEngine(db)
+response_cache = ResponseCache.from_env()
+
+async def invalidate_flushed_predictions(prediction_ids):
+    await response_cache.invalidate(*(f"prediction:{pid}" for pid in prediction_ids))
+
+stake_buffer.on_flush = invalidate_flushed_predictions
+
+PYTH_STREAM_ENABLED = os.environ.get('PYTH_STREAM_ENABLED', 'false').lower() == 'true'
+# Serialize stored predictions with orjson instead of re-validating them per request
+FAST_RESPONSES = os.environ.get('FAST_RESPONSES', 'false').lower() == 'true'
 
 # Create the main app
 app = FastAPI()
@@ -126,288 +161,298 @@ class LivePrediction(BaseModel):
     ai_model: str
     timestamp: datetime
 
-# ============ SEED DATA ============
-
-async def seed_database():
-    # Check if data already exists
-    existing_models = await db.ai_models.count_documents({})
-    if existing_models > 0:
-        return
-    
-    # Seed AI Models
-    ai_models = [
-        {
-            "id": str(uuid.uuid4()),
-            "name": "GPT-4 Oracle Alpha",
-            "model_type": "GPT-4",
-            "reputation_score": 95.8,
-            "total_predictions": 1247,
-            "correct_predictions": 1194,
-            "accuracy_rate": 95.8,
-            "total_staked": 125400.50,
-            "total_earned": 89230.25,
-            "rank": 1,
-            "avatar_url": "https://api.dicebear.com/7.x/bottts/svg?seed=gpt4",
-            "created_at": datetime.now(timezone.utc).isoformat()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Claude Predictor",
-            "model_type": "Claude-3",
-            "reputation_score": 93.2,
-            "total_predictions": 982,
-            "correct_predictions": 915,
-            "accuracy_rate": 93.2,
-            "total_staked": 98500.00,
-            "total_earned": 72340.80,
-            "rank": 2,
-            "avatar_url": "https://api.dicebear.com/7.x/bottts/svg?seed=claude",
-            "created_at": datetime.now(timezone.utc).isoformat()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Llama Vision Pro",
-            "model_type": "Llama-3",
-            "reputation_score": 91.5,
-            "total_predictions": 1103,
-            "correct_predictions": 1009,
-            "accuracy_rate": 91.5,
-            "total_staked": 87650.75,
-            "total_earned": 65420.30,
-            "rank": 3,
-            "avatar_url": "https://api.dicebear.com/7.x/bottts/svg?seed=llama",
-            "created_at": datetime.now(timezone.utc).isoformat()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Gemini Forecast",
-            "model_type": "Gemini-Pro",
-            "reputation_score": 89.7,
-            "total_predictions": 756,
-            "correct_predictions": 678,
-            "accuracy_rate": 89.7,
-            "total_staked": 65430.20,
-            "total_earned": 52100.50,
-            "rank": 4,
-            "avatar_url": "https://api.dicebear.com/7.x/bottts/svg?seed=gemini",
-            "created_at": datetime.now(timezone.utc).isoformat()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Mistral Oracle",
-            "model_type": "Mistral-Large",
-            "reputation_score": 87.3,
-            "total_predictions": 634,
-            "correct_predictions": 553,
-            "accuracy_rate": 87.3,
-            "total_staked": 54200.00,
-            "total_earned": 43210.75,
-            "rank": 5,
-            "avatar_url": "https://api.dicebear.com/7.x/bottts/svg?seed=mistral",
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-    ]
-    await db.ai_models.insert_many(ai_models)
-    
-    # Seed Predictions
-    categories = ["Finance", "Esports", "Climate", "Politics", "Technology"]
-    predictions = []
-    
-    for i, model in enumerate(ai_models[:5]):
-        for j in range(3):
-            pred = {
-                "id": str(uuid.uuid4()),
-                "title": f"{categories[i]} Market Prediction #{j+1}",
-                "description": f"Detailed prediction about {categories[i].lower()} market trends and outcomes.",
-                "category": categories[i],
-                "event_date": (datetime.now(timezone.utc) + timedelta(days=random.randint(7, 90))).isoformat(),
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "status": random.choice(["active", "active", "resolved"]),
-                "total_stake": round(random.uniform(5000, 50000), 2),
-                "ai_model_id": model["id"],
-                "ai_model_name": model["name"],
-                "prediction_value": random.choice(["Bullish", "Bearish", "Neutral", "High Probability", "Low Probability"]),
-                "confidence_score": round(random.uniform(0.75, 0.99), 2),
-                "outcome": None if random.random() > 0.3 else "correct",
-                "verification_status": random.choice(["pending", "verified", "pending"]),
-                "oracle_nodes": 3
-            }
-            predictions.append(pred)
-    
-    await db.predictions.insert_many(predictions)
-    
-    # Seed DAO Proposals
-    proposals = [
-        {
-            "id": str(uuid.uuid4()),
-            "title": "Increase AI Model Stake Requirement",
-            "description": "Proposal to increase minimum stake from 1000 to 5000 AION tokens to improve prediction quality.",
-            "proposer": "0x742d35Cc6634C0532925a3b844Bc9e7595f0bEb1",
-            "status": "active",
-            "votes_for": 12450,
-            "votes_against": 3420,
-            "total_votes": 15870,
-            "end_date": (datetime.now(timezone.utc) + timedelta(days=5)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "title": "Add New Market Category: DeFi",
-            "description": "Proposal to add DeFi as a new prediction market category.",
-            "proposer": "0x8ba1f109551bD432803012645Ac136ddd64DBA72",
-            "status": "active",
-            "votes_for": 8920,
-            "votes_against": 1240,
-            "total_votes": 10160,
-            "end_date": (datetime.now(timezone.utc) + timedelta(days=3)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "title": "Reduce Oracle Verification Time",
-            "description": "Proposal to reduce oracle verification time from 24h to 12h.",
-            "proposer": "0xdD2FD4581271e230360230F9337D5c0430Bf44C0",
-            "status": "passed",
-            "votes_for": 18500,
-            "votes_against": 2100,
-            "total_votes": 20600,
-            "end_date": (datetime.now(timezone.utc) - timedelta(days=2)).isoformat(),
-            "created_at": (datetime.now(timezone.utc) - timedelta(days=10)).isoformat()
-        }
-    ]
-    await db.dao_proposals.insert_many(proposals)
-
 # ============ ENDPOINTS ============
 
 @api_router.get("/")
 async def root():
     return {"message": "AION Prediction Market API", "version": "1.0.0"}
 
+# Cached endpoints validate and serialize once, then serve the stored bytes
+AI_MODEL_LIST = TypeAdapter(List[AIModel])
+AI_MODEL = TypeAdapter(AIModel)
+PREDICTION = TypeAdapter(Prediction)
+DAO_PROPOSAL_LIST = TypeAdapter(List[DAOProposal])
+
 @api_router.get("/ai-models", response_model=List[AIModel])
-async def get_ai_models():
-    models = await db.ai_models.find({}, {"_id": 0}).sort("rank", 1).to_list(100)
-    for model in models:
-        if isinstance(model['created_at'], str):
-            model['created_at'] = datetime.fromisoformat(model['created_at'])
-    return models
+async def get_ai_models(request: Request):
+    async def build():
+        models = await db.ai_models.find({}, {"_id": 0}).sort("rank", 1).to_list(100)
+        return AI_MODEL_LIST.dump_json(AI_MODEL_LIST.validate_python(models))
+    return await response_cache.respond(request, "ai_models", ["ai_models"], build)
 
 @api_router.get("/ai-models/{model_id}", response_model=AIModel)
-async def get_ai_model(model_id: str):
-    model = await db.ai_models.find_one({"id": model_id}, {"_id": 0})
-    if not model:
-        raise HTTPException(status_code=404, detail="AI Model not found")
-    if isinstance(model['created_at'], str):
-        model['created_at'] = datetime.fromisoformat(model['created_at'])
-    return model
+async def get_ai_model(model_id: str, request: Request):
+    async def build():
+        model = await db.ai_models.find_one({"id": model_id}, {"_id": 0})
+        if not model:
+            raise HTTPException(status_code=404, detail="AI Model not found")
+        return AI_MODEL.dump_json(AI_MODEL.validate_python(model))
+    return await response_cache.respond(
+        request, f"ai_model:{model_id}", ["ai_models", f"ai_model:{model_id}"], build
+    )
+
+PREDICTION_FIELDS = set(Prediction.model_fields)
+# Predictions are validated against Prediction when written, so the fast path only copies fields
+PredictionRow = read_model(Prediction)
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc["created_at"]
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps({"created_at": created_at, "id": doc["id"]})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data["created_at"]), data["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @api_router.get("/predictions", response_model=List[Prediction])
-async def get_predictions(status: Optional[str] = None, category: Optional[str] = None):
+async def get_predictions(
+    response: Response,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    model_id: Optional[str] = None,
+    min_stake: Optional[float] = None,
+    max_stake: Optional[float] = None,
+    event_after: Optional[datetime] = None,
+    event_before: Optional[datetime] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     query = {}
     if status:
         query["status"] = status
     if category:
         query["category"] = category
+    if model_id:
+        query["ai_model_id"] = model_id
+    if min_stake is not None or max_stake is not None:
+        query["total_stake"] = {}
+        if min_stake is not None:
+            query["total_stake"]["$gte"] = min_stake
+        if max_stake is not None:
+            query["total_stake"]["$lte"] = max_stake
+    if event_after or event_before:
+        query["event_date"] = {}
+        if event_after:
+            query["event_date"]["$gte"] = event_after
+        if event_before:
+            query["event_date"]["$lt"] = event_before
     
-    predictions = await db.predictions.find(query, {"_id": 0}).to_list(1000)
-    for pred in predictions:
-        if isinstance(pred['created_at'], str):
-            pred['created_at'] = datetime.fromisoformat(pred['created_at'])
-        if isinstance(pred['event_date'], str):
-            pred['event_date'] = datetime.fromisoformat(pred['event_date'])
+    direction = DESCENDING if order == "desc" else ASCENDING
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        op = "$lt" if direction == DESCENDING else "$gt"
+        query["$or"] = [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "id": {op: last_id}}
+        ]
+    
+    projection = {"_id": 0}
+    if fields:
+        requested = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = requested - PREDICTION_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        # id and created_at are always returned because the cursor is built from them
+        projection.update({f: 1 for f in requested | {"id", "created_at"}})
+    elif FAST_RESPONSES:
+        projection.update({f: 1 for f in PREDICTION_FIELDS})
+    
+    predictions = await db.predictions.find(query, projection).sort(
+        [("created_at", direction), ("id", direction)]
+    ).limit(limit).to_list(limit)
+    
+    headers = {}
+    if len(predictions) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(predictions[-1])
+    if FAST_RESPONSES:
+        rows = predictions if fields else [PredictionRow(**p) for p in predictions]
+        return FastJSONResponse(rows, headers=headers)
+    if fields:
+        # Partial documents cannot satisfy the Prediction model, so skip response validation
+        return JSONResponse(content=jsonable_encoder(predictions), headers=headers)
+    response.headers.update(headers)
     return predictions
 
 @api_router.get("/predictions/{prediction_id}", response_model=Prediction)
-async def get_prediction(prediction_id: str):
-    prediction = await db.predictions.find_one({"id": prediction_id}, {"_id": 0})
-    if not prediction:
-        raise HTTPException(status_code=404, detail="Prediction not found")
-    if isinstance(prediction['created_at'], str):
-        prediction['created_at'] = datetime.fromisoformat(prediction['created_at'])
-    if isinstance(prediction['event_date'], str):
-        prediction['event_date'] = datetime.fromisoformat(prediction['event_date'])
-    return prediction
+async def get_prediction(prediction_id: str, request: Request):
+    async def build():
+        prediction = await db.predictions.find_one({"id": prediction_id}, {"_id": 0})
+        if not prediction:
+            raise HTTPException(status_code=404, detail="Prediction not found")
+        return PREDICTION.dump_json(PREDICTION.validate_python(prediction))
+    return await response_cache.respond(
+        request, f"prediction:{prediction_id}", [f"prediction:{prediction_id}"], build
+    )
 
 @api_router.post("/predictions/{prediction_id}/stake")
-async def stake_on_prediction(prediction_id: str, wallet_address: str, amount: float):
-    prediction = await db.predictions.find_one({"id": prediction_id})
-    if not prediction:
+async def stake_on_prediction(
+    prediction_id: str,
+    wallet_address: str,
+    response: Response,
+    amount: float = Query(gt=0),
+    side: str = "for",
+    idempotency_key: Optional[str] = Header(None)
+):
+    if side not in STAKE_SIDES:
+        raise HTTPException(status_code=400, detail="Side must be 'for' or 'against'")
+    try:
+        result, replayed = await stake_service.place_stake(
+            prediction_id, wallet_address, amount, idempotency_key=idempotency_key, side=side
+        )
+    except PredictionNotFound:
         raise HTTPException(status_code=404, detail="Prediction not found")
+    except PredictionClosed:
+        raise HTTPException(status_code=409, detail="Prediction is resolved")
+    except IdempotencyConflict:
+        raise HTTPException(status_code=409, detail="Idempotency key already used for a different stake")
     
-    stake_record = {
-        "id": str(uuid.uuid4()),
-        "prediction_id": prediction_id,
-        "wallet_address": wallet_address,
-        "amount": amount,
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    }
-    await db.stakes.insert_one(stake_record)
-    
-    # Update prediction total stake
-    await db.predictions.update_one(
-        {"id": prediction_id},
-        {"$inc": {"total_stake": amount}}
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    else:
+        await response_cache.invalidate(f"prediction:{prediction_id}")
+    return result
+
+async def record_outcome(prediction: dict):
+    """Fold a resolved prediction into reputation and platform stats exactly once.
+
+    Both increments are guarded by the prediction id until outcome_recorded is
+    set, so a retry after a crash anywhere in between neither skips nor
+    repeats them.
+    """
+    accuracy_delta = await reputation_engine.record_resolution(prediction)
+    await record_resolution(db, prediction["id"], prediction.get("resolved_from") == "active", accuracy_delta or 0.0)
+    await db.predictions.update_one({"id": prediction["id"]}, {"$set": {"outcome_recorded": True}})
+    await reputation_engine.release(prediction)
+    await release_resolution(db, prediction["id"])
+
+async def resolve_and_settle(prediction_id: str, outcome: str):
+    """Mark a prediction resolved, update reputation and stats, and start settling its stakes"""
+    resolved_at = datetime.now(timezone.utc)
+    resolved = await db.predictions.find_one_and_update(
+        {"id": prediction_id, "status": {"$ne": "resolved"}},
+        [{"$set": {
+            "status": "resolved", "outcome": outcome, "resolved_at": resolved_at,
+            "resolved_from": "$status", "outcome_recorded": {"$literal": False},
+        }}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    return {"message": "Stake successful", "stake_id": stake_record["id"]}
+    if resolved is None:
+        current = await db.predictions.find_one({"id": prediction_id}, {"_id": 0})
+        if current is None:
+            raise HTTPException(status_code=404, detail="Prediction not found")
+        # A crash right after the status flip can leave the settlement unstarted or the
+        # outcome unrecorded; a retry finishes whatever is missing
+        resumed = False
+        if current.get("resolved_at") and not await db.settlements.find_one({"_id": prediction_id}, {"_id": 1}):
+            await settlement_engine.start(prediction_id, current["outcome"], cutoff=current["resolved_at"])
+            settlement_engine.schedule(prediction_id)
+            resumed = True
+        if current.get("outcome_recorded") is False:
+            await record_outcome(current)
+            resumed = True
+        if resumed:
+            await response_cache.invalidate(f"prediction:{prediction_id}", "ai_models")
+            return {"message": "Resolution resumed", "prediction_id": prediction_id, "outcome": current["outcome"]}
+        raise HTTPException(status_code=409, detail="Prediction already resolved")
+
+    # The settlement record goes first: once it exists, resume_pending finishes it after a crash
+    await settlement_engine.start(prediction_id, outcome, cutoff=resolved_at)
+    settlement_engine.schedule(prediction_id)
+    await record_outcome(resolved)
+    await response_cache.invalidate(f"prediction:{prediction_id}", "ai_models")
+    return {"message": "Prediction resolved", "prediction_id": prediction_id, "outcome": outcome}
+
+@api_router.post("/predictions/{prediction_id}/resolve")
+async def resolve_prediction(prediction_id: str, outcome: str, x_api_key: str = Header(None)):
+    verify_api_key(x_api_key)
+    if outcome not in SCORED_OUTCOMES:
+        raise HTTPException(status_code=400, detail="Outcome must be 'correct' or 'incorrect'")
+    return await resolve_and_settle(prediction_id, outcome)
+
+@api_router.get("/settlements/{prediction_id}")
+async def get_settlement(prediction_id: str):
+    settlement = await db.settlements.find_one({"_id": prediction_id})
+    if not settlement:
+        raise HTTPException(status_code=404, detail="Settlement not found")
+    settlement["prediction_id"] = settlement.pop("_id")
+    return settlement
+
+@api_router.get("/cache/stats")
+async def get_response_cache_stats():
+    return response_cache.get_stats()
+
+@api_router.get("/stakes/buffer-stats")
+async def get_stake_buffer_stats():
+    return stake_buffer.get_stats()
 
 @api_router.get("/dao-proposals", response_model=List[DAOProposal])
-async def get_dao_proposals():
-    proposals = await db.dao_proposals.find({}, {"_id": 0}).to_list(100)
-    for prop in proposals:
-        if isinstance(prop['created_at'], str):
-            prop['created_at'] = datetime.fromisoformat(prop['created_at'])
-        if isinstance(prop['end_date'], str):
-            prop['end_date'] = datetime.fromisoformat(prop['end_date'])
-    return proposals
+async def get_dao_proposals(request: Request):
+    async def build():
+        proposals = await db.dao_proposals.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
+        tallies = await vote_tally.get_tallies(prop['id'] for prop in proposals)
+        for prop in proposals:
+            prop.update(tallies.get(prop['id'], {}))
+        return DAO_PROPOSAL_LIST.dump_json(DAO_PROPOSAL_LIST.validate_python(proposals))
+    return await response_cache.respond(request, "dao_proposals", ["dao_proposals"], build)
+
+@api_router.get("/dao-proposals/tally")
+async def get_dao_proposal_tallies(ids: str):
+    """Vote tallies for a comma-separated list of proposal ids"""
+    proposal_ids = [i.strip() for i in ids.split(",") if i.strip()]
+    if len(proposal_ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 proposal ids per request")
+    return await vote_tally.get_tallies(proposal_ids)
 
 @api_router.post("/dao-proposals/{proposal_id}/vote")
 async def vote_on_proposal(proposal_id: str, wallet_address: str, vote: str):
-    proposal = await db.dao_proposals.find_one({"id": proposal_id})
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Proposal not found")
-    
     if vote not in ["for", "against"]:
         raise HTTPException(status_code=400, detail="Vote must be 'for' or 'against'")
+
+    proposal = await db.dao_proposals.find_one({"id": proposal_id}, {"_id": 1})
+    if not proposal:
+        raise HTTPException(status_code=404, detail="Proposal not found")
     
-    # Update votes
-    update_field = "votes_for" if vote == "for" else "votes_against"
-    await db.dao_proposals.update_one(
-        {"id": proposal_id},
-        {"$inc": {update_field: 1, "total_votes": 1}}
-    )
+    try:
+        await vote_tally.record_vote(proposal_id, wallet_address, vote)
+    except AlreadyVoted:
+        raise HTTPException(status_code=409, detail="Wallet has already voted on this proposal")
+    await response_cache.invalidate("dao_proposals")
     
     return {"message": "Vote recorded successfully"}
 
 @api_router.get("/wallet/{wallet_address}/balance", response_model=WalletBalance)
 async def get_wallet_balance(wallet_address: str):
     # Mock balance for demo
-    stakes = await db.stakes.find({"wallet_address": wallet_address}, {"_id": 0}).to_list(1000)
-    staked_amount = sum(stake["amount"] for stake in stakes)
+    position = await get_wallet_position(db, wallet_address) or {}
     
     return {
         "wallet_address": wallet_address,
         "aion_balance": round(random.uniform(1000, 100000), 2),
-        "staked_amount": staked_amount,
-        "earned_rewards": round(staked_amount * 0.15, 2)
+        "staked_amount": position.get("staked_amount", 0.0),
+        "earned_rewards": round(position.get("earned_rewards", 0.0), 2)
     }
 
 @api_router.get("/statistics", response_model=PlatformStats)
 async def get_platform_stats():
-    total_predictions = await db.predictions.count_documents({})
-    active_predictions = await db.predictions.count_documents({"status": "active"})
-    total_ai_models = await db.ai_models.count_documents({})
-    
-    # Calculate total value locked
-    predictions = await db.predictions.find({}, {"_id": 0, "total_stake": 1}).to_list(1000)
-    total_staked = sum(pred["total_stake"] for pred in predictions)
-    
-    # Calculate average accuracy
-    models = await db.ai_models.find({}, {"_id": 0, "accuracy_rate": 1}).to_list(100)
-    avg_accuracy = sum(model["accuracy_rate"] for model in models) / len(models) if models else 0
+    return await compute_platform_stats()
+
+async def compute_platform_stats():
+    stats = await load_platform_stats(db)
+    total_staked = stats.get("total_staked", 0.0)
+    total_ai_models = stats.get("total_ai_models", 0)
+    avg_accuracy = stats.get("accuracy_sum", 0.0) / total_ai_models if total_ai_models else 0
     
     return {
-        "total_predictions": total_predictions,
-        "active_predictions": active_predictions,
+        "total_predictions": stats.get("total_predictions", 0),
+        "active_predictions": stats.get("active_predictions", 0),
         "total_ai_models": total_ai_models,
         "total_value_locked": round(total_staked * 1.5, 2),
         "total_staked": round(total_staked, 2),
@@ -417,6 +462,8 @@ async def get_platform_stats():
 
 # ============ LINERA ENDPOINTS ============
 
+stake_batcher = StakeBatcher(linera_adapter)
+
 def verify_api_key(x_api_key: str = Header(None)):
     api_key = os.getenv("API_KEY")
     if api_key and x_api_key != api_key:
@@ -437,7 +484,7 @@ async def create_linera_market(request: LineraMarketRequest, x_api_key: str = He
 
 @api_router.post("/linera/stake")
 async def linera_stake(request: LineraStakeRequest):
-    result = await linera_adapter.stake(
+    result = await stake_batcher.stake(
         market_id=request.market_id,
         amount=request.amount,
         prediction=request.prediction
@@ -453,23 +500,25 @@ async def get_linera_state():
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
+@api_router.get("/linera/metrics")
+async def get_linera_metrics():
+    return {**linera_adapter.get_metrics(), "batching": stake_batcher.get_stats()}
+
 @api_router.post("/linera/resolve/{market_id}")
-async def resolve_linera_market(market_id: int, outcome: bool, x_api_key: str = Header(None)):
+async def resolve_linera_market(
+    market_id: int, outcome: bool, prediction_id: Optional[str] = None, x_api_key: str = Header(None)
+):
     verify_api_key(x_api_key)
     result = await linera_adapter.resolve_market(market_id=market_id, outcome=outcome)
     if not result.get("success"):
         raise HTTPException(status_code=500, detail=result.get("error"))
+    # On-chain stakes are paid out by the contract; stakes held here settle against the linked prediction
+    if prediction_id:
+        result["prediction"] = await resolve_and_settle(prediction_id, "correct" if outcome else "incorrect")
     return result
 
 # ============ PYTH NETWORK & LIVE PREDICTIONS ============
 
-PYTH_PRICE_IDS = {
-    "BTC/USD": "0xe62df6c8b4a85fe1a67db44dc12de5db330f7ac66b72dc658afedf0f4a415b43",
-    "ETH/USD": "0xff61491a931112ddf1bd8147cd1b641375f79f5825126d665480874634fd0ace",
-    "SOL/USD": "0xef0d8b6fda2ceba41da15d4095d1da392a0d2f8ed0c6c7bc0f4cfac8c280b56d",
-    "BNB/USD": "0x2f95862b045670cd22bee3114c39763a4a08beeb663b145d283c31d7d1101c4f",
-}
-
 @api_router.get("/pyth/price/{symbol}")
 async def get_pyth_price(symbol: str):
     price_id = PYTH_PRICE_IDS.get(symbol.upper())
@@ -477,71 +526,171 @@ async def get_pyth_price(symbol: str):
         raise HTTPException(status_code=404, detail="Symbol not found")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://hermes.pyth.network/v2/updates/price/latest?ids[]={price_id}",
-                timeout=10.0
-            )
-            data = response.json()
-            
-            if "parsed" in data and len(data["parsed"]) > 0:
-                price_data = data["parsed"][0]["price"]
-                price = float(price_data["price"]) * (10 ** price_data["expo"])
-                conf = float(price_data["conf"]) * (10 ** price_data["expo"])
-                
-                return {
-                    "symbol": symbol.upper(),
-                    "price": round(price, 2),
-                    "confidence": round(conf, 2),
-                    "timestamp": int(price_data["publish_time"]),
-                    "expo": price_data["expo"]
-                }
+        price_data = await pyth_cache.get(price_id)
     except Exception as e:
         logger.error(f"Error fetching Pyth price: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if price_data:
+        return {
+            "symbol": symbol.upper(),
+            "price": round(price_data["price"], 2),
+            "confidence": round(price_data["conf"], 2),
+            "timestamp": price_data["publish_time"],
+            "expo": price_data["expo"]
+        }
+
+@api_router.get("/pyth/prices")
+async def get_pyth_prices(symbols: Optional[str] = None):
+    requested = [s.strip().upper() for s in symbols.split(",") if s.strip()] if symbols else LIVE_SYMBOLS
+    unknown = [s for s in requested if s not in PYTH_PRICE_IDS]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Symbol not found: {', '.join(unknown)}")
+    
+    try:
+        prices = await pyth_cache.get_many(PYTH_PRICE_IDS[s] for s in requested)
+    except Exception as e:
+        logger.error(f"Error fetching Pyth prices: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    results = []
+    for symbol in requested:
+        price_data = prices.get(normalize_feed_id(PYTH_PRICE_IDS[symbol]))
+        if price_data:
+            results.append({
+                "symbol": symbol,
+                "price": round(price_data["price"], 2),
+                "confidence": round(price_data["conf"], 2),
+                "timestamp": price_data["publish_time"],
+                "expo": price_data["expo"]
+            })
+    return results
+
+@api_router.get("/pyth/cache-stats")
+async def get_pyth_cache_stats():
+    stats = pyth_cache.get_stats()
+    if PYTH_STREAM_ENABLED:
+        stats["stream"] = price_stream.get_stats()
+    return stats
 
 @api_router.get("/live-predictions")
 async def get_live_predictions(timeframe: str = "M5"):
-    symbols = ["BTC/USD", "ETH/USD", "SOL/USD", "BNB/USD"]
+    return await build_live_predictions(timeframe)
+
+async def build_live_predictions(timeframe: str):
+    symbols = [s for s in LIVE_SYMBOLS if s in PYTH_PRICE_IDS]
     ai_models = ["GPT-4 Oracle", "Claude Predictor", "Llama Vision", "Gemini Forecast"]
     predictions = []
     
+    try:
+        prices = await pyth_cache.get_many(PYTH_PRICE_IDS[s] for s in symbols)
+    except Exception as e:
+        logger.error(f"Error fetching Pyth prices: {e}")
+        return predictions
+    
     for symbol in symbols:
         try:
-            async with httpx.AsyncClient() as client:
-                price_id = PYTH_PRICE_IDS.get(symbol)
-                response = await client.get(
-                    f"https://hermes.pyth.network/v2/updates/price/latest?ids[]={price_id}",
-                    timeout=10.0
-                )
-                data = response.json()
+            price_data = prices.get(normalize_feed_id(PYTH_PRICE_IDS[symbol]))
+            if price_data:
+                current_price = price_data["price"]
                 
-                if "parsed" in data and len(data["parsed"]) > 0:
-                    price_data = data["parsed"][0]["price"]
-                    current_price = float(price_data["price"]) * (10 ** price_data["expo"])
-                    
-                    direction = random.choice(["UP", "DOWN"])
-                    change_percent = random.uniform(0.1, 2.5)
-                    predicted_price = current_price * (1 + change_percent/100 if direction == "UP" else 1 - change_percent/100)
-                    
-                    predictions.append({
-                        "id": str(uuid.uuid4()),
-                        "symbol": symbol,
-                        "current_price": round(current_price, 2),
-                        "predicted_price": round(predicted_price, 2),
-                        "direction": direction,
-                        "confidence": round(random.uniform(0.75, 0.95), 2),
-                        "timeframe": timeframe,
-                        "ai_model": random.choice(ai_models),
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "change_percent": round(change_percent, 2)
-                    })
+                direction = random.choice(["UP", "DOWN"])
+                change_percent = random.uniform(0.1, 2.5)
+                predicted_price = current_price * (1 + change_percent/100 if direction == "UP" else 1 - change_percent/100)
+                
+                predictions.append({
+                    "id": str(uuid.uuid4()),
+                    "symbol": symbol,
+                    "current_price": round(current_price, 2),
+                    "predicted_price": round(predicted_price, 2),
+                    "direction": direction,
+                    "confidence": round(random.uniform(0.75, 0.95), 2),
+                    "timeframe": timeframe,
+                    "ai_model": random.choice(ai_models),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "change_percent": round(change_percent, 2)
+                })
         except Exception as e:
             logger.error(f"Error generating prediction for {symbol}: {e}")
             continue
     
     return predictions
 
+# ============ PUSH UPDATES ============
+
+async def build_market_update():
+    live_predictions, statistics = await asyncio.gather(
+        build_live_predictions("M5"),
+        compute_platform_stats()
+    )
+    return {
+        "live_predictions": live_predictions,
+        "statistics": statistics,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+market_broadcaster = Broadcaster(build_market_update)
+
+@api_router.get("/stream")
+async def stream_market_updates():
+    queue = market_broadcaster.subscribe()
+
+    async def events():
+        try:
+            while True:
+                message = await queue.get()
+                yield f"data: {message}\n\n"
+        finally:
+            market_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.websocket("/ws")
+async def websocket_market_updates(websocket: WebSocket):
+    await websocket.accept()
+    queue = market_broadcaster.subscribe()
+    try:
+        while True:
+            await websocket.send_text(await queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        market_broadcaster.unsubscribe(queue)
+
+@api_router.get("/stream/stats")
+async def get_stream_stats():
+    return market_broadcaster.get_stats()
+
+# ============ METRICS ============
+
+stats_collector.add("pyth_cache", pyth_cache.get_stats)
+stats_collector.add("price_stream", price_stream.get_stats)
+stats_collector.add("linera", linera_adapter.get_metrics)
+stats_collector.add("stake_batcher", stake_batcher.get_stats)
+stats_collector.add("stake_buffer", stake_buffer.get_stats)
+stats_collector.add("response_cache", response_cache.get_stats)
+stats_collector.add("broadcaster", market_broadcaster.get_stats)
+
+@app.get("/metrics")
+async def get_metrics():
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/metrics/profiles")
+async def list_profiles():
+    return profiler.list()
+
+@app.get("/metrics/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    folded = profiler.folded(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=folded, media_type="text/plain")
+
 # Include router
 app.include_router(api_router)
 
@@ -551,7 +700,9 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id", "X-Next-Cursor", "Idempotent-Replayed"],
 )
+app.add_middleware(MetricsMiddleware)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -559,11 +710,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+stats_reconciler: Optional[asyncio.Task] = None
+
 @app.on_event("startup")
 async def startup_event():
-    await seed_database()
-    logger.info("Database seeded successfully")
+    await ensure_indexes(db)
+    await reputation_engine.load()
+    await settlement_engine.resume_pending()
+    loop_lag_monitor.start()
+    global stats_reconciler
+    stats_reconciler = asyncio.create_task(run_reconciliation(db))
+    if stake_buffer.enabled:
+        await stake_buffer.start()
+    # The stream keeps the price cache warm; fall back to polling Hermes without it
+    if PYTH_STREAM_ENABLED:
+        price_stream.start()
+    else:
+        pyth_cache.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if stats_reconciler:
+        stats_reconciler.cancel()
+    if stake_buffer.enabled:
+        await stake_buffer.stop()
+    await settlement_engine.stop()
+    await loop_lag_monitor.stop()
+    await market_broadcaster.stop()
+    await price_stream.stop()
+    await pyth_cache.stop()
+    await linera_adapter.close()
     client.close()
\ No newline at end of file
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Fee taken from the losing pool before it is shared among winners, in basis points
+SETTLEMENT_FEE_BPS = int(os.getenv("SETTLEMENT_FEE_BPS", "200"))
+SETTLEMENT_CHUNK_SIZE = int(os.getenv("SETTLEMENT_CHUNK_SIZE", "5000"))
+# Longest wait for stakes registered before the resolve to land; only a crashed writer takes this long
+SETTLEMENT_STAKE_WAIT_S = float(os.getenv("SETTLEMENT_STAKE_WAIT_S", "5"))
+STAKE_WAIT_POLL_S = 0.05
+
+STAKE_SIDES = ("for", "against")
+# Stakes from before the side field existed backed the prediction
+DEFAULT_SIDE = "for"
+DUPLICATE_KEY = 11000
+
+
+def placed_by(cutoff: datetime) -> Dict[str, Any]:
+    """Stakes placed no later than cutoff.
+
+    Stakes from before timestamps were stored as dates hold ISO strings, which
+    never compare with a date; they all predate any settlement, so they count.
+    """
+    return {"$or": [{"timestamp": {"$lte": cutoff}}, {"timestamp": {"$type": "string"}}]}
+
+
+def placed_after(stake: Dict[str, Any], cutoff: datetime) -> bool:
+    """Whether a stake slipped in after the cutoff, racing the resolution"""
+    timestamp = stake.get("timestamp")
+    if not isinstance(timestamp, datetime):
+        return False
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    if cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    return timestamp > cutoff
+
+
+def winning_side(outcome: str) -> str:
+    return "for" if outcome == "correct" else "against"
+
+
+def compute_payouts(amounts: np.ndarray, winners: np.ndarray, winning_pool: float,
+                    losing_pool: float, fee_rate: float) -> np.ndarray:
+    """Pari-mutuel payouts: winners get their stake back plus a pro-rata share of the losing pool after fees.
+
+    With no winning stakes there is nothing to share, so every stake is refunded.
+    """
+    if winning_pool <= 0:
+        return amounts.copy()
+    share = losing_pool * (1 - fee_rate) / winning_pool
+    return np.where(winners, amounts * (1 + share), 0.0)
+
+
+class SettlementEngine:
+    """Settles a resolved prediction's stakes into payouts.
+
+    The pools are fixed when settlement starts and stored on a settlements
+    document together with the last stake id processed, so a crashed
+    settlement resumes from the next chunk. Stake payouts are plain $sets and
+    wallet credits are guarded by the chunk id, which each wallet keeps until
+    the settlement's cursor has moved past the chunk, so replaying a chunk is
+    safe. Stakes placed after the cutoff are outside the pools and refunded.
+    """
+
+    def __init__(self, db, fee_bps: int = SETTLEMENT_FEE_BPS, chunk_size: int = SETTLEMENT_CHUNK_SIZE):
+        self.db = db
+        self.fee_rate = fee_bps / 10_000
+        self.chunk_size = chunk_size
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def _await_placing_stakes(self, prediction_id: str):
+        """Wait for stakes registered on the prediction before it resolved to be inserted"""
+        deadline = time.monotonic() + SETTLEMENT_STAKE_WAIT_S
+        placing = {"id": prediction_id, "placing_stakes.0": {"$exists": True}}
+        while await self.db.predictions.find_one(placing, {"_id": 1}):
+            if time.monotonic() >= deadline:
+                logger.warning(f"Settling {prediction_id} with stake writes still registered after {SETTLEMENT_STAKE_WAIT_S}s")
+                return
+            await asyncio.sleep(STAKE_WAIT_POLL_S)
+
+    async def _pools(self, prediction_id: str, cutoff: datetime) -> Dict[str, float]:
+        pools = {side: 0.0 for side in STAKE_SIDES}
+        pipeline = [
+            {"$match": {"prediction_id": prediction_id, **placed_by(cutoff)}},
+            {"$group": {"_id": {"$ifNull": ["$side", DEFAULT_SIDE]}, "amount": {"$sum": "$amount"}}},
+        ]
+        async for row in self.db.stakes.aggregate(pipeline):
+            pools[row["_id"]] = row["amount"]
+        return pools
+
+    async def start(self, prediction_id: str, outcome: str, cutoff: Optional[datetime] = None) -> Dict[str, Any]:
+        """Create the settlement record, or return the existing one"""
+        cutoff = cutoff or datetime.now(timezone.utc)
+        existing = await self.db.settlements.find_one({"_id": prediction_id})
+        if existing is not None:
+            return existing
+        await self._await_placing_stakes(prediction_id)
+        pools = await self._pools(prediction_id, cutoff)
+        side = winning_side(outcome)
+        settlement = {
+            "_id": prediction_id,
+            "outcome": outcome,
+            "winning_side": side,
+            "cutoff": cutoff,
+            "winning_pool": pools[side],
+            "losing_pool": sum(v for k, v in pools.items() if k != side),
+            "fee_rate": self.fee_rate,
+            "status": "running",
+            "last_stake_id": "",
+            "stakes_settled": 0,
+            "stakes_refunded": 0,
+            "total_paid": 0.0,
+            "started_at": datetime.now(timezone.utc),
+        }
+        settlement["fee"] = 0.0 if settlement["winning_pool"] <= 0 else settlement["losing_pool"] * self.fee_rate
+        await self.db.settlements.update_one({"_id": prediction_id}, {"$setOnInsert": settlement}, upsert=True)
+        return await self.db.settlements.find_one({"_id": prediction_id})
+
+    async def _settle_chunk(self, settlement: Dict[str, Any], stakes) -> Dict[str, Any]:
+        prediction_id = settlement["_id"]
+        chunk_id = f"{prediction_id}:{settlement['last_stake_id']}"
+        amounts = np.fromiter((s["amount"] for s in stakes), dtype=np.float64, count=len(stakes))
+        winners = np.fromiter(
+            (s.get("side", DEFAULT_SIDE) == settlement["winning_side"] for s in stakes), dtype=bool, count=len(stakes)
+        )
+        late = np.fromiter((placed_after(s, settlement["cutoff"]) for s in stakes), dtype=bool, count=len(stakes))
+        payouts = compute_payouts(
+            amounts, winners, settlement["winning_pool"], settlement["losing_pool"], settlement["fee_rate"]
+        )
+        payouts = np.round(np.where(late, amounts, payouts), 8)
+
+        await self.db.stakes.bulk_write([
+            UpdateOne({"id": s["id"]}, {"$set": {"payout": float(p), "settled": True}})
+            for s, p in zip(stakes, payouts)
+        ], ordered=False)
+
+        # Credit each wallet once per chunk
+        wallets, codes = np.unique([s["wallet_address"] for s in stakes], return_inverse=True)
+        paid = np.bincount(codes, weights=payouts, minlength=len(wallets))
+        profit = np.bincount(codes, weights=np.maximum(payouts - amounts, 0.0), minlength=len(wallets))
+        # Upserted so a wallet without a ledger row is still paid. When the guard
+        # skips a wallet this chunk already credited, the upsert collides with
+        # its existing row instead, and that duplicate key is the expected no-op.
+        guard = {"settled_chunks": {"$ne": chunk_id}}
+        try:
+            await self.db.wallet_positions.bulk_write([
+                UpdateOne(
+                    {"wallet_address": str(wallet), "prediction_id": None, **guard},
+                    {"$inc": {"payout_amount": float(p), "earned_rewards": float(r)},
+                     "$push": {"settled_chunks": chunk_id}},
+                    upsert=True
+                )
+                for wallet, p, r in zip(wallets, paid, profit)
+            ], ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                raise
+
+        # Advancing the cursor is guarded by its previous value, so the totals move once per chunk
+        advanced = await self.db.settlements.find_one_and_update(
+            {"_id": prediction_id, "last_stake_id": settlement["last_stake_id"]},
+            {"$set": {"last_stake_id": stakes[-1]["id"]},
+             "$inc": {"stakes_settled": len(stakes), "stakes_refunded": int(late.sum()),
+                      "total_paid": float(payouts.sum())}},
+            return_document=ReturnDocument.AFTER
+        )
+        # Nothing replays a chunk behind the cursor, so its guard can go
+        await self.db.wallet_positions.update_many(
+            {"settled_chunks": chunk_id}, {"$pull": {"settled_chunks": chunk_id}}
+        )
+        return advanced or await self.db.settlements.find_one({"_id": prediction_id})
+
+    async def _release_guards(self, prediction_id: str):
+        """Drop chunk guards a crash left behind after the cursor had already moved past them"""
+        chunks = {"$regex": f"^{re.escape(prediction_id)}:"}
+        await self.db.wallet_positions.update_many({"settled_chunks": chunks}, {"$pull": {"settled_chunks": chunks}})
+
+    async def run(self, prediction_id: str) -> Dict[str, Any]:
+        """Settle the remaining stakes of a started settlement"""
+        settlement = await self.db.settlements.find_one({"_id": prediction_id})
+        while settlement["status"] == "running":
+            stakes = await self.db.stakes.find(
+                {"prediction_id": prediction_id, "id": {"$gt": settlement["last_stake_id"]}},
+                {"_id": 0, "id": 1, "amount": 1, "side": 1, "wallet_address": 1, "timestamp": 1}
+            ).sort("id", 1).limit(self.chunk_size).to_list(self.chunk_size)
+            if not stakes:
+                settlement = await self.db.settlements.find_one_and_update(
+                    {"_id": prediction_id},
+                    {"$set": {"status": "settled", "finished_at": datetime.now(timezone.utc)}},
+                    return_document=ReturnDocument.AFTER
+                )
+                await self._release_guards(prediction_id)
+                break
+            settlement = await self._settle_chunk(settlement, stakes)
+        logger.info(f"Settled {settlement['stakes_settled']} stakes on {prediction_id}, paid {settlement['total_paid']}")
+        return settlement
+
+    async def settle(self, prediction_id: str, outcome: str, cutoff: Optional[datetime] = None) -> Dict[str, Any]:
+        await self.start(prediction_id, outcome, cutoff)
+        return await self.run(prediction_id)
+
+    def schedule(self, prediction_id: str) -> asyncio.Task:
+        """Run a started settlement in the background, once per prediction"""
+        task = self._tasks.get(prediction_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self.run(prediction_id))
+            self._tasks[prediction_id] = task
+            task.add_done_callback(lambda t: self._tasks.pop(prediction_id, None))
+        return task
+
+    async def resume_pending(self) -> int:
+        """Restart settlements a previous process left running"""
+        pending = [s["_id"] async for s in self.db.settlements.find({"status": "running"}, {"_id": 1})]
+        for prediction_id in pending:
+            self.schedule(prediction_id)
+        if pending:
+            logger.info(f"Resuming {len(pending)} settlements")
+        return len(pending)
+
+    async def stop(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
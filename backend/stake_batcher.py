@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class StakeBatcher:
+    """Collects stakes over a short window and submits them as one batched call"""
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.window = float(os.getenv("LINERA_BATCH_WINDOW_MS", "0")) / 1000
+        self.max_size = int(os.getenv("LINERA_BATCH_MAX_SIZE", "64"))
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._submissions = set()
+        self.stats = {
+            "batches": 0,
+            "operations": 0,
+            "batch_size_buckets": {str(b): 0 for b in BATCH_SIZE_BUCKETS + ["+Inf"]},
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def stake(self, market_id: int, amount: int, prediction: bool) -> Dict[str, Any]:
+        """Queue a stake and wait for the result of the batch it lands in"""
+        if not self.enabled:
+            return await self.adapter.stake(market_id=market_id, amount=amount, prediction=prediction)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(({"market_id": market_id, "amount": amount, "prediction": prediction}, future))
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """Submit everything queued so far as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._submit(batch))
+            self._submissions.add(task)
+            task.add_done_callback(self._submissions.discard)
+
+    async def _submit(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        self._record_batch(len(batch))
+        try:
+            results = await self.adapter.call_operations([("Stake", params) for params, _ in batch])
+        except Exception as e:
+            logger.error(f"Stake batch of {len(batch)} failed: {e}")
+            results = [{"success": False, "error": str(e)} for _ in batch]
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record_batch(self, size: int):
+        self.stats["batches"] += 1
+        self.stats["operations"] += size
+        bucket = next((str(b) for b in BATCH_SIZE_BUCKETS if size <= b), "+Inf")
+        self.stats["batch_size_buckets"][bucket] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "avg_batch_size": round(self.stats["operations"] / batches, 2) if batches else 0.0,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from platform_stats import STATS_ID
+
+logger = logging.getLogger(__name__)
+
+
+class StakeWriteBehindBuffer:
+    """Sums total_stake increments per prediction in memory and flushes them in one bulk write.
+
+    Stakes are inserted with aggregated=False before they are buffered, so the
+    stakes collection is the write-ahead log. A flush tags its stakes with a
+    batch id, applies the increments guarded by that id, then marks the stakes
+    aggregated. recover() re-applies anything a crash left unaggregated. A
+    document keeps the id of every batch applied to it until that batch's
+    stakes are aggregated, so a replay is a no-op however late it comes.
+
+    Other workers share the stakes collection, and a live worker's stakes are
+    in its memory until its next flush, so recovery only claims stakes older
+    than recover_after; it runs at startup and again every recover_after.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.enabled = os.getenv("STAKE_WRITE_BEHIND", "false").lower() == "true"
+        self.flush_interval = float(os.getenv("STAKE_FLUSH_INTERVAL_MS", "200")) / 1000
+        # Far longer than a flush takes, so only stakes whose worker died are this old and unaggregated
+        self.recover_after = float(os.getenv("STAKE_RECOVER_AFTER_S", "60"))
+        self._deltas: Dict[str, float] = {}
+        self._stake_ids: List[str] = []
+        self._retry: List[Tuple[str, Dict[str, float]]] = []
+        self._task: Optional[asyncio.Task] = None
+        # Called with the prediction ids whose totals a flush changed
+        self.on_flush: Optional[Callable[[List[str]], Awaitable[None]]] = None
+        self.stats = {"flushes": 0, "stakes_flushed": 0, "predictions_updated": 0, "flush_errors": 0}
+
+    def add(self, prediction_id: str, amount: float, stake_id: str):
+        self._deltas[prediction_id] = self._deltas.get(prediction_id, 0.0) + amount
+        self._stake_ids.append(stake_id)
+
+    async def _apply_batch(self, batch_id: str, deltas: Dict[str, float]):
+        """Apply one batch's increments; safe to repeat"""
+        guard = {"stake_batches": {"$ne": batch_id}}
+        push = {"$push": {"stake_batches": batch_id}}
+        operations = [
+            UpdateOne({"id": prediction_id, **guard}, {"$inc": {"total_stake": amount}, **push})
+            for prediction_id, amount in deltas.items()
+        ]
+        await self.db.predictions.bulk_write(operations, ordered=False)
+        await self.db.platform_stats.update_one(
+            {"_id": STATS_ID, **guard}, {"$inc": {"total_staked": sum(deltas.values())}, **push}
+        )
+        await self.db.stakes.update_many({"flush_batch": batch_id}, {"$set": {"aggregated": True}})
+        # Nothing replays a batch whose stakes are aggregated, so its guard can go
+        pull = {"$pull": {"stake_batches": batch_id}}
+        await self.db.predictions.update_many({"id": {"$in": list(deltas)}}, pull)
+        await self.db.platform_stats.update_one({"_id": STATS_ID}, pull)
+        self.stats["predictions_updated"] += len(deltas)
+        if self.on_flush is not None:
+            await self.on_flush(list(deltas))
+
+    async def flush(self):
+        """Write the buffered increments"""
+        for batch_id, deltas in list(self._retry):
+            await self._apply_batch(batch_id, deltas)
+            self._retry.remove((batch_id, deltas))
+
+        if not self._deltas:
+            return
+        deltas, self._deltas = self._deltas, {}
+        stake_ids, self._stake_ids = self._stake_ids, []
+        batch_id = str(uuid.uuid4())
+
+        try:
+            await self.db.stakes.update_many({"id": {"$in": stake_ids}}, {"$set": {"flush_batch": batch_id}})
+        except Exception:
+            # Nothing was applied yet, so put the increments back for the next flush
+            for prediction_id, amount in deltas.items():
+                self._deltas[prediction_id] = self._deltas.get(prediction_id, 0.0) + amount
+            self._stake_ids[:0] = stake_ids
+            raise
+        try:
+            await self._apply_batch(batch_id, deltas)
+        except Exception:
+            # The stakes are tagged, so retrying the same batch cannot double-count
+            self._retry.append((batch_id, deltas))
+            raise
+        self.stats["flushes"] += 1
+        self.stats["stakes_flushed"] += len(stake_ids)
+
+    async def recover(self) -> int:
+        """Re-apply stakes a crash left unaggregated; returns how many were recovered"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.recover_after)
+        orphan_batch = str(uuid.uuid4())
+        await self.db.stakes.update_many(
+            {"aggregated": False, "flush_batch": None, "timestamp": {"$lt": cutoff}},
+            {"$set": {"flush_batch": orphan_batch}}
+        )
+        pipeline = [
+            {"$match": {"aggregated": False, "flush_batch": {"$ne": None}}},
+            {"$group": {
+                "_id": {"batch": "$flush_batch", "prediction": "$prediction_id"},
+                "amount": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+                "newest": {"$max": "$timestamp"},
+            }},
+        ]
+        batches: Dict[str, Dict[str, float]] = {}
+        counts: Dict[str, int] = {}
+        live = set()
+        async for row in self.db.stakes.aggregate(pipeline):
+            batch_id = row["_id"]["batch"]
+            batches.setdefault(batch_id, {})[row["_id"]["prediction"]] = row["amount"]
+            counts[batch_id] = counts.get(batch_id, 0) + row["count"]
+            if row["newest"].replace(tzinfo=timezone.utc) >= cutoff:
+                live.add(batch_id)
+        recovered = 0
+        for batch_id, deltas in batches.items():
+            # A batch with recent stakes may still be mid-flush in its worker; applying part of it would
+            # record the batch id and make the worker's own full apply a no-op
+            if batch_id in live:
+                continue
+            await self._apply_batch(batch_id, deltas)
+            recovered += counts[batch_id]
+        if recovered:
+            logger.info(f"Recovered {recovered} unflushed stakes in {len(batches)} batches")
+        return recovered
+
+    async def _run(self):
+        last_recovery = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.stats["flush_errors"] += 1
+                logger.error(f"Stake flush failed: {e}")
+            if time.monotonic() - last_recovery >= self.recover_after:
+                last_recovery = time.monotonic()
+                try:
+                    await self.recover()
+                except Exception as e:
+                    logger.error(f"Stake recovery failed: {e}")
+
+    async def start(self):
+        await self.recover()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "pending_stakes": len(self._stake_ids),
+            "pending_predictions": len(self._deltas),
+            "retrying_batches": len(self._retry),
+        }
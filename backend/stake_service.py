@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from platform_stats import record_stake
+from wallet_ledger import record_wallet_stake
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionNotFound(Exception):
+    pass
+
+
+class PredictionClosed(Exception):
+    """The prediction is resolved and no longer takes stakes"""
+
+
+class IdempotencyConflict(Exception):
+    """The idempotency key was already used for a different stake"""
+
+
+class StakeService:
+    """Writes a stake and everything derived from it.
+
+    With a replica set the stake insert and all increments commit in one
+    transaction. On a standalone server the stake is inserted first (so the
+    idempotency check happens before any increment) and increments follow;
+    a crash between the two leaves derived totals behind until they are
+    reconciled.
+
+    With a write-behind buffer the prediction and platform totals are not
+    touched per stake; the buffer folds them into periodic bulk writes.
+
+    Round trips: without a transaction a stake costs three sequential ones
+    (insert, prediction increment, then the wallet ledger and platform stats
+    together), the same as before the ledgers existed. A transaction runs one
+    operation at a time on its session and adds the commit, so it costs five;
+    that is the price of atomicity, and the ledgers save an aggregation on
+    every read of /api/statistics and wallet balances. The insert stays first:
+    the unique idempotency key on stakes is the only check that catches a
+    retry of a stake that has already been applied.
+
+    A buffered stake registers itself on the prediction with a conditional
+    write before it is inserted, so a resolve either rejects it or waits for it.
+    """
+
+    def __init__(self, client, db, buffer=None):
+        self.client = client
+        self.db = db
+        self.buffer = buffer
+        self.mode = os.getenv("MONGO_TRANSACTIONS", "auto")  # auto, on or off
+        self._transactions: Optional[bool] = None if self.mode == "auto" else self.mode == "on"
+
+    async def transactions_supported(self) -> bool:
+        if self._transactions is None:
+            try:
+                hello = await self.client.admin.command("hello")
+                self._transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+            except Exception as e:
+                logger.warning(f"Could not detect transaction support: {e}")
+                self._transactions = False
+            if not self._transactions:
+                logger.warning("MongoDB transactions unavailable, stakes are written without a transaction")
+        return self._transactions
+
+    async def place_stake(
+        self, prediction_id: str, wallet_address: str, amount: float, idempotency_key: Optional[str] = None,
+        side: str = "for"
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Record a stake for or against the prediction; returns (result, replayed)"""
+        record = {
+            "id": str(uuid.uuid4()),
+            "prediction_id": prediction_id,
+            "wallet_address": wallet_address,
+            "amount": amount,
+            "side": side,
+            "timestamp": datetime.now(timezone.utc),
+        }
+        if idempotency_key:
+            record["idempotency_key"] = idempotency_key
+
+        try:
+            if self.buffer is not None:
+                await self._apply_buffered(record)
+            elif await self.transactions_supported():
+                async with await self.client.start_session() as session:
+                    await session.with_transaction(lambda s: self._apply(record, s))
+            else:
+                await self._apply(record, None)
+        except DuplicateKeyError:
+            if not idempotency_key:
+                raise
+            return await self._replay(record), True
+
+        return {"message": "Stake successful", "stake_id": record["id"]}, False
+
+    async def _apply(self, record: Dict[str, Any], session):
+        db = self.db
+        await db.stakes.insert_one(record, session=session)
+        prediction = await db.predictions.find_one_and_update(
+            {"id": record["prediction_id"], "status": {"$ne": "resolved"}},
+            {"$inc": {"total_stake": record["amount"]}},
+            projection={"_id": 1},
+            session=session
+        )
+        if prediction is None:
+            if session is None:
+                await db.stakes.delete_one({"id": record["id"]})
+            # Raising inside with_transaction aborts it
+            if await db.predictions.find_one({"id": record["prediction_id"]}, {"_id": 1}, session=session):
+                raise PredictionClosed(record["prediction_id"])
+            raise PredictionNotFound(record["prediction_id"])
+        if session is None:
+            # Independent writes, so they can share one round trip
+            await asyncio.gather(
+                record_wallet_stake(db, record["wallet_address"], record["prediction_id"], record["amount"]),
+                record_stake(db, record["amount"]),
+            )
+        else:
+            await record_wallet_stake(db, record["wallet_address"], record["prediction_id"], record["amount"], session=session)
+            await record_stake(db, record["amount"], session=session)
+
+    async def _apply_buffered(self, record: Dict[str, Any]):
+        db = self.db
+        # Registering the stake is conditional on the prediction still being open, so
+        # it is ordered against the resolve; settlement waits for registered stakes
+        opened = await db.predictions.find_one_and_update(
+            {"id": record["prediction_id"], "status": {"$ne": "resolved"}},
+            {"$push": {"placing_stakes": record["id"]}},
+            projection={"_id": 1}
+        )
+        if opened is None:
+            if await db.predictions.find_one({"id": record["prediction_id"]}, {"_id": 1}):
+                raise PredictionClosed(record["prediction_id"])
+            raise PredictionNotFound(record["prediction_id"])
+        release = {"$pull": {"placing_stakes": record["id"]}}
+        try:
+            # The unaggregated stake is what the buffer recovers from after a crash
+            await db.stakes.insert_one({**record, "aggregated": False})
+        except Exception:
+            await db.predictions.update_one({"id": record["prediction_id"]}, release)
+            raise
+        await asyncio.gather(
+            record_wallet_stake(db, record["wallet_address"], record["prediction_id"], record["amount"]),
+            db.predictions.update_one({"id": record["prediction_id"]}, release),
+        )
+        self.buffer.add(record["prediction_id"], record["amount"], record["id"])
+
+    async def _replay(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        existing = await self.db.stakes.find_one({"idempotency_key": record["idempotency_key"]})
+        if existing is None:
+            raise PyMongoError("Duplicate idempotency key but no stake found")
+        same_request = all(existing.get(k) == record[k] for k in ("prediction_id", "wallet_address", "amount", "side"))
+        if not same_request:
+            raise IdempotencyConflict(record["idempotency_key"])
+        return {"message": "Stake successful", "stake_id": existing["id"]}
@@ -0,0 +1,40 @@
+"""Minimal stand-in for the Pyth Hermes price API.
+
+Answers /v2/updates/price/latest for any feed id with a slowly drifting
+price. Mount it with httpx.ASGITransport in tests, or serve it for
+benchmarks:
+
+    FAKE_HERMES_LATENCY=0.02 uvicorn tests.fake_hermes:app --port 8090
+"""
+import asyncio
+import os
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+LATENCY = float(os.getenv("FAKE_HERMES_LATENCY", "0"))
+
+requests_served = 0
+
+
+def price_update(feed_id: str):
+    now = int(time.time())
+    # Stable per feed, moving a little every second
+    base = int(feed_id[-6:], 16) % 50_000 + 100
+    price = base * 100_000_000 + (now % 600) * 1_000_000
+    quote = {"price": str(price), "conf": str(price // 2000), "expo": -8, "publish_time": now}
+    return {"id": feed_id.lower().removeprefix("0x"), "price": quote, "ema_price": quote}
+
+
+async def latest(request):
+    global requests_served
+    requests_served += 1
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    ids = request.query_params.getlist("ids[]")
+    return JSONResponse({"binary": {"encoding": "hex", "data": []}, "parsed": [price_update(i) for i in ids]})
+
+
+app = Starlette(routes=[Route("/v2/updates/price/latest", latest)])
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Stand-in for the `linera` CLI used by tests and benchmarks.
+
+FAKE_LINERA_LATENCY  seconds to sleep before answering (default 0)
+FAKE_LINERA_FAIL     exit non-zero when set to 1
+FAKE_LINERA_STATE    path to a JSON file returned by `client query`
+"""
+import json
+import os
+import sys
+import time
+
+time.sleep(float(os.getenv("FAKE_LINERA_LATENCY", "0")))
+
+if os.getenv("FAKE_LINERA_FAIL") == "1":
+    sys.stderr.write("fake linera failure\n")
+    sys.exit(1)
+
+args = sys.argv[1:]
+if args[:2] == ["client", "query"]:
+    state_path = os.getenv("FAKE_LINERA_STATE")
+    if state_path:
+        with open(state_path) as f:
+            sys.stdout.write(f.read())
+    else:
+        sys.stdout.write(json.dumps({"markets": [], "next_market_id": 0}))
+elif args[:2] == ["client", "call"]:
+    operation = args[args.index("--operation") + 1]
+    params = json.loads(args[args.index("--params") + 1])
+    sys.stdout.write(json.dumps({"operation": operation, "params": params}))
+else:
+    sys.stderr.write(f"unsupported command: {' '.join(args)}\n")
+    sys.exit(2)
@@ -0,0 +1,57 @@
+"""In-memory stand-in for the redis.asyncio commands RedisCacheBackend uses"""
+import time
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.set_expiry = {}
+
+    async def get(self, key):
+        item = self.values.get(key)
+        if item is None or (item[1] is not None and item[1] <= time.monotonic()):
+            self.values.pop(key, None)
+            return None
+        return item[0]
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def mget(self, *keys):
+        return [await self.get(key) for key in keys]
+
+    async def incr(self, key):
+        value = int(await self.get(key) or 0) + 1
+        expiry = self.values[key][1] if key in self.values else None
+        self.values[key] = (str(value).encode(), expiry)
+        return value
+
+    async def expire(self, key, seconds):
+        if key in self.values:
+            self.values[key] = (self.values[key][0], time.monotonic() + seconds)
+            return True
+        if key in self.sets:
+            self.set_expiry[key] = time.monotonic() + seconds
+            return True
+        return False
+
+    def expires_in(self, key):
+        expiry = self.values[key][1] if key in self.values else self.set_expiry.get(key)
+        return -1 if expiry is None else expiry - time.monotonic()
+
+    async def sadd(self, key, *members):
+        members = {m.encode() for m in members}
+        added = members - self.sets.setdefault(key, set())
+        self.sets[key] |= members
+        return len(added)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    async def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += (self.values.pop(key, None) is not None) + (self.sets.pop(key, None) is not None)
+        return removed
@@ -0,0 +1,87 @@
+"""Minimal stand-in for the Linera node service GraphQL endpoint.
+
+Understands the mutations and the state query LineraAdapter sends and keeps
+markets in memory. Mount it with httpx.ASGITransport in tests, or serve it
+for benchmarks:
+
+    uvicorn tests.linera_stub:app --port 8080
+"""
+import asyncio
+import json
+import os
+import re
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+FIELD_RE = re.compile(r'(?:(\w+)\s*:\s*)?(\w+)\s*\(((?:[^()"]|"(?:[^"\\]|\\.)*")*)\)')
+ARG_RE = re.compile(r'(\w+)\s*:\s*("(?:[^"\\]|\\.)*"|true|false|null|-?\d+(?:\.\d+)?)')
+
+LATENCY = float(os.getenv("LINERA_STUB_LATENCY", "0"))
+
+
+class StubChain:
+    def __init__(self):
+        self.markets = []
+        self.block_height = 0
+
+    def execute(self, field, args):
+        if field == "createMarket":
+            market = {
+                "id": len(self.markets),
+                "title": args["title"],
+                "description": args["description"],
+                "category": args["category"],
+                "eventDate": args["eventDate"],
+                "totalStakeYes": 0,
+                "totalStakeNo": 0,
+                "resolved": False,
+                "outcome": None,
+            }
+            self.markets.append(market)
+            return market["id"]
+        if field == "stake":
+            market = self.markets[args["marketId"]]
+            side = "totalStakeYes" if args["prediction"] else "totalStakeNo"
+            market[side] += args["amount"]
+            return True
+        if field == "resolveMarket":
+            market = self.markets[args["marketId"]]
+            market["resolved"] = True
+            market["outcome"] = args["outcome"]
+            return True
+        raise KeyError(f"Unknown operation {field}")
+
+
+chain = StubChain()
+
+
+async def application(request):
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    document = (await request.json())["query"].strip()
+
+    if document.startswith("mutation"):
+        data, errors = {}, []
+        # All fields of one mutation document land in the same block; like any
+        # GraphQL executor, a failing field is nulled and reported by its path
+        for alias, field, raw_args in FIELD_RE.findall(document):
+            args = {k: json.loads(v) for k, v in ARG_RE.findall(raw_args)}
+            try:
+                data[alias or field] = chain.execute(field, args)
+            except (KeyError, IndexError) as e:
+                data[alias or field] = None
+                errors.append({"message": str(e), "path": [alias or field]})
+        if len(errors) < len(data):
+            chain.block_height += 1
+        if errors:
+            return JSONResponse({"data": data, "errors": errors})
+        return JSONResponse({"data": data})
+
+    return JSONResponse({"data": {"markets": chain.markets, "nextMarketId": len(chain.markets)}})
+
+
+app = Starlette(routes=[
+    Route("/chains/{chain_id}/applications/{application_id}", application, methods=["POST"]),
+])
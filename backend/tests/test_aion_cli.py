@@ -0,0 +1,72 @@
+import io
+import json
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "scripts"))
+
+from linera_adapter import LineraAdapter
+from aion_cli import Checkpoint, read_rows, run_batch
+
+FAKE_LINERA = str(Path(__file__).parent / "fake_linera.py")
+
+OPS = "\n".join([
+    '{"op": "create", "title": "A", "description": "d", "category": "Finance", "event_date": 1}',
+    '',
+    '{"op": "stake", "market_id": 1, "amount": 5, "prediction": true}',
+    '{"op": "stake", "market_id": 1}',
+    '{"op": "resolve", "market_id": 1, "outcome": false}',
+    '[1, 2]',
+    '{"op": "stake", "market_id": 1, "amount": 10.9, "prediction": true}',
+]) + "\n"
+
+
+@pytest.fixture
+def adapter():
+    adapter = LineraAdapter()
+    adapter.binary = FAKE_LINERA
+    adapter.app_id = "test-app"
+    return adapter
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_results_and_resumes_after_failures(adapter, tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    out = io.StringIO()
+    summary = await run_batch(adapter, read_rows(io.StringIO(OPS), "ndjson"), out, Checkpoint(checkpoint_path),
+                              parallel=3, progress=io.StringIO())
+
+    results = {r["line"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert sorted(results) == [1, 3, 4, 5, 6, 7]
+    assert results[3]["operation"] == "Stake" and results[3]["success"]
+    assert "needs amount" in results[4]["error"]
+    assert "expected an object" in results[6]["error"]
+    assert "not an integer" in results[7]["error"]
+    assert summary["processed"] == 6 and summary["failed"] == 3
+    assert json.loads(checkpoint_path.read_text()) == {"done_through": 3, "done": [5]}
+
+    # Only the failed line runs again
+    out = io.StringIO()
+    summary = await run_batch(adapter, read_rows(io.StringIO(OPS), "ndjson"), out, Checkpoint(checkpoint_path),
+                              progress=io.StringIO())
+    assert sorted(json.loads(line)["line"] for line in out.getvalue().splitlines()) == [4, 6, 7]
+    assert summary["skipped"] == 3
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_are_chunked_into_one_call(adapter, monkeypatch):
+    calls = []
+
+    async def call_operations(operations):
+        calls.append(operations)
+        return [{"success": True}] * len(operations)
+
+    monkeypatch.setattr(adapter, "call_operations", call_operations)
+    rows = read_rows(io.StringIO("op,market_id,amount,prediction\nstake,1,10,yes\nstake,2,20,false\n"), "csv")
+    checkpoint = Checkpoint()
+    await run_batch(adapter, rows, io.StringIO(), checkpoint, parallel=1, chunk=2, progress=io.StringIO())
+
+    assert calls == [[("Stake", {"market_id": 1, "amount": 10, "prediction": True}),
+                      ("Stake", {"market_id": 2, "amount": 20, "prediction": False})]]
+    assert checkpoint.done_through == 3
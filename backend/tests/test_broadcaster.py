@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from broadcaster import Broadcaster
+
+
+@pytest.mark.asyncio
+async def test_one_update_is_computed_per_interval_for_all_subscribers():
+    calls = []
+
+    async def producer():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    broadcaster = Broadcaster(producer, interval=10)
+    queues = [broadcaster.subscribe() for _ in range(50)]
+    messages = await asyncio.gather(*(q.get() for q in queues))
+    assert len(calls) == 1
+    assert set(messages) == {'{"n": 1}'}
+    await broadcaster.stop()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_only_keeps_latest_update():
+    broadcaster = Broadcaster(lambda: None, interval=10)
+    queue = asyncio.Queue(maxsize=1)
+    broadcaster._subscribers.add(queue)
+    for i in range(3):
+        broadcaster.publish(str(i))
+    assert queue.qsize() == 1
+    assert queue.get_nowait() == "2"
+    assert broadcaster.stats["dropped"] == 2
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from indexes import ensure_indexes
+from dao_votes import AlreadyVoted, VoteTally
+
+
+@pytest_asyncio.fixture
+async def tally():
+    db = AsyncMongoMockClient()["aion_test"]
+    await ensure_indexes(db, ["votes", "vote_counters"])
+    await db.dao_proposals.insert_many([
+        {"id": "d1", "votes_for": 100, "votes_against": 10, "total_votes": 110},
+        {"id": "d2", "votes_for": 0, "votes_against": 0, "total_votes": 0},
+    ])
+    return VoteTally(db, shards=8, cache_ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_votes_are_spread_over_shards_and_summed(tally):
+    votes = [tally.record_vote("d1", f"0x{i}", "for" if i % 3 else "against") for i in range(600)]
+    await asyncio.gather(*votes)
+
+    result = await tally.get_tallies(["d1", "d2", "unknown"])
+    assert result["d1"] == {"votes_for": 500, "votes_against": 210, "total_votes": 710}
+    assert result["d2"]["total_votes"] == 0
+    assert "unknown" not in result
+    assert await tally.db.vote_counters.count_documents({"proposal_id": "d1"}) == 8
+
+
+@pytest.mark.asyncio
+async def test_second_vote_from_a_wallet_is_rejected(tally):
+    await tally.record_vote("d2", "0xa", "for")
+    with pytest.raises(AlreadyVoted):
+        await tally.record_vote("d2", "0xa", "against")
+    assert (await tally.get_tallies(["d2"]))["d2"] == {"votes_for": 1, "votes_against": 0, "total_votes": 1}
+
+
+@pytest.mark.asyncio
+async def test_rebuild_counters_matches_recorded_votes(tally):
+    for i in range(20):
+        await tally.record_vote("d2", f"0x{i}", "for")
+    # A lost increment, as after a crash between insert and counter update
+    await tally.db.vote_counters.update_one({"proposal_id": "d2"}, {"$inc": {"votes_for": -1}})
+    await tally.rebuild_counters()
+    assert (await tally.get_tallies(["d2"]))["d2"]["votes_for"] == 20
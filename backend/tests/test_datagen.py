@@ -0,0 +1,79 @@
+import numpy as np
+import os
+import pytest
+import sys
+from collections import Counter
+from dataclasses import replace
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "aion_test")
+
+from mongomock_motor import AsyncMongoMockClient
+import datagen
+from datagen import PRESETS, chunk_documents, chunks, finalize, load
+
+SPEC = replace(PRESETS["demo"], predictions=1000, stakes=20_000, wallets=2000, proposals=10, votes=3000,
+               chunk_size=4000)
+
+
+def test_chunks_are_deterministic_and_independent_of_order():
+    first = chunk_documents(SPEC, "stakes", 3)
+    datagen.popularity.cache_clear()
+    datagen.vote_layout.cache_clear()
+    assert chunk_documents(SPEC, "stakes", 3) == first
+    assert chunk_documents(replace(SPEC, seed=7), "stakes", 3) != first
+
+
+def test_stakes_concentrate_on_hot_predictions_and_whales():
+    stakes = [s for kind, chunk in chunks(SPEC) if kind == "stakes" for s in chunk_documents(SPEC, kind, chunk)]
+    assert len(stakes) == SPEC.stakes
+
+    per_prediction = Counter(s["prediction_id"] for s in stakes)
+    top_predictions = sum(n for _, n in per_prediction.most_common(SPEC.predictions // 100))
+    assert top_predictions / SPEC.stakes > 0.2
+
+    per_wallet = Counter()
+    for s in stakes:
+        per_wallet[s["wallet_address"]] += s["amount"]
+    amounts = np.sort(np.fromiter(per_wallet.values(), dtype=float))[::-1]
+    assert amounts[:SPEC.wallets // 100].sum() / amounts.sum() > 0.5
+
+
+def test_a_wallet_votes_once_per_proposal():
+    votes = [v for kind, chunk in chunks(SPEC) if kind == "votes" for v in chunk_documents(SPEC, kind, chunk)]
+    assert len({(v["proposal_id"], v["wallet_address"]) for v in votes}) == len(votes)
+
+
+@pytest.mark.asyncio
+async def test_demo_preset_loads_with_consistent_derived_state():
+    db = AsyncMongoMockClient(tz_aware=True)["aion_test"]
+    written = await load(db, PRESETS["demo"])
+    await finalize(db)
+
+    assert written["predictions"] == 15 and written["stakes"] == 300
+    staked = Counter()
+    async for stake in db.stakes.find():
+        staked[stake["prediction_id"]] += stake["amount"]
+    async for prediction in db.predictions.find():
+        assert prediction["total_stake"] == pytest.approx(staked[prediction["id"]], abs=0.01)
+    assert sorted([m["rank"] async for m in db.ai_models.find()]) == [1, 2, 3, 4, 5]
+    assert await db.platform_stats.find_one({"total_predictions": 15})
+
+    with pytest.raises(RuntimeError):
+        await load(db, PRESETS["demo"])
+
+
+@pytest.mark.asyncio
+async def test_documents_that_drift_from_the_api_models_are_not_loaded(monkeypatch):
+    def drifted(spec, start, stop, rng):
+        documents = datagen.prediction_documents(spec, start, stop, rng)
+        for document in documents:
+            del document["confidence_score"]
+        return documents
+
+    monkeypatch.setitem(datagen.BUILDERS, "predictions", drifted)
+    db = AsyncMongoMockClient(tz_aware=True)["aion_test"]
+    with pytest.raises(ValueError, match="Prediction"):
+        await load(db, PRESETS["demo"])
+    assert await db.ai_models.count_documents({}) == 0
@@ -0,0 +1,186 @@
+import json
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from chain_events import EventLogSource
+from indexer import HashRing, LineraIndexer, ShardedIndexer
+
+
+class FakeAdapter:
+    chain_id = "test-chain"
+
+    def __init__(self, markets):
+        self.markets = markets
+        self.queried = []
+
+    async def query_state(self, chain_id=None):
+        self.queried.append(chain_id)
+        return {"markets": self.markets}
+
+
+def make_market(market_id, stake_yes=0):
+    return {
+        "id": market_id, "title": f"Market {market_id}", "description": "d", "category": "Finance",
+        "event_date": 1735689600, "total_stake_yes": stake_yes, "total_stake_no": 0,
+        "resolved": False, "outcome": None,
+    }
+
+
+@pytest.fixture
+def indexer():
+    adapter = FakeAdapter([make_market(i) for i in range(5)])
+    return LineraIndexer(db=AsyncMongoMockClient()["aion_test"], adapter=adapter)
+
+
+@pytest.mark.asyncio
+async def test_only_changed_markets_are_written(indexer):
+    await indexer.sync_markets()
+    assert indexer.last_cycle["changed"] == 5
+    assert await indexer.markets_collection.count_documents({}) == 5
+
+    await indexer.sync_markets()
+    assert indexer.last_cycle["changed"] == 0
+    assert indexer.last_cycle["bytes_written"] == 0
+
+    indexer.adapter.markets[2] = make_market(2, stake_yes=100)
+    await indexer.sync_markets()
+    assert indexer.last_cycle["changed"] == 1
+    market = await indexer.markets_collection.find_one({"market_id": 2})
+    assert market["total_stake_yes"] == 100
+
+
+@pytest.mark.asyncio
+async def test_restarted_indexer_reuses_persisted_hashes(indexer):
+    await indexer.sync_markets()
+    restarted = LineraIndexer(db=indexer.db, adapter=indexer.adapter)
+    await restarted.sync_markets()
+    assert restarted.last_cycle["changed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_markets_mirrored_without_a_chain_id_are_backfilled(indexer):
+    await indexer.markets_collection.insert_many([
+        {"market_id": i, "title": f"Market {i}", "total_stake_yes": 0} for i in range(3)
+    ])
+    await indexer.markets_collection.insert_one({"chain_id": "test-chain", "market_id": 2, "total_stake_yes": 7})
+
+    await indexer.backfill_chain_id()
+    assert await indexer.markets_collection.count_documents({"chain_id": None}) == 0
+    assert await indexer.markets_collection.count_documents({"chain_id": "test-chain"}) == 3
+    market = await indexer.markets_collection.find_one({"market_id": 2})
+    assert market["total_stake_yes"] == 7
+
+
+@pytest.mark.asyncio
+async def test_queries_only_name_a_chain_that_was_chosen(indexer, monkeypatch):
+    monkeypatch.delenv("LINERA_CHAIN_ID", raising=False)
+    await LineraIndexer(db=indexer.db, adapter=indexer.adapter).sync_markets()
+    await LineraIndexer(db=indexer.db, adapter=indexer.adapter, chain_id="chain-1").sync_markets()
+    assert indexer.adapter.queried == [None, "chain-1"]
+
+
+def write_block_log(path):
+    blocks = [
+        {"height": 1, "operations": [{"CreateMarket": {
+            "market_id": 7, "title": "BTC $150k", "description": "d", "category": "Finance", "event_date": 1735689600,
+        }}]},
+        {"height": 2, "operations": [
+            {"Stake": {"market_id": 7, "amount": 10, "prediction": True}},
+            {"Stake": {"market_id": 7, "amount": 5, "prediction": True}},
+            {"Stake": {"market_id": 7, "amount": 3, "prediction": False}},
+        ]},
+        {"height": 3, "operations": [{"ResolveMarket": {"market_id": 7, "outcome": True}}]},
+    ]
+    path.write_text("".join(json.dumps(b) + "\n" for b in blocks))
+
+
+@pytest.mark.asyncio
+async def test_event_log_blocks_are_applied_once_and_cursor_persisted(indexer, tmp_path):
+    log = tmp_path / "blocks.ndjson"
+    write_block_log(log)
+    source = EventLogSource(str(log), follow=False)
+
+    async for block in source.events(after=0):
+        await indexer.apply_block(block)
+
+    market = await indexer.markets_collection.find_one({"market_id": 7})
+    assert (market["total_stake_yes"], market["total_stake_no"]) == (15, 3)
+    assert market["resolved"] is True
+
+    # A restart resumes from the persisted cursor; replaying old blocks is a no-op
+    restarted = LineraIndexer(db=indexer.db, adapter=indexer.adapter)
+    await restarted.load_cursor()
+    assert restarted.cursor == 3
+    async for block in source.events(after=1):
+        await restarted.apply_block(block)
+    market = await indexer.markets_collection.find_one({"market_id": 7})
+    assert market["total_stake_yes"] == 15
+
+
+@pytest.mark.asyncio
+async def test_malformed_log_lines_are_skipped(indexer, tmp_path):
+    log = tmp_path / "blocks.ndjson"
+    write_block_log(log)
+    with open(log, "a") as f:
+        f.write('{"height": 4, "operations": [\n')
+        f.write("[1, 2]\n")
+        f.write('{"height": "5"}\n')
+        f.write(json.dumps({"height": 6, "operations": [{"Stake": {"market_id": 7, "amount": 1, "prediction": False}}]}) + "\n")
+
+    async for block in EventLogSource(str(log), follow=False).events(after=0):
+        await indexer.apply_block(block)
+    assert indexer.cursor == 6
+    market = await indexer.markets_collection.find_one({"market_id": 7})
+    assert market["total_stake_no"] == 4
+
+
+
+@pytest.mark.asyncio
+async def test_malformed_operations_are_skipped_without_stalling_the_block(indexer, tmp_path, capsys):
+    log = tmp_path / "blocks.ndjson"
+    write_block_log(log)
+    async for block in EventLogSource(str(log), follow=False).events(after=0):
+        await indexer.apply_block(block)
+
+    await indexer.apply_block({"height": 4, "operations": [
+        {"CreateMarket": {"market_id": 8, "title": "no description"}},
+        {"Stake": {"market_id": 7, "amount": 2, "prediction": True}, "ResolveMarket": {"market_id": 7}},
+        {"Stake": {"amount": 2, "prediction": True}},
+        "Stake",
+        {"Stake": {"market_id": 7, "amount": 1, "prediction": True}},
+        {"Stake": {"market_id": 99, "amount": 1, "prediction": True}},
+    ]})
+    assert indexer.cursor == 4
+    market = await indexer.markets_collection.find_one({"market_id": 7})
+    assert market["total_stake_yes"] == 16
+    assert await indexer.markets_collection.find_one({"market_id": 8}) is None
+    output = capsys.readouterr().out
+    assert output.count("Skipping malformed operation in block 4") == 4
+    assert "dropped: [99]" in output
+
+def test_hash_ring_splits_chains_without_overlap():
+    chains = [f"chain-{i}" for i in range(200)]
+    instances = ["a", "b", "c"]
+    ring = HashRing(instances)
+    shares = [ring.assign(chains, member) for member in instances]
+    assert sorted(sum(shares, [])) == sorted(chains)
+    assert all(len(share) > 30 for share in shares)
+
+    # Adding an instance only moves chains onto the new one
+    grown = HashRing(instances + ["d"])
+    moved = [c for c in chains if grown.owner(c) != ring.owner(c)]
+    assert all(grown.owner(c) == "d" for c in moved)
+
+
+@pytest.mark.asyncio
+async def test_sharded_indexer_records_per_chain_cursors(indexer):
+    chains = [f"chain-{i}" for i in range(6)]
+    sharded = ShardedIndexer(chains, db=indexer.db, adapter=indexer.adapter, workers=3)
+    await sharded.sync_all()
+    assert sharded.last_cycle["changed"] == 30
+    assert await indexer.db.markets.count_documents({"chain_id": "chain-4"}) == 5
+    cursor = await indexer.db.indexer_cursors.find_one({"_id": "chain-4"})
+    assert cursor["owner"] == "indexer-0"
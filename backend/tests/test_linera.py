@@ -1,7 +1,10 @@
+import asyncio
 import pytest
 import sys
+import time
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
 
 from linera_adapter import LineraAdapter
 
@@ -23,3 +26,89 @@ async def test_create_market(adapter):
         event_date=1735689600
     )
     assert "success" in result or "error" in result
+
+FAKE_LINERA = str(Path(__file__).parent / "fake_linera.py")
+
+@pytest.fixture
+def fake_adapter():
+    adapter = LineraAdapter()
+    adapter.binary = FAKE_LINERA
+    adapter.app_id = "test-app"
+    return adapter
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_do_not_block_event_loop(fake_adapter, monkeypatch):
+    monkeypatch.setenv("FAKE_LINERA_LATENCY", "0.3")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.monotonic()
+    results = await asyncio.gather(*(fake_adapter.stake(1, 10, True) for _ in range(4)))
+    elapsed = time.monotonic() - started
+    ticker_task.cancel()
+
+    assert all(r["success"] for r in results)
+    assert elapsed < 1.0
+    assert ticks > 10
+
+@pytest.mark.asyncio
+async def test_timeout_kills_child_process(fake_adapter, monkeypatch):
+    monkeypatch.setenv("FAKE_LINERA_LATENCY", "5")
+    fake_adapter.call_timeout = 0.2
+    result = await fake_adapter.stake(1, 10, True)
+    assert result["success"] is False
+    assert "timed out" in result["error"]
+    assert fake_adapter.get_metrics()["timeouts"] == 1
+    assert fake_adapter.metrics["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_callers_leave_no_queue_depth_behind(fake_adapter, monkeypatch):
+    monkeypatch.setenv("FAKE_LINERA_LATENCY", "5")
+    fake_adapter.set_max_concurrency(1)
+    calls = [asyncio.create_task(fake_adapter.stake(1, 10, True)) for _ in range(3)]
+    await asyncio.sleep(0.2)
+    assert fake_adapter.metrics["queue_depth"] == 2
+    for call in calls:
+        call.cancel()
+    await asyncio.gather(*calls, return_exceptions=True)
+    assert fake_adapter.metrics["queue_depth"] == 0
+    assert fake_adapter.metrics["in_flight"] == 0
+    assert not fake_adapter._semaphore.locked()
+
+@pytest.fixture
+def http_adapter():
+    import httpx
+    import linera_stub
+
+    linera_stub.chain = linera_stub.StubChain()
+    adapter = LineraAdapter()
+    adapter.transport = "http"
+    adapter.app_id = "test-app"
+    adapter._http_client = httpx.AsyncClient(
+        base_url="http://linera.test", transport=httpx.ASGITransport(app=linera_stub.app)
+    )
+    return adapter
+
+@pytest.mark.asyncio
+async def test_http_transport_round_trip(http_adapter):
+    created = await http_adapter.create_market("BTC $150k", "Bitcoin price", "Finance", 1735689600)
+    assert created == {"success": True, "data": 0}
+    assert (await http_adapter.stake(0, 25, True))["success"]
+
+    state = await http_adapter.query_state()
+    assert state["markets"][0]["total_stake_yes"] == 25
+    assert state["next_market_id"] == 1
+
+@pytest.mark.asyncio
+async def test_http_transport_falls_back_to_cli(fake_adapter):
+    fake_adapter.transport = "http"
+    fake_adapter.rpc_url = "http://127.0.0.1:9"
+    result = await fake_adapter.stake(1, 10, True)
+    assert result["success"]
+    assert fake_adapter.metrics["cli_fallbacks"] == 1
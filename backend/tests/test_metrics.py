@@ -0,0 +1,87 @@
+import time
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+from metrics import MetricsMiddleware, StatsCollector, mongo_listener, profiler, render
+
+
+def samples(name):
+    body, _ = render()
+    return [
+        s for family in text_string_to_metric_families(body.decode())
+        for s in family.samples if s.name == name
+    ]
+
+
+def value(name, **labels):
+    return sum(s.value for s in samples(name) if labels.items() <= s.labels.items())
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"id": item_id}
+
+    @app.get("/busy")
+    async def busy():
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+        return {}
+
+    app.add_middleware(MetricsMiddleware, profiling=True)
+    return app
+
+
+def test_requests_are_labelled_by_route_template(app):
+    labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    before = value("aion_http_request_duration_seconds_count", **labels)
+    client = TestClient(app)
+    for item_id in ("a", "b", "c"):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    client.get("/missing")
+
+    assert value("aion_http_request_duration_seconds_count", **labels) == before + 3
+    assert value("aion_http_request_duration_seconds_count", route="unmatched", status="404") >= 1
+    assert not [s for s in samples("aion_http_request_duration_seconds_count") if "/items/a" in s.labels["route"]]
+
+
+def test_mongo_listener_times_commands():
+    before = value("aion_mongo_command_duration_seconds_sum", command="find", outcome="ok")
+    mongo_listener.succeeded(SimpleNamespace(command_name="find", duration_micros=2500))
+    mongo_listener.failed(SimpleNamespace(command_name="insert", duration_micros=100))
+
+    assert value("aion_mongo_command_duration_seconds_sum", command="find", outcome="ok") == pytest.approx(before + 0.0025)
+    assert value("aion_mongo_command_duration_seconds_count", command="insert", outcome="error") >= 1
+
+
+def test_component_stats_become_gauges():
+    collector = StatsCollector()
+    collector.add("stake_batcher", lambda: {"batches": 4, "enabled": True, "mode": "cli", "latency": {"p95": 0.2}})
+    gauges = {family.name: family.samples[0].value for family in collector.collect()}
+    assert gauges == {
+        "aion_stake_batcher_batches": 4.0,
+        "aion_stake_batcher_enabled": 1.0,
+        "aion_stake_batcher_latency_p95": 0.2,
+    }
+
+
+def test_profiled_request_records_its_stacks(app):
+    response = TestClient(app).get("/busy", headers={"X-Profile": "1"})
+    profile_id = response.headers["x-profile-id"]
+
+    folded = profiler.folded(profile_id)
+    assert "busy (test_metrics.py" in folded
+    assert profiler.list()[0]["id"] == profile_id
+    # Unprofiled requests carry no profile header
+    assert "x-profile-id" not in TestClient(app).get("/busy").headers
+    assert not profiler._busy.locked()
@@ -0,0 +1,27 @@
+import pytest
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from migrations import migrate_prediction_dates
+
+
+@pytest.mark.asyncio
+async def test_string_prediction_dates_become_native_dates():
+    db = AsyncMongoMockClient(tz_aware=True)["aion_test"]
+    native = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    await db.predictions.insert_many([
+        {"id": "legacy", "created_at": "2025-01-01T00:00:00+00:00", "event_date": "2025-02-01T00:00:00+00:00"},
+        {"id": "mixed", "created_at": native, "event_date": "2025-03-01T00:00:00+00:00"},
+        {"id": "current", "created_at": native, "event_date": native},
+    ])
+
+    assert await migrate_prediction_dates(db) == 2
+    legacy = await db.predictions.find_one({"id": "legacy"})
+    assert legacy["created_at"] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    mixed = await db.predictions.find_one({"id": "mixed"})
+    assert (mixed["created_at"], mixed["event_date"]) == (native, datetime(2025, 3, 1, tzinfo=timezone.utc))
+    # A second run finds nothing left to convert
+    assert await migrate_prediction_dates(db) == 0
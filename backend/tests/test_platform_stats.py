@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+import platform_stats
+from platform_stats import (
+    RECONCILE_LEASE_ID, acquire_lease, load_platform_stats, reconcile_platform_stats, record_stake
+)
+
+
+@pytest_asyncio.fixture
+async def db():
+    db = AsyncMongoMockClient()["aion_test"]
+    await db.predictions.insert_many([
+        {"id": str(i), "status": "active" if i % 3 else "resolved", "total_stake": 100.0}
+        for i in range(1500)
+    ])
+    await db.ai_models.insert_many([{"id": "a", "accuracy_rate": 90.0}, {"id": "b", "accuracy_rate": 80.0}])
+    return db
+
+
+@pytest.mark.asyncio
+async def test_reconcile_counts_every_prediction(db):
+    stats = await reconcile_platform_stats(db)
+    assert stats["total_predictions"] == 1500
+    assert stats["active_predictions"] == 1000
+    assert stats["total_staked"] == 150000.0
+    assert stats["accuracy_sum"] / stats["total_ai_models"] == 85.0
+
+
+@pytest.mark.asyncio
+async def test_stakes_are_applied_incrementally(db):
+    await load_platform_stats(db)
+    await record_stake(db, 25.5)
+    stats = await load_platform_stats(db)
+    assert stats["total_staked"] == 150025.5
+
+
+@pytest.mark.asyncio
+async def test_stake_landing_during_a_reconcile_is_not_overwritten(db, monkeypatch):
+    await reconcile_platform_stats(db)
+    count = platform_stats.count_platform_stats
+    raced = []
+
+    async def count_then_stake(db):
+        stats = await count(db)
+        if not raced:
+            # A stake commits after the recount read the predictions but before its write
+            raced.append(25.0)
+            await db.predictions.update_one({"id": "0"}, {"$inc": {"total_stake": 25.0}})
+            await record_stake(db, 25.0)
+        return stats
+
+    monkeypatch.setattr(platform_stats, "count_platform_stats", count_then_stake)
+    await reconcile_platform_stats(db)
+    stats = await load_platform_stats(db)
+    assert stats["total_staked"] == 150025.0
+
+
+@pytest.mark.asyncio
+async def test_increment_before_the_first_reconcile_does_not_leave_a_partial_document(db):
+    await record_stake(db, 10.0)
+    stats = await load_platform_stats(db)
+    assert stats["total_predictions"] == 1500
+    assert stats["total_staked"] == 150000.0
+
+
+@pytest.mark.asyncio
+async def test_only_one_worker_holds_the_reconcile_lease(db):
+    assert await acquire_lease(db, RECONCILE_LEASE_ID, "worker-a", 60)
+    assert not await acquire_lease(db, RECONCILE_LEASE_ID, "worker-b", 60)
+    assert await acquire_lease(db, RECONCILE_LEASE_ID, "worker-a", 60)
+    await db.leases.update_one({"_id": RECONCILE_LEASE_ID}, {"$set": {
+        "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)
+    }})
+    assert await acquire_lease(db, RECONCILE_LEASE_ID, "worker-b", 60)
+    assert not await acquire_lease(db, RECONCILE_LEASE_ID, "worker-a", 60)
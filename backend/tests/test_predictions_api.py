@@ -0,0 +1,168 @@
+import asyncio
+import os
+import pytest
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "aion_test")
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+import server
+from response_cache import MemoryCacheBackend, ResponseCache
+from stake_service import StakeService
+from reputation import ReputationEngine
+from settlement import SettlementEngine
+
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = AsyncMongoMockClient(tz_aware=True)["aion_test"]
+    predictions = [{
+        "id": f"pred-{i:03d}",
+        "title": f"Prediction {i}",
+        "description": "d",
+        "category": "Finance" if i % 2 else "Climate",
+        # Pairs share a timestamp so the id tiebreak is exercised
+        "created_at": BASE_TIME + timedelta(minutes=i // 2),
+        "event_date": BASE_TIME + timedelta(days=i),
+        "status": "active",
+        "total_stake": float(i * 100),
+        "ai_model_id": "model-a" if i < 10 else "model-b",
+        "ai_model_name": "Model",
+        "prediction_value": "Bullish",
+        "confidence_score": 0.9,
+        "verification_status": "pending",
+    } for i in range(25)]
+    asyncio.run(db.predictions.insert_many(predictions))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "response_cache", ResponseCache(MemoryCacheBackend()))
+    service = StakeService(None, db)
+    service._transactions = False
+    monkeypatch.setattr(server, "stake_service", service)
+    monkeypatch.setattr(server, "reputation_engine", ReputationEngine(db))
+    monkeypatch.setattr(server, "settlement_engine", SettlementEngine(db))
+    return TestClient(server.app)
+
+
+def test_cursor_pages_cover_every_prediction_once(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/predictions", params=params)
+        assert response.status_code == 200
+        seen += [p["id"] for p in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert seen == [f"pred-{i:03d}" for i in reversed(range(25))]
+
+
+
+def test_cursor_header_is_exposed_to_browsers(client):
+    response = client.get("/api/predictions", params={"limit": 10}, headers={"Origin": "https://app.example"})
+    exposed = {h.strip().lower() for h in response.headers["access-control-expose-headers"].split(",")}
+    assert {"x-next-cursor", "idempotent-replayed"} <= exposed
+
+def test_filters_and_projection(client):
+    response = client.get("/api/predictions", params={
+        "model_id": "model-b", "min_stake": 1500, "max_stake": 2000, "order": "asc", "fields": "title,total_stake",
+    })
+    body = response.json()
+    assert [p["id"] for p in body] == ["pred-015", "pred-016", "pred-017", "pred-018", "pred-019", "pred-020"]
+    assert set(body[0]) == {"id", "created_at", "title", "total_stake"}
+
+
+def test_unknown_field_is_rejected(client):
+    assert client.get("/api/predictions", params={"fields": "secret"}).status_code == 400
+
+
+def test_non_positive_stakes_are_rejected(client):
+    for amount in (0, -5):
+        response = client.post("/api/predictions/pred-003/stake", params={"wallet_address": "0xa", "amount": amount})
+        assert response.status_code == 422
+    assert asyncio.run(server.db.predictions.find_one({"id": "pred-003"}))["total_stake"] == 300.0
+
+
+def test_prediction_is_cached_until_a_stake_changes_it(client):
+    first = client.get("/api/predictions/pred-003")
+    assert first.headers["x-cache"] == "MISS"
+    assert client.get("/api/predictions/pred-003", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    client.post("/api/predictions/pred-003/stake", params={"wallet_address": "0xa", "amount": 50})
+    after = client.get("/api/predictions/pred-003", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200 and after.headers["x-cache"] == "MISS"
+    assert after.json()["total_stake"] == 350.0
+    assert client.get("/api/predictions/missing").status_code == 404
+
+
+def test_fast_responses_match_the_validated_path(client, monkeypatch):
+    asyncio.run(server.db.predictions.update_many({}, {"$set": {"stake_batches": ["b1"]}}))
+    validated = client.get("/api/predictions", params={"limit": 5})
+    monkeypatch.setattr(server, "FAST_RESPONSES", True)
+    fast = client.get("/api/predictions", params={"limit": 5})
+    assert fast.json() == validated.json()
+    assert fast.headers["x-next-cursor"] == validated.headers["x-next-cursor"]
+    # Whole numbers written to float fields come back from Mongo as ints
+    asyncio.run(server.db.predictions.update_many({}, {"$set": {"total_stake": 3, "confidence_score": 1}}))
+    monkeypatch.setattr(server, "FAST_RESPONSES", False)
+    validated = client.get("/api/predictions", params={"limit": 5}).content
+    monkeypatch.setattr(server, "FAST_RESPONSES", True)
+    assert client.get("/api/predictions", params={"limit": 5}).content == validated
+    assert b'"total_stake":3.0' in validated.replace(b" ", b"")
+    projected = client.get("/api/predictions", params={"limit": 5, "fields": "title"})
+    assert set(projected.json()[0]) == {"id", "created_at", "title"}
+
+
+def test_resolve_prediction_updates_model_and_stats(client):
+    asyncio.run(server.db.ai_models.insert_one({"id": "model-a", "rank": 1}))
+    asyncio.run(server.reputation_engine.rebuild())
+    asyncio.run(server.db.platform_stats.insert_one({"_id": "global", "active_predictions": 25, "accuracy_sum": 0.0}))
+
+    assert client.post("/api/predictions/pred-001/resolve", params={"outcome": "correct"}).status_code == 200
+    assert client.post("/api/predictions/pred-001/resolve", params={"outcome": "incorrect"}).status_code == 409
+    assert client.post("/api/predictions/missing/resolve", params={"outcome": "correct"}).status_code == 404
+
+    model = asyncio.run(server.db.ai_models.find_one({"id": "model-a"}))
+    assert (model["total_predictions"], model["accuracy_rate"]) == (1, 100.0)
+    stats = asyncio.run(server.db.platform_stats.find_one({"_id": "global"}))
+    assert (stats["active_predictions"], stats["accuracy_sum"]) == (24, 100.0)
+
+
+def test_retrying_a_resolve_starts_a_settlement_lost_in_a_crash(client):
+    # The status flip happened but the process died before the settlement record was written
+    asyncio.run(server.db.predictions.update_one(
+        {"id": "pred-002"}, {"$set": {"status": "resolved", "outcome": "incorrect", "resolved_at": BASE_TIME}}
+    ))
+    response = client.post("/api/predictions/pred-002/resolve", params={"outcome": "correct"})
+    assert response.status_code == 200 and response.json()["outcome"] == "incorrect"
+    settlement = client.get("/api/settlements/pred-002").json()
+    assert settlement["outcome"] == "incorrect"
+    assert client.post("/api/predictions/pred-002/resolve", params={"outcome": "correct"}).status_code == 409
+
+
+def test_retrying_a_resolve_records_an_outcome_lost_in_a_crash(client):
+    asyncio.run(server.db.ai_models.insert_one({"id": "model-a", "rank": 1}))
+    asyncio.run(server.reputation_engine.rebuild())
+    asyncio.run(server.db.platform_stats.insert_one({"_id": "global", "active_predictions": 25, "accuracy_sum": 0.0}))
+    asyncio.run(server.db.predictions.update_one({"id": "pred-003"}, {"$set": {
+        "status": "resolved", "outcome": "correct", "resolved_at": BASE_TIME,
+        "resolved_from": "active", "outcome_recorded": False,
+    }}))
+    # The model was counted before the crash, platform stats were not
+    asyncio.run(server.reputation_engine.record_resolution(
+        asyncio.run(server.db.predictions.find_one({"id": "pred-003"}))
+    ))
+
+    response = client.post("/api/predictions/pred-003/resolve", params={"outcome": "correct"})
+    assert response.json()["message"] == "Resolution resumed"
+    assert client.post("/api/predictions/pred-003/resolve", params={"outcome": "correct"}).status_code == 409
+
+    model = asyncio.run(server.db.ai_models.find_one({"id": "model-a"}))
+    assert (model["total_predictions"], model["accuracy_rate"], model["resolving"]) == (1, 100.0, [])
+    stats = asyncio.run(server.db.platform_stats.find_one({"_id": "global"}))
+    assert (stats["active_predictions"], stats["accuracy_sum"]) == (24, 100.0)
@@ -0,0 +1,36 @@
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pyth_cache import pyth_cache, PYTH_PRICE_IDS
+from price_stream import HermesPriceStream, PriceRingBuffer, SSEDecoder
+
+FIXTURE = Path(__file__).parent / "fixtures" / "hermes_stream.sse"
+
+
+def test_ring_buffer_keeps_last_n_ticks_in_order():
+    buffer = PriceRingBuffer(capacity=3)
+    for i in range(5):
+        buffer.append(100.0 + i, 1.0, 1000 + i)
+    assert len(buffer) == 3
+    assert buffer.snapshot()["publish_time"].tolist() == [1002, 1003, 1004]
+    assert buffer.latest()["price"] == 104.0
+
+
+def test_decoder_handles_events_split_across_chunks():
+    decoder = SSEDecoder()
+    events = list(decoder.feed(":ok\n\ndata:{\"a\"")) + list(decoder.feed(": 1}\n\n"))
+    assert events == ['{"a": 1}']
+
+
+@pytest.mark.asyncio
+async def test_replayed_fixture_fills_buffers_and_price_cache():
+    stream = HermesPriceStream()
+    await stream.replay(FIXTURE)
+    assert stream.stats["events"] == 6
+    assert len(stream.buffers["BTC/USD"]) == 6
+    assert stream.latest("BTC/USD")["price"] == pytest.approx(65130.95)
+    cached = await pyth_cache.get(PYTH_PRICE_IDS["ETH/USD"])
+    assert cached["publish_time"] == 1735689605
+    assert pyth_cache.stats["upstream_calls"] == 0
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from pyth_cache import PythPriceCache, PYTH_PRICE_IDS
+
+BTC_ID = PYTH_PRICE_IDS["BTC/USD"]
+
+
+def hermes_payload(feed_ids, price=6500000000000, expo=-8):
+    return {
+        "parsed": [{
+            "id": feed_id.replace("0x", ""),
+            "price": {"price": str(price), "conf": "1500000", "expo": expo, "publish_time": 1735689600},
+        } for feed_id in feed_ids]
+    }
+
+
+@pytest.fixture
+def cache():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=hermes_payload(request.url.params.get_list("ids[]")))
+
+    cache = PythPriceCache()
+    cache._client = httpx.AsyncClient(base_url="http://hermes.test", transport=httpx.MockTransport(handler))
+    cache.calls = calls
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_upstream_call(cache):
+    results = await asyncio.gather(*(cache.get(BTC_ID) for _ in range(20)))
+    assert len(cache.calls) == 1
+    assert all(r["price"] == pytest.approx(65000.0) for r in results)
+    assert cache.stats["misses"] == 20
+
+
+@pytest.mark.asyncio
+async def test_fresh_entries_are_served_from_memory(cache):
+    await cache.get(BTC_ID)
+    await cache.get(BTC_ID)
+    assert len(cache.calls) == 1
+    assert cache.get_stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_refetched(cache):
+    cache.ttl = 0
+    await cache.get(BTC_ID)
+    await cache.get(BTC_ID)
+    assert len(cache.calls) == 2
+    assert cache.stats["stale"] == 1
+
+
+@pytest.mark.asyncio
+async def test_many_feeds_are_fetched_in_one_batched_request(cache):
+    feed_ids = list(PYTH_PRICE_IDS.values())
+    prices = await cache.get_many(feed_ids)
+    assert len(cache.calls) == 1
+    assert len(cache.calls[0].url.params.get_list("ids[]")) == len(feed_ids)
+    assert set(prices) == set(feed_ids)
@@ -0,0 +1,133 @@
+"""Query-plan regression suite.
+
+Every query the API, background workers and indexer issue is listed in
+QUERIES, aggregations by their leading $match. Full-collection rebuilds and
+reconciliations are left out, since they read everything on purpose. The
+offline test checks each query against the declared index registry; the
+explain() test runs them against a real mongod (set MONGO_TEST_URL) and fails
+on any COLLSCAN.
+"""
+import os
+import pytest
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from indexes import INDEXES
+from settlement import placed_by
+
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# (name, collection, filter, sort)
+QUERIES = [
+    ("get_ai_models", "ai_models", {}, [("rank", 1)]),
+    ("get_ai_model", "ai_models", {"id": "m1"}, None),
+    ("get_predictions", "predictions", {}, [("created_at", -1), ("id", -1)]),
+    ("get_predictions by status", "predictions", {"status": "active"}, [("created_at", -1), ("id", -1)]),
+    ("get_predictions by category", "predictions", {"category": "Finance"}, [("created_at", -1), ("id", -1)]),
+    ("get_predictions by model", "predictions", {"ai_model_id": "m1"}, [("created_at", 1), ("id", 1)]),
+    ("get_predictions by stake", "predictions", {"total_stake": {"$gte": 10}}, [("created_at", -1), ("id", -1)]),
+    ("get_predictions page", "predictions", {"$or": [
+        {"created_at": {"$lt": NOW}}, {"created_at": NOW, "id": {"$lt": "p1"}},
+    ]}, [("created_at", -1), ("id", -1)]),
+    ("get_prediction", "predictions", {"id": "p1"}, None),
+    ("stake_on_prediction", "predictions", {"id": "p1"}, None),
+    ("stake idempotent replay", "stakes", {"idempotency_key": "k1"}, None),
+    ("stake wallet ledger", "wallet_positions", {"wallet_address": "0xabc", "prediction_id": "p1"}, None),
+    ("stake platform stats", "platform_stats", {"_id": "global"}, None),
+    ("buffer flush tag", "stakes", {"id": {"$in": ["s1", "s2"]}}, None),
+    ("buffer flush totals", "predictions", {"id": "p1", "stake_batches": {"$ne": "b1"}}, None),
+    ("buffer flush aggregated", "stakes", {"flush_batch": "b1"}, None),
+    ("buffer recover orphans", "stakes", {"aggregated": False, "flush_batch": None, "timestamp": {"$lt": NOW}}, None),
+    ("buffer recover batches", "stakes", {"aggregated": False, "flush_batch": {"$ne": None}}, None),
+    ("get_wallet_balance", "wallet_positions", {"wallet_address": "0xabc", "prediction_id": None}, None),
+    ("resolve_prediction", "predictions", {"id": "p1", "status": {"$ne": "resolved"}}, None),
+    ("reputation rebuild", "predictions", {"status": "resolved", "outcome": {"$in": ["correct", "incorrect"]}}, None),
+    ("reputation update", "ai_models", {"id": "m1"}, None),
+    ("reputation new rank", "ai_models", {"$or": [
+        {"reputation_score": {"$gt": 50.0}}, {"reputation_score": 50.0, "id": {"$lt": "m1"}},
+    ]}, None),
+    ("reputation rank window", "ai_models", {}, [("reputation_score", -1), ("id", 1)]),
+    ("settlement record", "settlements", {"_id": "p1"}, None),
+    ("settlement pools", "stakes", {"prediction_id": "p1", **placed_by(NOW)}, None),
+    ("settlement stake walk", "stakes", {"prediction_id": "p1", "id": {"$gt": ""}}, [("id", 1)]),
+    ("settlement payouts", "stakes", {"id": "s1"}, None),
+    ("settlement wallet credits", "wallet_positions",
+     {"wallet_address": "0xabc", "prediction_id": None, "settled_chunks": {"$ne": "c1"}}, None),
+    ("settlement chunk release", "wallet_positions", {"settled_chunks": "p1:s1"}, None),
+    ("settlement leftover guards", "wallet_positions", {"settled_chunks": {"$regex": "^p1:"}}, None),
+    ("resume settlements", "settlements", {"status": "running"}, None),
+    ("get_dao_proposals", "dao_proposals", {}, [("created_at", -1)]),
+    ("vote_on_proposal", "dao_proposals", {"id": "d1"}, None),
+    ("vote_on_proposal dedup", "votes", {"proposal_id": "d1", "wallet_address": "0xabc"}, None),
+    ("vote counter shard", "vote_counters", {"proposal_id": "d1", "shard": 3}, None),
+    ("get_dao_proposal_tallies", "vote_counters", {"proposal_id": {"$in": ["d1", "d2"]}}, None),
+    ("get_dao_proposal_tallies fallback", "dao_proposals", {"id": {"$in": ["d1", "d2"]}}, None),
+    ("indexer load hashes", "markets", {"chain_id": "default"}, None),
+    ("indexer chain backfill", "markets", {"chain_id": None}, None),
+    ("indexer upsert", "markets", {"chain_id": "default", "market_id": 1}, None),
+    ("indexer apply block", "markets", {"chain_id": "default", "market_id": 1, "last_height": {"$not": {"$gte": 3}}}, None),
+    ("indexer cursor", "indexer_cursors", {"_id": "default"}, None),
+]
+
+
+def leading_fields(filter_doc, sort):
+    """Fields an index may start with to serve this query without scanning the collection"""
+    fields = set()
+    for key, value in filter_doc.items():
+        if key == "$or":
+            for clause in value:
+                fields |= leading_fields(clause, None)
+        else:
+            fields.add(key)
+    if sort:
+        fields.add(sort[0][0])
+    return fields
+
+
+@pytest.mark.parametrize("name,collection,filter_doc,sort", QUERIES, ids=[q[0] for q in QUERIES])
+def test_query_is_served_by_a_declared_index(name, collection, filter_doc, sort):
+    candidates = leading_fields(filter_doc, sort)
+    # Every collection has its _id index without declaring it
+    first_keys = {"_id"} | {next(iter(index.document["key"])) for index in INDEXES.get(collection, [])}
+    assert candidates & first_keys, f"{name}: no index on {collection} starts with any of {sorted(candidates)}"
+
+
+def winning_stages(plan):
+    yield plan["stage"]
+    for child in plan.get("inputStages", []) + [plan[k] for k in ("inputStage",) if k in plan]:
+        yield from winning_stages(child)
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    url = os.getenv("MONGO_TEST_URL")
+    if not url:
+        pytest.skip("MONGO_TEST_URL not set")
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(url, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"mongod not reachable: {e}")
+    db = client["aion_query_plan_test"]
+    for collection, indexes in INDEXES.items():
+        db[collection].create_indexes(indexes)
+        # A few documents so the planner has something to choose between
+        db[collection].insert_many([{"_seed": i} for i in range(10)])
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+@pytest.mark.parametrize("name,collection,filter_doc,sort", QUERIES, ids=[q[0] for q in QUERIES])
+def test_query_plan_has_no_collscan(plan_db, name, collection, filter_doc, sort):
+    cursor = plan_db[collection].find(filter_doc)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    stages = list(winning_stages(plan.get("queryPlan", plan)))
+    assert "COLLSCAN" not in stages, f"{name} plan: {stages}"
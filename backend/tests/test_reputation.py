@@ -0,0 +1,80 @@
+import random
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from reputation import ReputationEngine
+
+
+def prediction(i, model_id, outcome, confidence=0.8, stake=100.0):
+    return {
+        "id": f"p{i}", "ai_model_id": model_id, "status": "resolved" if outcome else "active",
+        "outcome": outcome, "confidence_score": confidence, "total_stake": stake,
+    }
+
+
+@pytest_asyncio.fixture
+async def db():
+    db = AsyncMongoMockClient()["aion_test"]
+    await db.ai_models.insert_many([{"id": m, "rank": 1} for m in ("a", "b", "c")])
+    return db
+
+
+@pytest.mark.asyncio
+async def test_rebuild_scores_accuracy_brier_and_rank(db):
+    await db.predictions.insert_many([
+        prediction(0, "a", "correct", 0.9, 0.0),
+        prediction(1, "a", "incorrect", 0.6, 99.0),
+        prediction(2, "b", "correct", 0.9),
+        prediction(3, "b", None),
+    ])
+    engine = ReputationEngine(db)
+    assert await engine.rebuild() == 3
+
+    a = await db.ai_models.find_one({"id": "a"})
+    assert a["accuracy_rate"] == 50.0
+    # Stake weights 1 and 100: (1 * 0.01 + 100 * 0.36) / 101
+    assert a["brier_score"] == pytest.approx(36.01 / 101, abs=1e-4)
+    ranks = {m["id"]: m["rank"] async for m in db.ai_models.find()}
+    assert ranks == {"b": 1, "a": 2, "c": 3}
+
+
+@pytest.mark.asyncio
+async def test_incremental_updates_match_a_full_rebuild(db):
+    rng = random.Random(7)
+    resolved = [
+        prediction(i, rng.choice("abc"), rng.choice(["correct", "incorrect"]), rng.uniform(0.5, 1), rng.uniform(0, 500))
+        for i in range(200)
+    ]
+    engine = ReputationEngine(db)
+    await engine.rebuild()
+    for p in resolved:
+        await db.predictions.insert_one(p)
+        await engine.record_resolution(p)
+    incremental = {m["id"]: (m["rank"], m["reputation_score"]) async for m in db.ai_models.find()}
+
+    await ReputationEngine(db).rebuild()
+    rebuilt = {m["id"]: (m["rank"], m["reputation_score"]) async for m in db.ai_models.find()}
+    assert incremental == rebuilt
+    assert sorted(rank for rank, _ in rebuilt.values()) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_workers_resolving_concurrently_share_one_set_of_totals(db):
+    await ReputationEngine(db).rebuild()
+    workers = [ReputationEngine(db), ReputationEngine(db)]
+    await db.ai_models.insert_one({"id": "late", "rank": 4})
+
+    resolved = [prediction(i, "ab"[i % 2] if i < 6 else "late", "correct") for i in range(8)]
+    for i, p in enumerate(resolved):
+        await db.predictions.insert_one(p)
+        await workers[i % 2].record_resolution(p)
+    incremental = {m["id"]: (m["total_predictions"], m["rank"]) async for m in db.ai_models.find()}
+
+    await ReputationEngine(db).rebuild()
+    rebuilt = {m["id"]: (m["total_predictions"], m["rank"]) async for m in db.ai_models.find()}
+    assert incremental == rebuilt
+    assert incremental["late"][0] == 2
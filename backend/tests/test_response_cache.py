@@ -0,0 +1,86 @@
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from starlette.requests import Request
+from fake_redis import FakeRedis
+from response_cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache
+
+
+def make_request(etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    backend = MemoryCacheBackend(max_entries=2) if request.param == "memory" else RedisCacheBackend(FakeRedis())
+    return ResponseCache(backend, ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_hit_etag_and_tag_invalidation(cache):
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return b'{"id": "p1"}'
+
+    first = await cache.respond(make_request(), "prediction:p1", ["prediction:p1"], build)
+    second = await cache.respond(make_request(), "prediction:p1", ["prediction:p1"], build)
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert second.body == b'{"id": "p1"}' and len(builds) == 1
+
+    not_modified = await cache.respond(make_request(first.headers["etag"]), "prediction:p1", ["prediction:p1"], build)
+    assert not_modified.status_code == 304
+
+    await cache.invalidate("prediction:other")
+    assert (await cache.respond(make_request(), "prediction:p1", ["prediction:p1"], build)).headers["x-cache"] == "HIT"
+    await cache.invalidate("prediction:p1")
+    assert (await cache.respond(make_request(), "prediction:p1", ["prediction:p1"], build)).headers["x-cache"] == "MISS"
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["not_modified"], stats["invalidated"]) == (3, 2, 1, 1)
+    assert stats["hit_ratio"] == 0.6
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+    for key in ("a", "b"):
+        await backend.set(key, (b"{}", '"e"', 1.0), 60, [key])
+    await backend.get("a")
+    await backend.set("c", (b"{}", '"e"', 1.0), 60, ["c"])
+    assert await backend.get("b") is None
+    assert await backend.get("a") is not None
+    assert "b" not in backend._tags
+
+
+@pytest.mark.asyncio
+async def test_build_racing_another_workers_invalidation_is_not_served():
+    redis = FakeRedis()
+    worker_a, worker_b = ResponseCache(RedisCacheBackend(redis), ttl=60), ResponseCache(RedisCacheBackend(redis), ttl=60)
+    versions = iter([b'{"v": 1}', b'{"v": 2}'])
+
+    async def stale_build():
+        # The write and its invalidation land while this build is still reading
+        await worker_b.invalidate("prediction:p1")
+        return next(versions)
+
+    async def build():
+        return next(versions)
+
+    await worker_a.respond(make_request(), "prediction:p1", ["prediction:p1"], stale_build)
+    fresh = await worker_b.respond(make_request(), "prediction:p1", ["prediction:p1"], build)
+    assert (fresh.headers["x-cache"], fresh.body) == ("MISS", b'{"v": 2}')
+    again = await worker_a.respond(make_request(), "prediction:p1", ["prediction:p1"], build)
+    assert (again.headers["x-cache"], again.body) == ("HIT", b'{"v": 2}')
+
+
+@pytest.mark.asyncio
+async def test_redis_tag_sets_expire_with_their_entries():
+    redis = FakeRedis()
+    await RedisCacheBackend(redis).set("prediction:p1", (b"{}", '"e"', 1.0), 30, ["prediction:p1"])
+    assert 0 < redis.expires_in("aion:resp:tag:prediction:p1") <= 30
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import pytest_asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from indexes import ensure_indexes
+from settlement import SettlementEngine, compute_payouts
+
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def db():
+    db = AsyncMongoMockClient(tz_aware=True)["aion_test"]
+    await ensure_indexes(db, ["stakes", "wallet_positions"])
+    stakes = [{
+        "id": f"s{i:04d}", "prediction_id": "p1", "wallet_address": f"0x{i % 10}",
+        "amount": float(1 + i % 7), "side": "for" if i % 3 else "against", "timestamp": NOW,
+    } for i in range(300)]
+    # Placed after resolution, so not part of the pools and refunded
+    stakes.append({"id": "late", "prediction_id": "p1", "wallet_address": "0x1", "amount": 500.0,
+                   "side": "for", "timestamp": NOW + timedelta(seconds=1)})
+    await db.stakes.insert_many(stakes)
+    # 0x9 has no ledger row yet and must still be paid
+    await db.wallet_positions.insert_many([{"wallet_address": f"0x{i}", "prediction_id": None} for i in range(9)])
+    return db
+
+
+def test_payouts_split_the_losing_pool_after_fees():
+    payouts = compute_payouts(np.array([10.0, 30.0, 20.0]), np.array([True, True, False]), 40.0, 20.0, 0.1)
+    np.testing.assert_allclose(payouts, [14.5, 43.5, 0.0])
+    # Nobody won: everyone is refunded
+    np.testing.assert_allclose(compute_payouts(np.array([5.0]), np.array([False]), 0.0, 5.0, 0.1), [5.0])
+
+
+@pytest.mark.asyncio
+async def test_settlement_pays_the_pot_minus_fee(db):
+    settlement = await SettlementEngine(db, fee_bps=200, chunk_size=64).settle("p1", "correct", cutoff=NOW)
+
+    pot = settlement["winning_pool"] + settlement["losing_pool"]
+    assert settlement["status"] == "settled" and settlement["stakes_settled"] == 301
+    assert settlement["stakes_refunded"] == 1
+    assert settlement["total_paid"] == pytest.approx(pot - settlement["fee"] + 500.0)
+    assert (await db.stakes.find_one({"id": "late"}))["payout"] == 500.0
+    credited = sum([w["payout_amount"] async for w in db.wallet_positions.find()])
+    assert credited == pytest.approx(settlement["total_paid"])
+    assert await db.wallet_positions.count_documents({"settled_chunks": {"$ne": []}}) == 0
+
+
+async def crash_before_the_cursor_moves(engine, settlement, stakes, monkeypatch):
+    async def crash(*args, **kwargs):
+        raise ConnectionError("process killed")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(type(engine.db.settlements), "find_one_and_update", crash)
+        with pytest.raises(ConnectionError):
+            await engine._settle_chunk(settlement, stakes)
+
+
+@pytest.mark.asyncio
+async def test_crashed_settlement_resumes_without_double_paying(db, monkeypatch):
+    engine = SettlementEngine(db, chunk_size=50)
+    settlement = await engine.start("p1", "incorrect", cutoff=NOW)
+    stakes = await db.stakes.find({"prediction_id": "p1"}).sort("id", 1).limit(50).to_list(50)
+    # The wallets were credited but the cursor never moved
+    await crash_before_the_cursor_moves(engine, settlement, stakes, monkeypatch)
+
+    # Other settlements crediting the same wallets in between don't push the guard out
+    for i in range(30):
+        await db.stakes.insert_one({"id": f"o{i}", "prediction_id": f"other-{i}", "wallet_address": "0x0",
+                                    "amount": 1.0, "side": "for", "timestamp": NOW})
+        await SettlementEngine(db).settle(f"other-{i}", "correct", cutoff=NOW)
+
+    result = await SettlementEngine(db, chunk_size=50).run("p1")
+    credited = sum([w["payout_amount"] async for w in db.wallet_positions.find()])
+    assert result["stakes_settled"] == 301
+    assert credited == pytest.approx(result["total_paid"] + 30.0)
+
+
+@pytest.mark.asyncio
+async def test_legacy_string_timestamps_are_settled(db):
+    await db.stakes.insert_one({"id": "legacy", "prediction_id": "p2", "wallet_address": "0x1", "amount": 100.0,
+                                "side": "for", "timestamp": "2024-06-01T00:00:00+00:00"})
+    await db.stakes.insert_one({"id": "s-against", "prediction_id": "p2", "wallet_address": "0x2", "amount": 50.0,
+                                "side": "against", "timestamp": NOW})
+    settlement = await SettlementEngine(db, fee_bps=0).settle("p2", "correct", cutoff=NOW)
+
+    assert settlement["winning_pool"] == 100.0 and settlement["losing_pool"] == 50.0
+    assert (await db.stakes.find_one({"id": "legacy"}))["payout"] == pytest.approx(150.0)
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import httpx
+import linera_stub
+from linera_adapter import LineraAdapter
+from stake_batcher import StakeBatcher
+
+
+@pytest.fixture
+def batcher():
+    linera_stub.chain = linera_stub.StubChain()
+    linera_stub.chain.execute("createMarket", {
+        "title": "t", "description": "d", "category": "Finance", "eventDate": 1735689600
+    })
+    adapter = LineraAdapter()
+    adapter.transport = "http"
+    adapter.app_id = "test-app"
+    adapter._http_client = httpx.AsyncClient(
+        base_url="http://linera.test", transport=httpx.ASGITransport(app=linera_stub.app)
+    )
+    batcher = StakeBatcher(adapter)
+    batcher.window = 0.05
+    return batcher
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stakes_share_one_block(batcher):
+    results = await asyncio.gather(*(batcher.stake(0, 10, i % 2 == 0) for i in range(10)))
+    assert all(r["success"] for r in results)
+    assert linera_stub.chain.block_height == 1
+    assert linera_stub.chain.markets[0]["totalStakeYes"] == 50
+    assert batcher.get_stats()["batch_size_buckets"]["16"] == 1
+
+
+@pytest.mark.asyncio
+async def test_max_size_flushes_without_waiting_for_window(batcher):
+    batcher.window = 10
+    batcher.max_size = 4
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.stake(0, 1, True) for _ in range(8))), timeout=1)
+    assert len(results) == 8
+    assert batcher.stats["batches"] == 2
+
+
+@pytest.mark.asyncio
+async def test_invalid_stake_fails_only_its_own_caller(batcher):
+    results = await asyncio.gather(
+        batcher.stake(0, 10, True), batcher.stake(7, 10, True), batcher.stake(0, 5, False)
+    )
+    assert [r["success"] for r in results] == [True, False, True]
+    assert results[0] is not results[2]
+    assert linera_stub.chain.markets[0]["totalStakeYes"] == 10
+    assert linera_stub.chain.markets[0]["totalStakeNo"] == 5
+
+
+@pytest.mark.asyncio
+async def test_rejected_block_is_resubmitted_per_operation(batcher, monkeypatch):
+    post = batcher.adapter._post_graphql
+
+    async def reject_batches(query, chain_id=None):
+        if "op1:" in query:
+            return {"data": None, "errors": [{"message": "block rejected"}]}
+        return await post(query, chain_id)
+
+    monkeypatch.setattr(batcher.adapter, "_post_graphql", reject_batches)
+    results = await asyncio.gather(*(batcher.stake(0, 10, True) for _ in range(3)))
+    assert all(r["success"] for r in results)
+    assert linera_stub.chain.markets[0]["totalStakeYes"] == 30
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from indexes import ensure_indexes
+from platform_stats import reconcile_platform_stats
+from stake_buffer import StakeWriteBehindBuffer
+from stake_service import StakeService
+
+
+@pytest_asyncio.fixture
+async def db():
+    db = AsyncMongoMockClient()["aion_test"]
+    await ensure_indexes(db, ["stakes", "wallet_positions"])
+    await db.predictions.insert_many([{"id": "hot", "total_stake": 0.0}, {"id": "cold", "total_stake": 10.0}])
+    await db.platform_stats.insert_one({"_id": "global", "total_staked": 10.0})
+    return db
+
+
+@pytest.mark.asyncio
+async def test_buffered_stakes_reach_totals_in_one_flush(db):
+    buffer = StakeWriteBehindBuffer(db)
+    service = StakeService(None, db, buffer=buffer)
+    await asyncio.gather(*[service.place_stake("hot", f"0x{i % 5}", 2.0) for i in range(300)])
+    await service.place_stake("cold", "0xa", 1.0)
+
+    # Nothing has been written to the hot document yet
+    assert (await db.predictions.find_one({"id": "hot"}))["total_stake"] == 0.0
+    await buffer.flush()
+
+    assert (await db.predictions.find_one({"id": "hot"}))["total_stake"] == 600.0
+    assert (await db.predictions.find_one({"id": "cold"}))["total_stake"] == 11.0
+    assert (await db.platform_stats.find_one({"_id": "global"}))["total_staked"] == 611.0
+    assert await db.stakes.count_documents({"aggregated": False}) == 0
+    assert buffer.get_stats()["flushes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_recover_replays_unflushed_and_half_applied_batches_once(db):
+    service = StakeService(None, db, buffer=StakeWriteBehindBuffer(db))
+    for _ in range(5):
+        await service.place_stake("hot", "0xa", 1.0)
+
+    # Crash mid-flush: two stakes were tagged and applied to the prediction, but not marked aggregated
+    stakes = await db.stakes.find({}).to_list(10)
+    await db.stakes.update_many({"id": {"$in": [s["id"] for s in stakes[:2]]}}, {"$set": {"flush_batch": "b1"}})
+    await db.predictions.update_one({"id": "hot"}, {"$inc": {"total_stake": 2.0}, "$push": {"stake_batches": "b1"}})
+
+    restarted = StakeWriteBehindBuffer(db)
+    restarted.recover_after = 0
+    recovered = await restarted.recover()
+    assert recovered == 5
+    assert (await db.predictions.find_one({"id": "hot"}))["total_stake"] == 5.0
+    assert await db.stakes.count_documents({"aggregated": False}) == 0
+
+    # A second recovery finds nothing to do
+    assert await restarted.recover() == 0
+    assert (await db.predictions.find_one({"id": "hot"}))["total_stake"] == 5.0
+
+
+@pytest.mark.asyncio
+async def test_recover_leaves_stakes_a_live_worker_still_buffers(db):
+    buffer = StakeWriteBehindBuffer(db)
+    service = StakeService(None, db, buffer=buffer)
+    for _ in range(3):
+        await service.place_stake("hot", "0xa", 1.0)
+    await db.stakes.update_one({}, {"$set": {"flush_batch": "in-flight"}})
+
+    # Another worker starting up must not claim them
+    assert await StakeWriteBehindBuffer(db).recover() == 0
+    await buffer.flush()
+    assert (await db.predictions.find_one({"id": "hot"}))["total_stake"] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_a_half_applied_batch_stays_guarded_through_later_flushes(db):
+    service = StakeService(None, db, buffer=StakeWriteBehindBuffer(db))
+    await service.place_stake("hot", "0xa", 1.0)
+    # Crash after the increments, before the stake was marked aggregated
+    await db.stakes.update_many({}, {"$set": {"flush_batch": "crashed"}})
+    await db.predictions.update_one({"id": "hot"}, {"$inc": {"total_stake": 1.0}, "$push": {"stake_batches": "crashed"}})
+    await db.platform_stats.update_one({"_id": "global"}, {"$inc": {"total_staked": 1.0}, "$push": {"stake_batches": "crashed"}})
+
+    buffer = StakeWriteBehindBuffer(db)
+    service = StakeService(None, db, buffer=buffer)
+    for _ in range(100):
+        await service.place_stake("hot", "0xb", 1.0)
+        await buffer.flush()
+    await reconcile_platform_stats(db)
+
+    buffer.recover_after = 0
+    assert await buffer.recover() == 1
+    hot = await db.predictions.find_one({"id": "hot"})
+    assert hot["total_stake"] == 101.0 and hot["stake_batches"] == []
+    assert (await db.platform_stats.find_one({"_id": "global"}))["total_staked"] == 111.0
+
+
+@pytest.mark.asyncio
+async def test_a_failed_flush_keeps_its_increments(db, monkeypatch):
+    buffer = StakeWriteBehindBuffer(db)
+    service = StakeService(None, db, buffer=buffer)
+    await service.place_stake("hot", "0xa", 2.0)
+
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("primary stepped down")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(type(db.stakes), "update_many", unavailable)
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+    await buffer.flush()
+    assert (await db.predictions.find_one({"id": "hot"}))["total_stake"] == 2.0
+    assert await db.stakes.count_documents({"aggregated": False}) == 0
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from indexes import ensure_indexes
+from settlement import SettlementEngine
+from stake_buffer import StakeWriteBehindBuffer
+from stake_service import IdempotencyConflict, PredictionClosed, PredictionNotFound, StakeService
+
+
+@pytest_asyncio.fixture
+async def service():
+    client = AsyncMongoMockClient()
+    db = client["aion_test"]
+    await ensure_indexes(db, ["stakes", "wallet_positions"])
+    await db.predictions.insert_one({"id": "p1", "total_stake": 0.0})
+    return StakeService(client, db)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stakes_and_retries_are_counted_exactly_once(service):
+    keys = [f"key-{i}" for i in range(200)]
+    attempts = [service.place_stake("p1", f"0xwallet{i % 7}", 1.0, idempotency_key=k) for i, k in enumerate(keys)]
+    # Every request is retried once while the originals are still in flight
+    attempts += [service.place_stake("p1", f"0xwallet{i % 7}", 1.0, idempotency_key=k) for i, k in enumerate(keys)]
+    results = await asyncio.gather(*attempts)
+
+    assert sum(replayed for _, replayed in results) == 200
+    assert [r["stake_id"] for r, _ in results[:200]] == [r["stake_id"] for r, _ in results[200:]]
+    assert await service.db.stakes.count_documents({}) == 200
+    prediction = await service.db.predictions.find_one({"id": "p1"})
+    assert prediction["total_stake"] == 200.0
+    stats = await service.db.platform_stats.find_one({"_id": "global"})
+    assert stats["total_staked"] == 200.0
+
+
+@pytest.mark.asyncio
+async def test_reused_key_with_different_stake_conflicts(service):
+    await service.place_stake("p1", "0xa", 5.0, idempotency_key="k")
+    with pytest.raises(IdempotencyConflict):
+        await service.place_stake("p1", "0xa", 50.0, idempotency_key="k")
+
+
+@pytest.mark.asyncio
+async def test_unknown_prediction_leaves_no_stake(service):
+    with pytest.raises(PredictionNotFound):
+        await service.place_stake("missing", "0xa", 5.0)
+    assert await service.db.stakes.count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_resolved_prediction_rejects_stakes(service):
+    await service.db.predictions.insert_one({"id": "done", "status": "resolved", "total_stake": 0.0})
+    with pytest.raises(PredictionClosed):
+        await service.place_stake("done", "0xa", 5.0, side="against")
+    assert await service.db.stakes.count_documents({"prediction_id": "done"}) == 0
+
+
+@pytest.mark.asyncio
+async def test_buffered_stake_racing_a_resolve_is_rejected_or_settled(service, monkeypatch):
+    service.buffer = StakeWriteBehindBuffer(service.db)
+    await service.place_stake("p1", "0xa", 5.0)
+    insert_one = type(service.db.stakes).insert_one
+    registered, resolved = asyncio.Event(), asyncio.Event()
+
+    async def slow_insert(self, document, *args, **kwargs):
+        registered.set()
+        await resolved.wait()
+        return await insert_one(self, document, *args, **kwargs)
+
+    monkeypatch.setattr(type(service.db.stakes), "insert_one", slow_insert)
+    racing = asyncio.create_task(service.place_stake("p1", "0xb", 7.0))
+    await registered.wait()
+    await service.db.predictions.update_one({"id": "p1"}, {"$set": {"status": "resolved"}})
+    with pytest.raises(PredictionClosed):
+        await service.place_stake("p1", "0xc", 1.0)
+    starting = asyncio.create_task(SettlementEngine(service.db).start("p1", "correct"))
+    await asyncio.sleep(0.1)
+    resolved.set()
+    await racing
+    settlement = await starting
+    assert settlement["winning_pool"] == 12.0
+    assert (await service.db.predictions.find_one({"id": "p1"}))["placing_stakes"] == []
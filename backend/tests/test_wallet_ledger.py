@@ -0,0 +1,44 @@
+import pytest
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mongomock_motor import AsyncMongoMockClient
+from wallet_ledger import get_wallet_position, rebuild_wallet_positions, record_wallet_stake
+
+
+@pytest.mark.asyncio
+async def test_stakes_update_wallet_and_position_totals():
+    db = AsyncMongoMockClient()["aion_test"]
+    for prediction_id, amount in [("p1", 10.0), ("p1", 5.0), ("p2", 2.5)]:
+        await record_wallet_stake(db, "0xwhale", prediction_id, amount)
+
+    wallet = await get_wallet_position(db, "0xwhale")
+    assert (wallet["staked_amount"], wallet["stake_count"]) == (17.5, 3)
+    position = await db.wallet_positions.find_one({"wallet_address": "0xwhale", "prediction_id": "p1"})
+    assert position["staked_amount"] == 15.0
+
+
+@pytest.mark.asyncio
+async def test_rebuild_backfills_from_stakes_beyond_1000_records():
+    db = AsyncMongoMockClient()["aion_test"]
+    await db.stakes.insert_many([
+        {"id": str(i), "wallet_address": "0xwhale", "prediction_id": f"p{i % 3}", "amount": 1.0}
+        for i in range(2500)
+    ])
+    result = await rebuild_wallet_positions(db)
+    assert result == {"wallets": 1, "positions": 3}
+    wallet = await get_wallet_position(db, "0xwhale")
+    assert wallet["staked_amount"] == 2500.0
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_settlement_credits():
+    db = AsyncMongoMockClient()["aion_test"]
+    await db.stakes.insert_one({"id": "s1", "wallet_address": "0xwhale", "prediction_id": "p1", "amount": 4.0})
+    await db.wallet_positions.insert_one({"wallet_address": "0xwhale", "prediction_id": None, "staked_amount": 1.0,
+                                          "earned_rewards": 9.8, "payout_amount": 13.8, "settled_chunks": ["p1:"]})
+    await rebuild_wallet_positions(db)
+
+    wallet = await get_wallet_position(db, "0xwhale")
+    assert (wallet["staked_amount"], wallet["earned_rewards"], wallet["payout_amount"]) == (4.0, 9.8, 13.8)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+load_dotenv()
+
+# wallet_positions holds one running total per wallet (prediction_id None)
+# and one per (wallet, prediction)
+REBUILD_BATCH_SIZE = 1000
+
+
+def position_updates(wallet_address: str, prediction_id: str, amount: float):
+    now = datetime.now(timezone.utc)
+    update = {"$inc": {"staked_amount": amount, "stake_count": 1}, "$set": {"updated_at": now}}
+    return [
+        UpdateOne({"wallet_address": wallet_address, "prediction_id": None}, update, upsert=True),
+        UpdateOne({"wallet_address": wallet_address, "prediction_id": prediction_id}, update, upsert=True),
+    ]
+
+
+async def record_wallet_stake(db, wallet_address: str, prediction_id: str, amount: float, session=None):
+    """Add a stake to the wallet and wallet/prediction totals in one round trip"""
+    await db.wallet_positions.bulk_write(
+        position_updates(wallet_address, prediction_id, amount), ordered=False, session=session
+    )
+
+
+async def get_wallet_position(db, wallet_address: str) -> Optional[Dict[str, Any]]:
+    return await db.wallet_positions.find_one(
+        {"wallet_address": wallet_address, "prediction_id": None}, {"_id": 0}
+    )
+
+
+async def _replace_grouped(db, group_id: Dict[str, str], to_key) -> int:
+    pipeline = [{"$group": {"_id": group_id, "staked_amount": {"$sum": "$amount"}, "stake_count": {"$sum": 1}}}]
+    now = datetime.now(timezone.utc)
+    written = 0
+    batch = []
+    async for row in db.stakes.aggregate(pipeline, allowDiskUse=True):
+        # $set only the stake totals; settlement keeps payouts and earned rewards on the same documents
+        batch.append(UpdateOne(to_key(row["_id"]), {"$set": {
+            "staked_amount": row["staked_amount"],
+            "stake_count": row["stake_count"],
+            "updated_at": now,
+        }}, upsert=True))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            await db.wallet_positions.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        await db.wallet_positions.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+async def rebuild_wallet_positions(db) -> Dict[str, int]:
+    """Backfill wallet_positions from the stakes collection.
+
+    Stakes recorded while the rebuild runs may be overwritten, so run it
+    before opening traffic or during maintenance.
+    """
+    wallets = await _replace_grouped(
+        db, {"wallet": "$wallet_address"},
+        lambda key: {"wallet_address": key["wallet"], "prediction_id": None}
+    )
+    positions = await _replace_grouped(
+        db, {"wallet": "$wallet_address", "prediction": "$prediction_id"},
+        lambda key: {"wallet_address": key["wallet"], "prediction_id": key["prediction"]}
+    )
+    return {"wallets": wallets, "positions": positions}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python wallet_ledger.py rebuild")
+        sys.exit(1)
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        result = await rebuild_wallet_positions(client[os.environ["DB_NAME"]])
+        print(f"Rebuilt {result['wallets']} wallets and {result['positions']} positions")
+        client.close()
+
+    asyncio.run(main())
@@ -1,12 +1,45 @@
 #!/usr/bin/env python3
 import asyncio
+import csv
+import json
+import os
 import sys
+import time
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent / "backend"))
 
 from linera_adapter import linera_adapter
 import argparse
 
+def parse_bool(value) -> bool:
+    if isinstance(value, str):
+        if value.strip().lower() in ("true", "1", "yes", "y"):
+            return True
+        if value.strip().lower() in ("false", "0", "no", "n", ""):
+            return False
+        raise ValueError(f"not a boolean: {value!r}")
+    return bool(value)
+
+def parse_int(value) -> int:
+    """Whole numbers only; int() would silently truncate 10.9 to 10"""
+    if isinstance(value, bool):
+        raise ValueError(f"not an integer: {value!r}")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"not an integer: {value!r}")
+        return int(value)
+    if isinstance(value, (int, str)):
+        return int(value)
+    raise ValueError(f"not an integer: {value!r}")
+
+# batch op name -> (contract operation, {field: parser})
+BATCH_OPERATIONS = {
+    "create": ("CreateMarket", {"title": str, "description": str, "category": str, "event_date": parse_int}),
+    "stake": ("Stake", {"market_id": parse_int, "amount": parse_int, "prediction": parse_bool}),
+    "resolve": ("ResolveMarket", {"market_id": parse_int, "outcome": parse_bool}),
+}
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines on stderr
+
 async def create_market(args):
     result = await linera_adapter.create_market(
         title=args.title,
@@ -35,6 +68,178 @@ async def resolve(args):
     )
     print(f"Market resolved: {result}")
 
+# ============ BATCH ============
+
+def to_operation(row: dict):
+    """(operation, params) for one input row; raises ValueError on a bad row"""
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object, got {type(row).__name__}")
+    op = row.get("op")
+    if op not in BATCH_OPERATIONS:
+        raise ValueError(f"unknown op {op!r}, expected one of {', '.join(BATCH_OPERATIONS)}")
+    operation, fields = BATCH_OPERATIONS[op]
+    params = {}
+    for field, parse in fields.items():
+        if row.get(field) in (None, ""):
+            raise ValueError(f"{op} needs {field}")
+        params[field] = parse(row[field])
+    return operation, params
+
+def read_rows(f, fmt: str):
+    """Yield (line number, row or parse error) for every operation in the input"""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f"invalid JSON: {e}")
+
+class Checkpoint:
+    """Which input lines have succeeded, so a rerun skips them.
+
+    Everything up to done_through has succeeded (or holds no operation), and
+    done lists the successful lines after it. Lines that failed stay out of
+    both and are retried on resume.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.done_through = 0
+        self.done = set()
+        self._passed = set()
+        if self.path and self.path.exists():
+            state = json.loads(self.path.read_text())
+            self.done_through = state["done_through"]
+            self.done = set(state["done"])
+
+    def is_done(self, line_number: int) -> bool:
+        return line_number <= self.done_through or line_number in self.done
+
+    def skip(self, line_numbers):
+        """Lines without an operation (blank lines, CSV headers) count as done"""
+        self._passed.update(line_numbers)
+
+    def mark(self, line_numbers):
+        self.done.update(line_numbers)
+        while self.done_through + 1 in self.done or self.done_through + 1 in self._passed:
+            self.done_through += 1
+            self.done.discard(self.done_through)
+            self._passed.discard(self.done_through)
+        self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"done_through": self.done_through, "done": sorted(self.done)}))
+        os.replace(tmp, self.path)
+
+async def run_batch(adapter, rows, out, checkpoint: Checkpoint, parallel: int = 4, chunk: int = 1,
+                    progress=sys.stderr) -> dict:
+    """Run every operation in rows through adapter, at most parallel chunks at a time.
+
+    Up to chunk consecutive operations go out in one call_operations call, which
+    the http transport proposes in a single block. Results are written to out
+    as NDJSON in completion order.
+    """
+    queue = asyncio.Queue(maxsize=parallel * 2)
+    totals = {"processed": 0, "failed": 0, "skipped": 0}
+    started = time.perf_counter()
+
+    def emit(line_number, result):
+        out.write(json.dumps({"line": line_number, **result}, default=str) + "\n")
+        totals["processed"] += 1
+        if not result.get("success"):
+            totals["failed"] += 1
+
+    async def produce():
+        pending = []
+        previous = 0
+        iterator = iter(rows)
+        while True:
+            # Reading a pipe can block, so it happens off the loop
+            item = await asyncio.to_thread(next, iterator, None)
+            if item is None:
+                break
+            line_number, row = item
+            checkpoint.skip(range(previous + 1, line_number))
+            previous = line_number
+            if checkpoint.is_done(line_number):
+                totals["skipped"] += 1
+                continue
+            pending.append((line_number, row))
+            if len(pending) >= chunk:
+                await queue.put(pending)
+                pending = []
+        if pending:
+            await queue.put(pending)
+        for _ in range(parallel):
+            await queue.put(None)
+
+    async def work():
+        while (batch := await queue.get()) is not None:
+            calls = []
+            for line_number, row in batch:
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    calls.append((line_number, to_operation(row)))
+                except (ValueError, TypeError) as e:
+                    emit(line_number, {"success": False, "error": str(e)})
+            if calls:
+                call_started = time.perf_counter()
+                results = await adapter.call_operations([operation for _, operation in calls])
+                elapsed_ms = round((time.perf_counter() - call_started) * 1000, 3)
+                for (line_number, (operation, _)), result in zip(calls, results):
+                    emit(line_number, {"operation": operation, "elapsed_ms": elapsed_ms, **result})
+                checkpoint.mark(line_number for (line_number, _), result in zip(calls, results)
+                                if result.get("success"))
+            out.flush()
+
+    async def report():
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            elapsed = time.perf_counter() - started
+            progress.write(f"{totals['processed']} processed, {totals['failed']} failed, "
+                           f"{totals['processed'] / elapsed:.1f} ops/s\n")
+            progress.flush()
+
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(parallel)))
+    finally:
+        reporter.cancel()
+    elapsed = time.perf_counter() - started
+    checkpoint.mark([])
+    summary = {**totals, "seconds": round(elapsed, 3), "ops_per_sec": round(totals["processed"] / elapsed, 1)}
+    progress.write(f"Finished: {json.dumps(summary)}\n")
+    return summary
+
+async def batch(args):
+    fmt = args.format or ("csv" if args.input.endswith(".csv") else "ndjson")
+    checkpoint = Checkpoint(args.checkpoint)
+    if checkpoint.done_through or checkpoint.done:
+        sys.stderr.write(f"Resuming after line {checkpoint.done_through}\n")
+    # One CLI process per in-flight call, so the adapter's limit has to match
+    linera_adapter.set_max_concurrency(args.parallel * args.chunk)
+    f = sys.stdin if args.input == "-" else open(args.input, newline="")
+    out = sys.stdout if args.output is None else open(args.output, "a")
+    try:
+        summary = await run_batch(linera_adapter, read_rows(f, fmt), out, checkpoint, args.parallel, args.chunk)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+        if out is not sys.stdout:
+            out.close()
+        await linera_adapter.close()
+    return 1 if summary["failed"] else 0
+
 def main():
     parser = argparse.ArgumentParser(description="AION CLI for Linera operations")
     subparsers = parser.add_subparsers(dest="command")
@@ -60,6 +265,19 @@ def main():
     resolve_parser.add_argument("--market-id", type=int, required=True)
     resolve_parser.add_argument("--outcome", type=bool, required=True)
     
+    # Batch
+    batch_parser = subparsers.add_parser(
+        "batch", help="Run create/stake/resolve operations from NDJSON or CSV",
+        description="Each input row has an op (create, stake or resolve) plus that command's fields, "
+                    "e.g. {\"op\": \"stake\", \"market_id\": 1, \"amount\": 10, \"prediction\": true}"
+    )
+    batch_parser.add_argument("--input", default="-", help="NDJSON or CSV file, - for stdin")
+    batch_parser.add_argument("--format", choices=["ndjson", "csv"], help="default: csv for *.csv, else ndjson")
+    batch_parser.add_argument("--output", help="append NDJSON results here instead of stdout")
+    batch_parser.add_argument("--parallel", type=int, default=4, help="calls in flight at once")
+    batch_parser.add_argument("--chunk", type=int, default=1, help="operations per call; one block on http")
+    batch_parser.add_argument("--checkpoint", help="record successful lines here and skip them on rerun")
+
     args = parser.parse_args()
     
     if args.command == "create":
@@ -70,6 +288,8 @@ def main():
         asyncio.run(query(args))
     elif args.command == "resolve":
         asyncio.run(resolve(args))
+    elif args.command == "batch":
+        sys.exit(asyncio.run(batch(args)))
     else:
         parser.print_help()
 